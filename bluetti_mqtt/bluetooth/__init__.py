@@ -1,17 +1,26 @@
 import logging
 import re
-from typing import Set
+from typing import Optional, Set
 from bleak import BleakScanner
 from bleak.backends.device import BLEDevice
 from bluetti_mqtt.core import BluettiDevice, V2Device, AC200M, AC300, AC500, AC60, EP500, EP500P, EP600, EB3A
+from bluetti_mqtt.core.devices.register_map import load_register_maps
 from .client import BluetoothClient
+from .command_queue import Priority
 from .exc import BadConnectionError, ModbusError, ParseError
 from .manager import MultiDeviceManager
+from .pack_switcher import PackSwitcher
+from .transport import DEFAULT_TRANSPORT, BleakTransport
 from bluetti_mqtt.bluetooth.encryption import is_device_using_encryption
 
 
+# Models only defined by a register map (see bluetti_mqtt.core.devices.register_map)
+REGISTER_MAPS = load_register_maps()
+DEVICE_NAMES = ['Elite 200 V2', 'AC180', 'AC200M', 'AC300', 'AC500', 'AC60', 'EP500P', 'EP500', 'EP600', 'EB3A']
+DEVICE_NAMES += [re.escape(t) for t in REGISTER_MAPS if t not in DEVICE_NAMES]
+
 # DEVICE_NAME_RE = re.compile(r'^(AC180|AC200M|AC300|AC500|AC60|EP500P|EP500|EP600|EB3A)(\d+)$')
-DEVICE_NAME_RE = re.compile(r'^(Elite 200 V2|AC180|AC200M|AC300|AC500|AC60|EP500P|EP500|EP600|EB3A)(\d+)?$')
+DEVICE_NAME_RE = re.compile(r'^(' + '|'.join(DEVICE_NAMES) + r')(\d+)?$')
 
 
 async def scan_devices():
@@ -49,11 +58,13 @@ def build_device(address: str, name: str):
         return EP600(address, match[2])
     if match[1] == 'EB3A':
         return EB3A(address, match[2])
+    if match[1] in REGISTER_MAPS:
+        return REGISTER_MAPS[match[1]].device_class(address, match[2])
 
 
-async def check_addresses(addresses: Set[str]):
+async def check_addresses(addresses: Set[str], transport: Optional[BleakTransport] = None):
     logging.debug(f'Checking we can connect: {addresses}')
-    devices = await BleakScanner.discover(return_adv=True)
+    devices = await (transport or DEFAULT_TRANSPORT).discover()
     filtered = [d for d in devices.values() if d[0].address in addresses]
     logging.debug(f'Found devices: {filtered}')
 
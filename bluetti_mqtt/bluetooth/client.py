@@ -1,12 +1,18 @@
 import asyncio
+from collections import deque
+from dataclasses import dataclass
 from enum import Enum, auto, unique
 import logging
-from typing import Union
-from bleak import BleakClient, BleakError
+from typing import Deque, Optional, Union
+from bleak import BleakError
 from bleak.exc import BleakDeviceNotFoundError
 from bluetti_mqtt.core import DeviceCommand
+from .command_queue import CommandQueue, Priority
 from .exc import BadConnectionError, ModbusError, ParseError
+from .frame_assembler import FrameAssembler
+from .rtt import RttEstimator, backoff_delay
 from .encryption import Connection, PassthroughConnection, EncryptedConnection
+from .transport import DEFAULT_TRANSPORT, BleakTransport
 
 
 @unique
@@ -19,8 +25,16 @@ class ClientState(Enum):
     DISCONNECTING = auto()
 
 
+@dataclass
+class PendingCommand:
+    command: DeviceCommand
+    result: Optional[asyncio.Future]  # The future returned by perform, if any
+    response_future: asyncio.Future  # Resolved once the full response is received
+    sent_at: Optional[float] = None  # Set if the round trip time should be sampled
+
+
 class BluetoothClient:
-    RESPONSE_TIMEOUT = 5
+    RESPONSE_TIMEOUT = 5  # Upper bound, the actual timeouts come from the measured round trip times
     WRITE_UUID = '0000ff02-0000-1000-8000-00805f9b34fb'
     NOTIFY_UUID = '0000ff01-0000-1000-8000-00805f9b34fb'
     DEVICE_NAME_UUID = '00002a00-0000-1000-8000-00805f9b34fb'
@@ -28,37 +42,50 @@ class BluetoothClient:
     name: Union[str, None]
     connection: Connection
 
-    current_command: DeviceCommand
-    notify_future: asyncio.Future
-    notify_response: bytearray
+    # Commands that were written and are waiting for a response, oldest first
+    in_flight: Deque[PendingCommand]
 
-    def __init__(self, address: str, is_encrypted: bool):
+    def __init__(
+        self,
+        address: str,
+        is_encrypted: bool,
+        pipeline_depth: int = 1,
+        transport: Optional[BleakTransport] = None
+    ):
+        transport = transport or DEFAULT_TRANSPORT
         self.address = address
+        self.configured_pipeline_depth = pipeline_depth
+        self.pipeline_depth = pipeline_depth
         self.state = ClientState.NOT_CONNECTED
         self.name = None
-        self.client = BleakClient(self.address)
+        self.client = transport.create_client(self.address)
         self.connection = EncryptedConnection(
             on_plaintext_packet=self._on_packet,
             write=self._write,
+            offload_crypto=True,
+            peer_verify_key=transport.peer_verify_key(self.address),
         ) if is_encrypted else PassthroughConnection(
             on_plaintext_packet=self._on_packet,
             write=self._write
         )
-        self.command_queue = asyncio.Queue()
-        self.notify_future = None
+        self.command_queue = CommandQueue()
+        self.in_flight = deque()
+        self.assembler = FrameAssembler()
+        self.assembling: Optional[PendingCommand] = None
+        self.rtt = RttEstimator(self.RESPONSE_TIMEOUT)
         self.loop = asyncio.get_running_loop()
 
     @property
     def is_ready(self):
         return self.state == ClientState.READY or self.state == ClientState.PERFORMING_COMMAND
 
-    async def perform(self, cmd: DeviceCommand):
+    async def perform(self, cmd: DeviceCommand, priority: Priority = Priority.LIVE_POLL):
         future = self.loop.create_future()
-        await self.command_queue.put((cmd, future))
+        await self.command_queue.put((cmd, future), priority)
         return future
 
-    async def perform_nowait(self, cmd: DeviceCommand):
-        await self.command_queue.put((cmd, None))
+    async def perform_nowait(self, cmd: DeviceCommand, priority: Priority = Priority.LIVE_POLL):
+        await self.command_queue.put((cmd, None), priority)
 
     async def run(self):
         try:
@@ -79,6 +106,7 @@ class BluetoothClient:
                     self.state = ClientState.NOT_CONNECTED
         finally:
             # Ensure that we disconnect
+            self.connection.close()
             if self.client:
                 await self.client.disconnect()
 
@@ -86,6 +114,9 @@ class BluetoothClient:
         """Establish connection to the bluetooth device"""
         try:
             await self.client.connect()
+            self.rtt = RttEstimator(self.RESPONSE_TIMEOUT)
+            # Give pipelining another chance after a fall back
+            self.pipeline_depth = self.configured_pipeline_depth
             self.state = ClientState.CONNECTED
             logging.info(f'Connected to device: {self.address}')
         except BleakDeviceNotFoundError:
@@ -122,37 +153,53 @@ class BluetoothClient:
         )
 
     async def _perform_command(self):
+        if self.pipeline_depth > 1:
+            await self._perform_pipelined()
+            return
+
         cmd, cmd_future = await self.command_queue.get()
+        await self._perform_single(cmd, cmd_future)
+        self.command_queue.task_done()
+
+    async def _perform_single(self, cmd: DeviceCommand, cmd_future: Optional[asyncio.Future]):
+        """Performs a command and waits for its response before doing anything else"""
+        response_size = cmd.response_size()
         retries = 0
         while retries < 5:
             try:
                 # Prepare to make request
                 self.state = ClientState.PERFORMING_COMMAND
-                self.current_command = cmd
-                self.notify_future = self.loop.create_future()
-                self.notify_response = bytearray()
+                pending = PendingCommand(cmd, cmd_future, self.loop.create_future())
+                self.in_flight = deque([pending])
 
                 # Make request
-                await self.connection.write(bytes(self.current_command))
+                sent_at = self.loop.time()
+                await self.connection.write(bytes(cmd))
 
-                # Wait for response
+                # Wait for response, backing off the timeout on retries
+                timeout = min(self.rtt.timeout(response_size) * 2 ** retries, self.RESPONSE_TIMEOUT)
                 res = await asyncio.wait_for(
-                    self.notify_future,
-                    timeout=self.RESPONSE_TIMEOUT)
+                    pending.response_future,
+                    timeout=timeout)
                 if cmd_future:
                     cmd_future.set_result(res)
 
+                # Only first attempts give unambiguous round trip times
+                if retries == 0:
+                    self.rtt.sample(response_size, self.loop.time() - sent_at)
+
                 # Success!
                 self.state = ClientState.READY
                 break
             except ParseError:
-                # For safety, wait the full timeout before retrying again
+                # For safety, wait for the rest of the bad response before retrying again
                 self.state = ClientState.COMMAND_ERROR_WAIT
                 retries += 1
-                await asyncio.sleep(self.RESPONSE_TIMEOUT)
+                await asyncio.sleep(self.rtt.timeout(response_size) + backoff_delay(retries))
             except asyncio.TimeoutError:
                 self.state = ClientState.COMMAND_ERROR_WAIT
                 retries += 1
+                await asyncio.sleep(backoff_delay(retries))
             except ModbusError as err:
                 if cmd_future:
                     cmd_future.set_exception(err)
@@ -173,37 +220,162 @@ class BluetoothClient:
                 cmd_future.set_exception(err)
             self.state = ClientState.DISCONNECTING
 
-        self.command_queue.task_done()
+        self.in_flight.clear()
+
+    async def _perform_pipelined(self):
+        """
+        Keeps up to pipeline_depth commands in flight. Responses arrive in the
+        order the commands were written, so each one is matched to the oldest
+        command still waiting. If the device gets a response wrong, the client
+        falls back to performing one command at a time until it reconnects.
+
+        Commands in flight always expect responses of different sizes. If the
+        device drops a command, the next response then fails the checksum of
+        the command it gets matched to, instead of being silently misread.
+        """
+        item = await self.command_queue.get()
+        self.state = ClientState.PERFORMING_COMMAND
+        self.in_flight = deque()
+        try:
+            while True:
+                # Fill the window
+                while len(self.in_flight) < self.pipeline_depth:
+                    if item is None:
+                        if self.command_queue.empty():
+                            break
+                        item = self.command_queue.get_nowait()
+                    cmd, cmd_future = item
+                    if any(p.command.response_size() == cmd.response_size() for p in self.in_flight):
+                        break
+                    item = None
+                    pending = PendingCommand(cmd, cmd_future, self.loop.create_future())
+                    if not self.in_flight:
+                        # Nothing ahead of it, so its round trip time can be sampled
+                        pending.sent_at = self.loop.time()
+                    self.in_flight.append(pending)
+                    await self.connection.write(bytes(cmd))
+
+                if not self.in_flight:
+                    break
+
+                # Wait for the oldest command
+                pending = self.in_flight[0]
+                response_size = pending.command.response_size()
+                try:
+                    res = await asyncio.wait_for(
+                        asyncio.shield(pending.response_future),
+                        timeout=self.rtt.timeout(response_size))
+                    if pending.result:
+                        pending.result.set_result(res)
+                    if pending.sent_at is not None:
+                        self.rtt.sample(response_size, self.loop.time() - pending.sent_at)
+                except ModbusError as err:
+                    if pending.result:
+                        pending.result.set_exception(err)
+                except (ParseError, asyncio.TimeoutError) as err:
+                    logging.warning(
+                        f'Pipelined command to {self.address} failed ({err!r}), '
+                        'falling back to one command at a time')
+                    await self._fall_back_to_single(item)
+                    return
+
+                self.in_flight.popleft()
+                self.command_queue.task_done()
+
+            self.state = ClientState.READY
+        except (BleakError, EOFError, BadConnectionError) as err:
+            for pending in self.in_flight:
+                if pending.result and not pending.result.done():
+                    pending.result.set_exception(err)
+                self.command_queue.task_done()
+            self.in_flight.clear()
+
+            # The command waiting for a free slot was never written
+            if item is not None:
+                _, cmd_future = item
+                if cmd_future and not cmd_future.done():
+                    cmd_future.set_exception(err)
+                self.command_queue.task_done()
+            self.state = ClientState.DISCONNECTING
+
+    async def _fall_back_to_single(self, waiting=None):
+        """
+        Performs the unanswered commands one at a time, followed by the
+        command that was waiting for a free slot, if any
+        """
+        self.pipeline_depth = 1
+        unanswered = [(p.command, p.result) for p in self.in_flight]
+        if waiting is not None:
+            unanswered.append(waiting)
+        drain_time = max(self.rtt.timeout(p.command.response_size()) for p in self.in_flight)
+        self.in_flight.clear()
+
+        # Let any late responses arrive before starting over
+        self.state = ClientState.COMMAND_ERROR_WAIT
+        await asyncio.sleep(drain_time)
+
+        for cmd, cmd_future in unanswered:
+            if self.state == ClientState.DISCONNECTING:
+                if cmd_future:
+                    cmd_future.set_exception(BadConnectionError('disconnected'))
+            else:
+                await self._perform_single(cmd, cmd_future)
+            self.command_queue.task_done()
 
     async def _disconnect(self):
         await self.client.disconnect()
+        self.connection.close()
         logging.warning(f'Delayed reconnect to {self.address} after error')
         await asyncio.sleep(5)
         self.state = ClientState.NOT_CONNECTED
 
     def _notification_handler(self, _sender: int, data: bytearray):
-        asyncio.create_task(self.connection.on_packet(data))
+        self.connection.receive(data)
+
+    def _current_pending(self) -> Optional[PendingCommand]:
+        """Returns the oldest command still waiting for its response"""
+        for pending in self.in_flight:
+            if not pending.response_future.done():
+                return pending
+        return None
+
+    def _on_packet(self, data: bytearray):
+        pending = self._current_pending()
 
-    async def _on_packet(self, data: bytearray):
         # Ignore notifications we don't expect
-        if not self.notify_future or self.notify_future.done():
+        if pending is None:
             return
 
         # If something went wrong, we might get weird data.
         if data == b'AT+NAME?\r' or data == b'AT+ADV?\r':
             err = BadConnectionError('Got AT+ notification')
-            self.notify_future.set_exception(err)
+            pending.response_future.set_exception(err)
             return
 
-        # Save data
-        self.notify_response.extend(data)
+        # A notification may hold the end of one response and the start of
+        # the next when several commands are in flight
+        data = memoryview(data)
+        while len(data) > 0 and pending is not None:
+            if self.assembling is not pending:
+                self.assembler.start(pending.command)
+                self.assembling = pending
 
-        if len(self.notify_response) == self.current_command.response_size():
-            if self.current_command.is_valid_response(self.notify_response):
-                self.notify_future.set_result(self.notify_response)
-            else:
-                self.notify_future.set_exception(ParseError('Failed checksum'))
-        elif self.current_command.is_exception_response(self.notify_response):
-            # We got a MODBUS command exception
-            msg = f'MODBUS Exception {self.current_command}: {self.notify_response[2]}'
-            self.notify_future.set_exception(ModbusError(msg))
+            try:
+                used = self.assembler.feed(data)
+            except ParseError as err:
+                # The rest of the notification can't be framed anymore
+                self.assembling = None
+                pending.response_future.set_exception(err)
+                return
+
+            data = data[used:]
+            if not self.assembler.complete:
+                return
+
+            self.assembling = None
+            try:
+                pending.response_future.set_result(self.assembler.result())
+            except (ModbusError, ParseError) as err:
+                pending.response_future.set_exception(err)
+
+            pending = self._current_pending()
@@ -0,0 +1,74 @@
+import asyncio
+from collections import deque
+from enum import IntEnum, unique
+from typing import Any, Deque, Dict
+
+
+@unique
+class Priority(IntEnum):
+    USER_WRITE = 0  # Commands from MQTT, someone is waiting for them
+    LIVE_POLL = 1  # Regular polling
+    BULK_POLL = 2  # Pack polling, logging and other slow reads
+
+
+class CommandQueue:
+    """
+    A command queue with priority classes. Higher priority commands are sent
+    first and commands of the same class are sent in order.
+
+    So that busy higher priority classes can't starve the others, a class
+    that was passed over MAX_SKIPS times in a row is served next.
+    """
+
+    MAX_SKIPS = 8
+
+    def __init__(self):
+        self._queues: Dict[Priority, Deque[Any]] = {p: deque() for p in Priority}
+        self._skips: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._unfinished = 0
+        self._not_empty = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def qsize(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    async def put(self, item: Any, priority: Priority = Priority.LIVE_POLL):
+        self.put_nowait(item, priority)
+
+    def put_nowait(self, item: Any, priority: Priority = Priority.LIVE_POLL):
+        self._queues[priority].append(item)
+        self._unfinished += 1
+        self._finished.clear()
+        self._not_empty.set()
+
+    async def get(self) -> Any:
+        while self.empty():
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+    def get_nowait(self) -> Any:
+        waiting = [p for p in Priority if self._queues[p]]
+        if not waiting:
+            raise asyncio.QueueEmpty()
+
+        # Serve the highest priority class, unless another was skipped too often
+        starved = [p for p in waiting if self._skips[p] >= self.MAX_SKIPS]
+        served = starved[0] if starved else waiting[0]
+        for p in waiting:
+            self._skips[p] = 0 if p == served else self._skips[p] + 1
+        return self._queues[served].popleft()
+
+    def task_done(self):
+        if self._unfinished <= 0:
+            raise ValueError('task_done() called too many times')
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._finished.set()
+
+    async def join(self):
+        await self._finished.wait()
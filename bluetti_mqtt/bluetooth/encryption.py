@@ -47,21 +47,24 @@ the Connection class for the callbacks used.
 
 
 import asyncio
+import functools
 import hashlib
+import inspect
 import logging
 import os
 import textwrap
 from collections.abc import Callable
 from enum import Enum
-from typing import Any, Awaitable
+from typing import Any, Awaitable, Optional, Union
 
-import pyasn1.codec.der.decoder as der_decoder
-import pyasn1.codec.der.encoder as der_encoder
 from cryptography.exceptions import InvalidSignature
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import (
+    decode_dss_signature,
+    encode_dss_signature,
+)
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from pyasn1.type import univ
 
 # This will use the same private key on every run, along with a null IV.
 # Helpful if you're working with packet dumps, but leave to False outside of
@@ -100,6 +103,21 @@ def is_device_using_encryption(manufacturer_data):
 ## Crypto helpers - Most of those are specific to what Bluetti is doing
 
 
+def log_enabled(level=logging.DEBUG):
+    # Hex dumps are costly to format, only build them when they'll be logged
+    return logging.getLogger().isEnabledFor(level)
+
+
+def aes_algorithm(aes_key):
+    """Accepts raw key bytes, or an AES object prepared once for a key in use"""
+    if isinstance(aes_key, algorithms.AES):
+        return aes_key
+    return algorithms.AES(aes_key)
+
+
+_ZERO_PADDING = bytes(AES_BLOCK_SIZE)
+
+
 def aes_decrypt(data, aes_key, iv):
     # 0086 3044e63d 05820d1...
     # |    |        |> Cipher text
@@ -111,38 +129,50 @@ def aes_decrypt(data, aes_key, iv):
         iv = hashlib.md5(data[2:6]).digest()
         encrypted = memoryview(data)[6:]
     else:
-        encrypted = memoryview(data[2:])
+        encrypted = memoryview(data)[2:]
 
     if len(encrypted) % AES_BLOCK_SIZE != 0:
         raise ValueError("Data not aligned on aes block size")
 
-    cipher = Cipher(algorithms.AES(aes_key), modes.CBC(iv))
-    decryptor = cipher.decryptor()
-    decrypted = decryptor.update(encrypted) + decryptor.finalize()
-    decrypted = decrypted[:data_len]
+    # update_into wants room for one more block than it produces
+    decrypted = bytearray(len(encrypted) + AES_BLOCK_SIZE - 1)
+    decryptor = Cipher(aes_algorithm(aes_key), modes.CBC(iv)).decryptor()
+    decryptor.update_into(encrypted, decrypted)
+    decryptor.finalize()
+    del decrypted[data_len:]
 
-    logging.debug(">PLAIN " + decrypted.hex())
+    if log_enabled():
+        logging.debug(">PLAIN " + decrypted.hex())
     return decrypted
 
 
 def aes_encrypt(data, aes_key, iv):
-    message_header = int.to_bytes(len(data), 2, "big")
+    header_len = 2
     if iv is None:
         iv_seed = os.urandom(4)
         if TESTING_ONLY_NO_RANDOM:
             iv_seed = bytes(4)
         iv = hashlib.md5(iv_seed).digest()
-        message_header += iv_seed
+        header_len += len(iv_seed)
 
     padding = (AES_BLOCK_SIZE - len(data) % AES_BLOCK_SIZE) % AES_BLOCK_SIZE
-    data += bytes(padding)
-
-    cipher = Cipher(algorithms.AES(aes_key), modes.CBC(iv))
-    encryptor = cipher.encryptor()
-    encrypted = encryptor.update(data) + encryptor.finalize()
-    encrypted = message_header + encrypted
-
-    logging.debug("PLAIN> " + data.hex())
+    size = header_len + len(data) + padding
+
+    # Header and cipher text go straight into one buffer
+    encrypted = bytearray(size + AES_BLOCK_SIZE - 1)
+    encrypted[0:2] = len(data).to_bytes(2, "big")
+    if header_len > 2:
+        encrypted[2:header_len] = iv_seed
+    out = memoryview(encrypted)
+    encryptor = Cipher(aes_algorithm(aes_key), modes.CBC(iv)).encryptor()
+    written = encryptor.update_into(data, out[header_len:])
+    encryptor.update_into(_ZERO_PADDING[:padding], out[header_len + written:])
+    encryptor.finalize()
+    out.release()
+    del encrypted[size:]
+
+    if log_enabled():
+        logging.debug("PLAIN> " + (bytes(data) + _ZERO_PADDING[:padding]).hex())
     return encrypted
 
 
@@ -198,20 +228,33 @@ def generate_keypair():
     return (private.public_key(), private)
 
 
+@functools.lru_cache(maxsize=None)
+def signature_verify_key():
+    """The well-known key peers sign their pubkey with, loaded once per process"""
+    return serialization.load_der_public_key(
+        bytes.fromhex(SignatureCrypt.PUBLIC_KEY_K2.value)
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def signature_signing_key():
+    """The well-known key we sign our pubkey with, derived once per process"""
+    signing_secret = int.from_bytes(
+        bytes.fromhex(SignatureCrypt.PRIVATE_KEY_L1.value), "big"
+    )
+    return ec.derive_private_key(signing_secret, ec.SECP256R1())
+
+
 def raw_ecdsa_to_der(sig):
     # <byte r[32]> <byte s[32]>
 
     if len(sig) != 64:
         raise ValueError("ecdsa signature is the wrong size")
 
-    seq = univ.SequenceOf()
-    seq.extend(
-        [
-            univ.Integer(int.from_bytes(sig[:32], "big")),  # r
-            univ.Integer(int.from_bytes(sig[32:], "big")),  # s
-        ]
+    return encode_dss_signature(
+        int.from_bytes(sig[:32], "big"),  # r
+        int.from_bytes(sig[32:], "big"),  # s
     )
-    return der_encoder.encode(seq)
 
 
 def der_to_raw_ecdsa(sig):
@@ -227,14 +270,11 @@ def der_to_raw_ecdsa(sig):
     #       |  |---> Length
     #       |------> DER type (int)
 
-    seq, remainder = der_decoder.decode(sig)
-    if remainder:
-        raise ValueError("Found trailing data")
-
-    return b"".join([int.to_bytes(int(x), 0x20, "big") for x in seq])
+    r, s = decode_dss_signature(sig)
+    return int.to_bytes(r, 0x20, "big") + int.to_bytes(s, 0x20, "big")
 
 
-def verify_and_extract_signed_data(message, signed_data_suffix):
+def verify_and_extract_signed_data(message, signed_data_suffix, verify_key=None):
     # 64 bytes of data
     # 64 bytes of signature
     if len(message) != 128:
@@ -242,11 +282,12 @@ def verify_and_extract_signed_data(message, signed_data_suffix):
 
     data = message[:64]
     signature = message[64:]
-    signed_data = data.tobytes() + signed_data_suffix
+    signed_data = bytes(data) + signed_data_suffix
     der_signature = raw_ecdsa_to_der(signature)
+    if verify_key is None:
+        verify_key = signature_verify_key()
     try:
-        key_bytes = bytes.fromhex(SignatureCrypt.PUBLIC_KEY_K2.value)
-        serialization.load_der_public_key(key_bytes).verify(
+        verify_key.verify(
             der_signature, signed_data, ec.ECDSA(hashes.SHA256())
         )
         logging.debug("Signature OK")
@@ -323,18 +364,21 @@ class Message:
 class Connection:
     def __init__(
         self,
-        on_plaintext_packet: Callable[[bytearray], Awaitable[None]],
+        on_plaintext_packet: Callable[[bytearray], Union[None, Awaitable[None]]],
         write: Callable[[bytes], Awaitable[Any]],
     ):
         """
         - write is what we call when we want to push raw bytes to the connection
-        - on_plaintext_packet is what we call when we have fresh (decrypted) data available
-        - on_packet is what we expect someone (the owner of the connection) to call
-          when new data is available
+        - on_plaintext_packet is what we call when we have fresh (decrypted) data available,
+          it can either be a coroutine function or a plain function
+        - receive (or on_packet, if you want to handle ordering yourself) is what we expect
+          someone (the owner of the connection) to call when new data is available
         """
         self.on_plaintext_packet = on_plaintext_packet
         self.write_raw_packet = write
         self.ready_event = asyncio.Event()
+        self._packets: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
 
     async def wait_until_ready(self):
         """
@@ -343,6 +387,36 @@ class Connection:
         """
         raise NotImplementedError()
 
+    def receive(self, buffer: bytearray) -> None:
+        """
+        Takes a packet from a (synchronous) notification callback. Packets are handled one
+        at a time, in the order they arrived, by a single consumer task.
+        """
+        if self._packets is None:
+            self._packets = asyncio.Queue()
+            self._consumer = asyncio.get_running_loop().create_task(self._consume())
+        self._packets.put_nowait(buffer)
+
+    def close(self) -> None:
+        """Drops the packets that weren't handled yet, e.g. when disconnecting"""
+        if self._consumer is not None:
+            self._consumer.cancel()
+        self._packets = None
+        self._consumer = None
+
+    async def _consume(self):
+        while True:
+            buffer = await self._packets.get()
+            try:
+                await self.on_packet(buffer)
+            except Exception:
+                logging.exception("Error handling packet")
+
+    async def deliver_plaintext(self, buffer: bytearray) -> None:
+        result = self.on_plaintext_packet(buffer)
+        if inspect.isawaitable(result):
+            await result
+
     async def on_packet(self, buffer: bytearray) -> None:
         raise NotImplementedError()
 
@@ -354,8 +428,17 @@ class Connection:
 
 
 class PassthroughConnection(Connection):
+    def receive(self, buffer: bytearray) -> None:
+        # Nothing to decrypt, so a plain function can be called right away
+        if inspect.iscoroutinefunction(self.on_plaintext_packet):
+            return super().receive(buffer)
+        try:
+            self.on_plaintext_packet(buffer)
+        except Exception:
+            logging.exception("Error handling packet")
+
     async def on_packet(self, buffer: bytearray) -> None:
-        await self.on_plaintext_packet(buffer)
+        await self.deliver_plaintext(buffer)
 
     async def write(self, buffer: bytes) -> None:
         await self.write_raw_packet(buffer)
@@ -365,6 +448,23 @@ class PassthroughConnection(Connection):
 
 
 class EncryptedConnection(Connection):
+    def __init__(
+        self,
+        on_plaintext_packet: Callable[[bytearray], Union[None, Awaitable[None]]],
+        write: Callable[[bytes], Awaitable[Any]],
+        offload_crypto: bool = False,
+        peer_verify_key: Optional[ec.EllipticCurvePublicKey] = None,
+    ):
+        """
+        - offload_crypto runs the ECDSA / ECDH work of the handshake in a thread, so that
+          it doesn't block the event loop (and the other devices it serves)
+        - peer_verify_key checks the signature of the peer pubkey, only to be replaced when
+          talking to a simulated device (see bluetti_mqtt.bluetooth.simulator)
+        """
+        super().__init__(on_plaintext_packet, write)
+        self.offload_crypto = offload_crypto
+        self.peer_verify_key = peer_verify_key
+
     # Derived exclusively from data sent over the network
     # Used for the initial handshake
     unsecure_aes_key: bytes | None = None
@@ -379,6 +479,10 @@ class EncryptedConnection(Connection):
     # IV is random per message
     secure_aes_key: bytes | None = None
 
+    # The keys above, prepared once for the cipher
+    unsecure_aes: algorithms.AES | None = None
+    secure_aes: algorithms.AES | None = None
+
     # Received through key exchange
     # The signing key for the key exchange is well-known
     peer_pubkey: bytes | None = None
@@ -398,9 +502,9 @@ class EncryptedConnection(Connection):
             raise ValueError("Received encrypted message before key initialization")
 
         key, iv = (
-            (self.unsecure_aes_key, self.unsecure_aes_iv)
+            (self.unsecure_aes or self.unsecure_aes_key, self.unsecure_aes_iv)
             if self.secure_aes_key is None
-            else (self.secure_aes_key, None)
+            else (self.secure_aes or self.secure_aes_key, None)
         )
         decrypted = Message(aes_decrypt(message.buffer, key, iv))
 
@@ -411,13 +515,13 @@ class EncryptedConnection(Connection):
             if decrypted.type == MessageType.PUBKEY_ACCEPTED:
                 return await self.msg_key_accepted(decrypted)
 
-        await self.on_plaintext_packet(decrypted.buffer)
+        await self.deliver_plaintext(decrypted.buffer)
 
     async def write(self, buffer: bytes) -> None:
         if self.secure_aes_key is None:
             raise RuntimeError("Encryption handshake not finished yet")
 
-        encrypted = aes_encrypt(buffer, self.secure_aes_key, None)
+        encrypted = aes_encrypt(buffer, self.secure_aes or self.secure_aes_key, None)
         await self.write_raw_packet(encrypted)
 
     async def wait_until_ready(self):
@@ -431,9 +535,11 @@ class EncryptedConnection(Connection):
         self.unsecure_aes_iv = hashlib.md5(message.data[::-1].tobytes()).digest()
         static_key = bytes.fromhex(ConnConstantsV2.LOCAL_AES_KEY.value)
         self.unsecure_aes_key = hexxor(self.unsecure_aes_iv, static_key)
+        self.unsecure_aes = algorithms.AES(self.unsecure_aes_key)
 
-        logging.info("Unsecure iv  " + self.unsecure_aes_iv.hex())
-        logging.info("Unsecure key " + self.unsecure_aes_key.hex())
+        if log_enabled(logging.INFO):
+            logging.info("Unsecure iv  " + self.unsecure_aes_iv.hex())
+            logging.info("Unsecure key " + self.unsecure_aes_key.hex())
 
         body = bytes.fromhex("0204") + self.unsecure_aes_iv[8:12]
         await self.write_raw_packet(b"".join([KEX_MAGIC, body, hexsum(body, 2)]))
@@ -447,8 +553,14 @@ class EncryptedConnection(Connection):
             raise ValueError("Challenge response is not 0")
 
     async def msg_peer_pubkey(self, message: Message) -> None:
+        encrypted_msg = await self.run_crypto(self.answer_peer_pubkey, message.data)
+        await self.write_raw_packet(encrypted_msg)
+
+    def answer_peer_pubkey(self, data: memoryview) -> bytes:
         logging.debug("Received peer pubkey, checking signature")
-        data = verify_and_extract_signed_data(message.data, self.unsecure_aes_iv)
+        data = verify_and_extract_signed_data(
+            data, self.unsecure_aes_iv, self.peer_verify_key
+        )
         self.peer_pubkey = pubkey_from_bytes(data)
 
         logging.debug("Generating a local keypair")
@@ -456,18 +568,13 @@ class EncryptedConnection(Connection):
         my_pubkey_bytes = pubkey_to_bytes(self.my_pubkey)
 
         logging.debug("Signing the local pubkey")
-        signing_secret = int.from_bytes(
-            bytes.fromhex(SignatureCrypt.PRIVATE_KEY_L1.value), "big"
-        )
-        signing_key = ec.derive_private_key(signing_secret, ec.SECP256R1())
         to_sign = my_pubkey_bytes + self.unsecure_aes_iv
-        signature = signing_key.sign(to_sign, ec.ECDSA(hashes.SHA256()))
+        signature = signature_signing_key().sign(to_sign, ec.ECDSA(hashes.SHA256()))
         raw_signature = der_to_raw_ecdsa(signature)
 
         body = b"".join([bytes.fromhex("0580"), my_pubkey_bytes, raw_signature])
         msg = b"".join([KEX_MAGIC, body, hexsum(body, 2)])
-        encrypted_msg = aes_encrypt(msg, self.unsecure_aes_key, self.unsecure_aes_iv)
-        await self.write_raw_packet(encrypted_msg)
+        return aes_encrypt(msg, self.unsecure_aes or self.unsecure_aes_key, self.unsecure_aes_iv)
 
     async def msg_key_accepted(self, message: Message) -> None:
         logging.debug("Received key exchange confirmation, calculating shared secret")
@@ -477,11 +584,20 @@ class EncryptedConnection(Connection):
         if message.data[0] != 0:
             raise ValueError("Key acceptance response is not 0")
 
-        self.secure_aes_key = self.my_privkey.exchange(ec.ECDH(), self.peer_pubkey)
-        logging.info("Secure key   " + self.secure_aes_key.hex())
+        self.secure_aes_key = await self.run_crypto(
+            self.my_privkey.exchange, ec.ECDH(), self.peer_pubkey
+        )
+        self.secure_aes = algorithms.AES(self.secure_aes_key)
+        if log_enabled(logging.INFO):
+            logging.info("Secure key   " + self.secure_aes_key.hex())
 
         self.ready_event.set()
 
+    async def run_crypto(self, func, *args):
+        if not self.offload_crypto:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
 
 ## The encapsulated messages look like this, check out other bluetti libraries for parsing
 
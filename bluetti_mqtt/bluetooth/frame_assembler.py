@@ -0,0 +1,93 @@
+from typing import Optional
+from bluetti_mqtt.core import DeviceCommand, ReadHoldingRegisters
+from bluetti_mqtt.core.utils import modbus_crc
+from .exc import ModbusError, ParseError
+
+
+MODBUS_ADDRESS = 1
+EXCEPTION_FRAME_SIZE = 5
+CRC_INITIAL = 0xFFFF
+
+
+class FrameAssembler:
+    """
+    Reassembles MODBUS response frames from BLE notifications.
+
+    Each frame is written into a buffer of exactly the expected size, and the
+    CRC is updated as chunks arrive, so completing a frame only needs to
+    compare the last two bytes. Exception frames and headers that can't
+    belong to the command are detected from the first bytes. Completed frames
+    are handed out as a memoryview of their buffer, which is never reused.
+    """
+
+    def __init__(self):
+        self.command: Optional[DeviceCommand] = None
+        self._buffer = bytearray()
+        self._size = 0
+        self._pos = 0
+        self._crc = CRC_INITIAL
+
+    def start(self, command: DeviceCommand):
+        """Starts assembling the response to the given command"""
+        self.command = command
+        self._size = command.response_size()
+        self._buffer = bytearray(self._size)
+        self._pos = 0
+        self._crc = CRC_INITIAL
+
+    @property
+    def complete(self) -> bool:
+        return self._pos == self._size
+
+    def feed(self, data: memoryview) -> int:
+        """
+        Copies as much of data as belongs to the current frame, and returns
+        how many bytes were used. Raises ParseError as soon as the frame
+        header turns out not to match the command.
+        """
+        used = 0
+        while used < len(data) and self._pos < self._size:
+            # Stop at the end of the header fields, so they can be checked first
+            if self._pos < 2:
+                end = 2
+            elif self._pos < 3:
+                end = 3
+            else:
+                end = self._size
+            take = min(end - self._pos, len(data) - used)
+            chunk = data[used:used + take]
+            self._buffer[self._pos:self._pos + take] = chunk
+
+            # The CRC covers everything but the last two bytes
+            crc_end = min(self._pos + take, self._size - 2)
+            if crc_end > self._pos:
+                self._crc = modbus_crc(chunk[:crc_end - self._pos], self._crc)
+
+            self._pos += take
+            used += take
+            if self._pos == 2 or self._pos == 3:
+                self._check_header()
+        return used
+
+    def result(self) -> memoryview:
+        """Returns the completed frame, or raises the error it holds"""
+        frame = memoryview(self._buffer)[:self._size]
+        if frame[-2] != self._crc & 0xFF or frame[-1] != self._crc >> 8:
+            raise ParseError('Failed checksum')
+        if self._size == EXCEPTION_FRAME_SIZE and self.command.is_exception_response(frame):
+            raise ModbusError(f'MODBUS Exception {self.command}: {frame[2]}')
+        return frame
+
+    def _check_header(self):
+        buffer = self._buffer
+        if self._pos == 2:
+            if buffer[0] != MODBUS_ADDRESS:
+                raise ParseError(f'Unexpected MODBUS address {buffer[0]}')
+            if self.command.is_exception_response(buffer):
+                # Exception frames are shorter than any response
+                self._size = EXCEPTION_FRAME_SIZE
+            elif buffer[1] != self.command.function_code:
+                raise ParseError(f'Unexpected function code {buffer[1]}')
+        elif isinstance(self.command, ReadHoldingRegisters) and self._size != EXCEPTION_FRAME_SIZE:
+            if buffer[2] != 2 * self.command.quantity:
+                raise ParseError(f'Unexpected response length {buffer[2]} for {self.command}')
@@ -1,17 +1,20 @@
 import asyncio
 import logging
-from typing import Dict, List
-from bleak import BleakScanner
+from typing import Dict, List, Optional
 from bluetti_mqtt.core import DeviceCommand
 from .client import BluetoothClient
+from .command_queue import Priority
 from .encryption import is_device_using_encryption
+from .transport import DEFAULT_TRANSPORT, BleakTransport
 
 
 class MultiDeviceManager:
     clients: Dict[str, BluetoothClient]
 
-    def __init__(self, addresses: List[str]):
+    def __init__(self, addresses: List[str], pipeline_depth: int = 1, transport: Optional[BleakTransport] = None):
         self.addresses = addresses
+        self.pipeline_depth = pipeline_depth
+        self.transport = transport or DEFAULT_TRANSPORT
         self.clients = {}
 
     async def run(self):
@@ -19,14 +22,14 @@ class MultiDeviceManager:
 
         # Perform a blocking scan just to speed up initial connect
         # We also need some info from the advertisement data
-        devices = await BleakScanner.discover(return_adv=True)
+        devices = await self.transport.discover()
 
         # Start client loops
         self.clients = {}
         for address in self.addresses:
             if (scan_record := devices.get(address)) is not None:
                 encryped = is_device_using_encryption(scan_record[1].manufacturer_data)
-                self.clients[address] = BluetoothClient(address, encryped)
+                self.clients[address] = BluetoothClient(address, encryped, self.pipeline_depth, self.transport)
             else:
                 logging.warning(f"Address {address} not found in scan data")
 
@@ -44,14 +47,14 @@ class MultiDeviceManager:
         else:
             raise Exception('Unknown address')
 
-    async def perform(self, address: str, command: DeviceCommand):
+    async def perform(self, address: str, command: DeviceCommand, priority: Priority = Priority.LIVE_POLL):
         if address in self.clients:
-            return await self.clients[address].perform(command)
+            return await self.clients[address].perform(command, priority)
         else:
             raise Exception('Unknown address')
 
-    async def perform_nowait(self, address: str, command: DeviceCommand):
+    async def perform_nowait(self, address: str, command: DeviceCommand, priority: Priority = Priority.LIVE_POLL):
         if address in self.clients:
-            await self.clients[address].perform_nowait(command)
+            await self.clients[address].perform_nowait(command, priority)
         else:
             raise Exception('Unknown address')
@@ -0,0 +1,92 @@
+import asyncio
+from bleak import BleakError
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, cast
+from bluetti_mqtt.core import BluettiDevice, DeviceCommand, ReadHoldingRegisters
+from .exc import BadConnectionError, ModbusError, ParseError
+
+
+class PackSwitcher:
+    """
+    Waits for a device to switch to another battery pack after pack_num is
+    written, by reading back the pack number it reports.
+
+    The time a switch takes is learned per device type, so later switches
+    only start reading back once the switch is expected to be nearly done.
+    """
+
+    RETRY_INTERVAL = 0.5
+    TIMEOUT = 15
+    FALLBACK_DELAY = 10  # Used when the device has no readable pack number
+
+    # Learned switch durations by device type
+    _switch_times: Dict[str, float] = {}
+
+    def __init__(self, device: BluettiDevice, perform: Callable[[DeviceCommand], Awaitable[asyncio.Future]]):
+        self.device = device
+        self.perform = perform
+
+        # The pack number the device reports is outside its writable ranges,
+        # the writable one just echoes back the requested pack
+        ranges = device.writable_ranges
+        self.readback_command: Optional[ReadHoldingRegisters] = next(
+            (
+                ReadHoldingRegisters(f.address, f.size)
+                for f in device.struct.get_fields('pack_num')
+                if not any(f.address in r for r in ranges)
+            ),
+            None
+        )
+
+    @property
+    def expected_switch_time(self) -> Optional[float]:
+        return PackSwitcher._switch_times.get(self.device.type)
+
+    async def wait_for_pack(self, pack: int) -> bool:
+        """
+        Waits until the device reports the given pack, after pack_num was
+        written. Returns False if the switch could not be confirmed in time.
+        """
+        start_time = time.monotonic()
+        if self.readback_command is None:
+            await asyncio.sleep(self.FALLBACK_DELAY)
+            return False
+
+        # Skip the reads that would most likely still return the old pack
+        expected = self.expected_switch_time
+        if expected is not None:
+            await asyncio.sleep(expected * 0.75)
+
+        reads = 0
+        while True:
+            reads += 1
+            if await self._read_pack() == pack:
+                # A match on the very first read usually means the device was
+                # already on that pack, which says nothing about switch times
+                if reads > 1 or expected is not None:
+                    self._learn(time.monotonic() - start_time)
+                return True
+            if time.monotonic() - start_time >= self.TIMEOUT:
+                logging.debug(f'{self.device.type} did not confirm switching to pack {pack}')
+                return False
+            await asyncio.sleep(self.RETRY_INTERVAL)
+
+    async def _read_pack(self) -> Optional[int]:
+        command = self.readback_command
+        try:
+            response = cast(bytes, await (await self.perform(command)))
+            parsed = self.device.parse(command.starting_address, command.parse_response(response))
+            return parsed.get('pack_num')
+        except (BadConnectionError, BleakError, ModbusError, ParseError) as err:
+            logging.debug(f'Could not read back pack number: {err}')
+            return None
+
+    def _learn(self, elapsed: float):
+        expected = self.expected_switch_time
+        if expected is None:
+            expected = elapsed
+        else:
+            expected = 0.7 * expected + 0.3 * elapsed
+        PackSwitcher._switch_times[self.device.type] = expected
+        logging.debug(f'Switching packs on {self.device.type} took {elapsed:.1f}s (expecting {expected:.1f}s)')
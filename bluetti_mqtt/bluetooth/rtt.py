@@ -0,0 +1,49 @@
+import random
+from typing import Dict
+
+
+class RttEstimator:
+    """
+    Estimates command round trip times to size response timeouts, in the
+    style of TCP's retransmission timer (RFC 6298): a smoothed RTT plus four
+    times its mean deviation.
+
+    Responses take longer the more notifications they span, so estimates are
+    kept separately for each bucket of response sizes. Until a bucket has a
+    sample the initial timeout is used.
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+    BUCKET_SIZE = 64  # Bytes
+
+    def __init__(self, initial_timeout: float, min_timeout: float = 1.0):
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self._srtt: Dict[int, float] = {}
+        self._rttvar: Dict[int, float] = {}
+
+    def timeout(self, response_size: int) -> float:
+        bucket = response_size // self.BUCKET_SIZE
+        if bucket not in self._srtt:
+            return self.initial_timeout
+        rto = self._srtt[bucket] + self.K * self._rttvar[bucket]
+        return min(max(rto, self.min_timeout), self.initial_timeout)
+
+    def sample(self, response_size: int, rtt: float):
+        """Records the round trip time of a command that was not retried"""
+        bucket = response_size // self.BUCKET_SIZE
+        if bucket not in self._srtt:
+            self._srtt[bucket] = rtt
+            self._rttvar[bucket] = rtt / 2
+        else:
+            srtt = self._srtt[bucket]
+            self._rttvar[bucket] = (1 - self.BETA) * self._rttvar[bucket] + self.BETA * abs(srtt - rtt)
+            self._srtt[bucket] = (1 - self.ALPHA) * srtt + self.ALPHA * rtt
+
+
+def backoff_delay(attempt: int, base: float = 0.25, cap: float = 5.0) -> float:
+    """Exponential backoff for the given retry attempt (from 1), with jitter"""
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
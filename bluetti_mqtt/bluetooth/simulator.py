@@ -0,0 +1,348 @@
+"""
+Simulated Bluetti devices, for testing and benchmarking without BLE hardware.
+
+EncryptedPeer implements the device side of the handshake in encryption.py:
+it sends the challenge, signs its pubkey and derives the shared secret. Real
+devices sign with a key only they know, so the peer signs with its own key,
+and connections talking to it need its verify_key as their peer_verify_key.
+
+SimulatedTransport plugs simulated devices into BluetoothClient and
+MultiDeviceManager in place of bleak. Each SimulatedDevice answers MODBUS
+commands from a register bank laid out after its device definition, with
+configurable MTU, latency and notification loss.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import struct
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from bluetti_mqtt.core.devices.struct import EnumField
+from bluetti_mqtt.core.utils import modbus_crc
+from . import build_device
+from .client import BluetoothClient
+from .transport import BleakTransport
+from .encryption import (
+    KEX_MAGIC,
+    BleConfig,
+    ConnConstantsV2,
+    Message,
+    MessageType,
+    aes_decrypt,
+    aes_encrypt,
+    generate_keypair,
+    hexsum,
+    hexxor,
+    pubkey_from_bytes,
+    pubkey_to_bytes,
+    raw_ecdsa_to_der,
+    der_to_raw_ecdsa,
+    signature_signing_key,
+)
+
+
+def kex_message(message_type: MessageType, data: bytes) -> bytes:
+    body = bytes([message_type.value, len(data) & 0xFF]) + data
+    return b"".join([KEX_MAGIC, body, hexsum(body, 2)])
+
+
+class EncryptedPeer:
+    def __init__(
+        self,
+        send: Callable[[bytes], None],
+        on_plaintext_packet: Optional[Callable[[bytes], None]] = None,
+        signing_key: Optional[ec.EllipticCurvePrivateKey] = None,
+    ):
+        """
+        - send is what we call to push raw bytes to the connection
+        - on_plaintext_packet is called with decrypted data once the handshake is done
+        - signing_key signs our pubkey, a fresh one is generated if not given
+        """
+        self.send = send
+        self.on_plaintext_packet = on_plaintext_packet
+        self.signing_key = signing_key or ec.generate_private_key(ec.SECP256R1())
+        self.unsecure_aes_key: Optional[bytes] = None
+        self.unsecure_aes_iv: Optional[bytes] = None
+        self.secure_aes_key: Optional[bytes] = None
+
+    @property
+    def verify_key(self) -> ec.EllipticCurvePublicKey:
+        return self.signing_key.public_key()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.secure_aes_key is not None
+
+    def start(self):
+        """Sends the challenge that starts the handshake"""
+        seed = os.urandom(4)
+        self.unsecure_aes_iv = hashlib.md5(seed[::-1]).digest()
+        static_key = bytes.fromhex(ConnConstantsV2.LOCAL_AES_KEY.value)
+        self.unsecure_aes_key = hexxor(self.unsecure_aes_iv, static_key)
+        self.secure_aes_key = None
+        self.send(kex_message(MessageType.CHALLENGE, seed))
+
+    def on_packet(self, buffer: bytes):
+        """Handles a raw packet written by the connection"""
+        if bytes(buffer[:2]) == KEX_MAGIC:
+            return self._challenge_answer(Message(buffer))
+        if self.secure_aes_key is None:
+            message = Message(aes_decrypt(buffer, self.unsecure_aes_key, self.unsecure_aes_iv))
+            return self._peer_pubkey(message)
+
+        plaintext = aes_decrypt(buffer, self.secure_aes_key, None)
+        if self.on_plaintext_packet is not None:
+            self.on_plaintext_packet(plaintext)
+
+    def write(self, buffer: bytes):
+        """Sends data to the connection, encrypted with the shared secret"""
+        if self.secure_aes_key is None:
+            raise RuntimeError("Encryption handshake not finished yet")
+        self.send(aes_encrypt(buffer, self.secure_aes_key, None))
+
+    def _challenge_answer(self, message: Message):
+        message.verify_checksum()
+        if bytes(message.body) != bytes.fromhex("0204") + self.unsecure_aes_iv[8:12]:
+            raise ValueError("Wrong challenge answer")
+
+        self.send(kex_message(MessageType.CHALLENGE_ACCEPTED, b"\x00"))
+
+        # Sign and send our pubkey right away
+        self.my_pubkey, self.my_privkey = generate_keypair()
+        my_pubkey_bytes = pubkey_to_bytes(self.my_pubkey)
+        signature = self.signing_key.sign(
+            my_pubkey_bytes + self.unsecure_aes_iv, ec.ECDSA(hashes.SHA256())
+        )
+        msg = kex_message(MessageType.PEER_PUBKEY, my_pubkey_bytes + der_to_raw_ecdsa(signature))
+        self.send(aes_encrypt(msg, self.unsecure_aes_key, self.unsecure_aes_iv))
+
+    def _peer_pubkey(self, message: Message):
+        message.verify_checksum()
+        # The connection answers with type 5, which has no MessageType
+        if not message.is_pre_key_exchange or message.body[0] != 5:
+            raise ValueError("Expected the peer pubkey")
+
+        data = message.data
+        if len(data) != 128:
+            raise ValueError("Unexpected message length")
+        signature_signing_key().public_key().verify(
+            raw_ecdsa_to_der(data[64:]),
+            bytes(data[:64]) + self.unsecure_aes_iv,
+            ec.ECDSA(hashes.SHA256()),
+        )
+        peer_pubkey = pubkey_from_bytes(bytes(data[:64]))
+
+        msg = kex_message(MessageType.PUBKEY_ACCEPTED, b"\x00")
+        self.send(aes_encrypt(msg, self.unsecure_aes_key, self.unsecure_aes_iv))
+        self.secure_aes_key = self.my_privkey.exchange(ec.ECDH(), peer_pubkey)
+        logging.debug("Simulated peer finished the handshake")
+
+
+## MODBUS device
+
+# MODBUS exception codes
+ILLEGAL_FUNCTION = 1
+ILLEGAL_DATA_ADDRESS = 2
+
+
+def modbus_frame(body: bytes) -> bytes:
+    frame = bytes([1]) + body
+    return frame + modbus_crc(frame).to_bytes(2, "little")
+
+
+class SimulatedDevice:
+    def __init__(
+        self,
+        address: str,
+        name: str,
+        encrypted: bool = False,
+        registers: Optional[Dict[int, int]] = None,
+        mtu: int = 23,
+        latency: float = 0.0,
+        loss: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        """
+        - name is the advertised name, which selects the device definition (e.g. AC3001234)
+        - registers overrides the initial register values, by address
+        - mtu bounds the notification size (minus 3 bytes of ATT header)
+        - latency is how long responses take, in seconds
+        - loss is the probability of each notification getting lost
+        """
+        self.address = address
+        self.name = name
+        self.encrypted = encrypted
+        self.mtu = mtu
+        self.latency = latency
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.signing_key = ec.generate_private_key(ec.SECP256R1())
+
+        self.device = build_device(address, name)
+        if self.device is None:
+            raise ValueError(f"Unknown device name {name}")
+        self.registers = self._initial_registers()
+        self.registers.update(registers or {})
+
+    def _initial_registers(self) -> Dict[int, int]:
+        """Zeroes every register the device definition reads, except enums"""
+        device = self.device
+        registers = {}
+        for command in device.polling_commands + device.logging_commands + device.pack_logging_commands:
+            start = command.starting_address
+            registers.update((a, 0) for a in range(start, start + command.quantity))
+        for r in device.writable_ranges:
+            registers.update((a, 0) for a in r)
+
+        # Enums have no member for 0, start them on their first value
+        for field in device.struct.fields:
+            if isinstance(field, EnumField) and field.address in registers:
+                registers[field.address] = next(iter(field.enum)).value
+        return registers
+
+    def handle(self, frame: bytes) -> Optional[bytes]:
+        """Returns the response to a MODBUS command, None if it's unreadable"""
+        if len(frame) < 4 or modbus_crc(frame[:-2]) != int.from_bytes(frame[-2:], "little"):
+            return None
+
+        function_code = frame[1]
+        if function_code == 3:
+            start, quantity = struct.unpack_from("!HH", frame, 2)
+            addresses = range(start, start + quantity)
+            if not all(a in self.registers for a in addresses):
+                return self._exception(function_code, ILLEGAL_DATA_ADDRESS)
+            values = [self.registers[a] for a in addresses]
+            body = struct.pack(f"!BB{quantity}H", 3, 2 * quantity, *values)
+            return modbus_frame(body)
+        if function_code == 6:
+            address, value = struct.unpack_from("!HH", frame, 2)
+            if not self._write(address, [value]):
+                return self._exception(function_code, ILLEGAL_DATA_ADDRESS)
+            return bytes(frame)
+        if function_code == 16:
+            start, quantity = struct.unpack_from("!HH", frame, 2)
+            values = struct.unpack_from(f"!{quantity}H", frame, 7)
+            if not self._write(start, values):
+                return self._exception(function_code, ILLEGAL_DATA_ADDRESS)
+            return modbus_frame(bytes(frame[1:6]))
+        return self._exception(function_code, ILLEGAL_FUNCTION)
+
+    def _write(self, start: int, values) -> bool:
+        addresses = range(start, start + len(values))
+        ranges = self.device.writable_ranges
+        if not all(any(a in r for r in ranges) for a in addresses):
+            return False
+
+        for address, value in zip(addresses, values):
+            self.registers[address] = value
+            # Settings are reported back in read-only registers of the same name
+            for field in self.device.struct.fields_in_range(address, address + 1):
+                for other in self.device.struct.get_fields(field.name):
+                    if other.address in self.registers:
+                        self.registers[other.address] = value
+        return True
+
+    def _exception(self, function_code: int, code: int) -> bytes:
+        return modbus_frame(bytes([function_code + 0x80, code]))
+
+
+class SimulatedBleakClient:
+    """Emulates the BleakClient GATT surface BluetoothClient uses, on a SimulatedDevice"""
+
+    def __init__(self, device: SimulatedDevice):
+        self.device = device
+        self.is_connected = False
+        self.peer: Optional[EncryptedPeer] = None
+        self._callback: Optional[Callable[[Any, bytearray], None]] = None
+
+    async def connect(self, **kwargs):
+        await asyncio.sleep(self.device.latency)
+        self.is_connected = True
+        return True
+
+    async def disconnect(self):
+        self.is_connected = False
+        self._callback = None
+        self.peer = None
+        return True
+
+    async def read_gatt_char(self, uuid: str) -> bytearray:
+        if uuid != BluetoothClient.DEVICE_NAME_UUID:
+            raise ValueError(f"Unknown characteristic {uuid}")
+        await asyncio.sleep(self.device.latency)
+        return bytearray(self.device.name.encode("ascii"))
+
+    async def start_notify(self, uuid: str, callback: Callable[[Any, bytearray], None], **kwargs):
+        if uuid != BluetoothClient.NOTIFY_UUID:
+            raise ValueError(f"Unknown characteristic {uuid}")
+        self._callback = callback
+        if self.device.encrypted:
+            self.peer = EncryptedPeer(
+                self._send, self._on_command, signing_key=self.device.signing_key
+            )
+            self.peer.start()
+
+    async def write_gatt_char(self, uuid: str, data: bytes, response: Optional[bool] = None):
+        if uuid != BluetoothClient.WRITE_UUID:
+            raise ValueError(f"Unknown characteristic {uuid}")
+        if self.peer is not None:
+            self.peer.on_packet(bytes(data))
+        else:
+            self._on_command(bytes(data))
+
+    def _on_command(self, frame: bytes):
+        response = self.device.handle(frame)
+        if response is None:
+            return
+        if self.peer is not None:
+            # Encrypted messages aren't split across notifications
+            self.peer.write(response)
+        else:
+            self._send(response)
+
+    def _send(self, data: bytes):
+        """Sends data as notifications, once the latency has passed"""
+        if self.peer is None:
+            size = self.device.mtu - 3
+            chunks = [data[i:i + size] for i in range(0, len(data), size)]
+        else:
+            chunks = [data]
+        asyncio.get_running_loop().call_later(self.device.latency, self._notify, chunks)
+
+    def _notify(self, chunks: List[bytes]):
+        for chunk in chunks:
+            if self._callback is None:
+                return
+            if self.device.loss and self.device.random.random() < self.device.loss:
+                continue
+            self._callback(None, bytearray(chunk))
+
+
+class SimulatedTransport(BleakTransport):
+    """A transport for BluetoothClient / MultiDeviceManager backed by SimulatedDevices"""
+
+    def __init__(self, devices: List[SimulatedDevice]):
+        self.devices = {d.address: d for d in devices}
+
+    def create_client(self, address: str) -> SimulatedBleakClient:
+        return SimulatedBleakClient(self.devices[address])
+
+    async def discover(self) -> Dict[str, Tuple[Any, Any]]:
+        encrypted_data = {0x4C42: bytes.fromhex(BleConfig.ENCRYPTED_ESP32_HEX.value)}
+        return {
+            d.address: (
+                SimpleNamespace(address=d.address, name=d.name),
+                SimpleNamespace(manufacturer_data=encrypted_data if d.encrypted else {}),
+            )
+            for d in self.devices.values()
+        }
+
+    def peer_verify_key(self, address: str) -> Optional[ec.EllipticCurvePublicKey]:
+        return self.devices[address].signing_key.public_key()
@@ -0,0 +1,26 @@
+from typing import Any, Dict, Optional, Tuple
+from bleak import BleakClient, BleakScanner
+from cryptography.hazmat.primitives.asymmetric import ec
+
+
+class BleakTransport:
+    """
+    Where BluetoothClient and MultiDeviceManager get their BLE clients and
+    scan results from. This one uses the real Bluetooth adapter through
+    bleak, see bluetti_mqtt.bluetooth.simulator for a simulated one.
+    """
+
+    def create_client(self, address: str) -> Any:
+        """Returns a client with the BleakClient methods BluetoothClient uses"""
+        return BleakClient(address)
+
+    async def discover(self) -> Dict[str, Tuple[Any, Any]]:
+        """Scans for devices, like BleakScanner.discover(return_adv=True)"""
+        return await BleakScanner.discover(return_adv=True)
+
+    def peer_verify_key(self, address: str) -> Optional[ec.EllipticCurvePublicKey]:
+        """The key encrypted devices sign their pubkey with, None for the well-known one"""
+        return None
+
+
+DEFAULT_TRANSPORT = BleakTransport()
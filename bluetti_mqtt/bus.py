@@ -1,7 +1,9 @@
 import asyncio
+from collections import OrderedDict, deque
 from dataclasses import dataclass
+from enum import Enum, auto, unique
 import logging
-from typing import Callable, List, Union
+from typing import Any, Awaitable, Callable, Deque, Hashable, List, Optional, Set, Tuple, Union
 from bluetti_mqtt.core import BluettiDevice, DeviceCommand
 
 
@@ -9,6 +11,7 @@ from bluetti_mqtt.core import BluettiDevice, DeviceCommand
 class ParserMessage:
     device: BluettiDevice
     parsed: dict
+    window: Optional[Tuple[int, int]] = None  # (starting address, quantity) of the read
 
 
 @dataclass(frozen=True)
@@ -17,38 +20,165 @@ class CommandMessage:
     command: DeviceCommand
 
 
+def coalesce_key(msg: ParserMessage) -> Hashable:
+    """Messages with the same key carry newer values of the same registers"""
+    window = msg.window if msg.window is not None else tuple(msg.parsed)
+    # Pack logging reads the same window once for every pack
+    return (msg.device.address, window, msg.parsed.get('pack_num'))
+
+
+class CoalescingQueue:
+    """
+    A bounded queue that only keeps the newest item for each key. A newer
+    item takes the place of the pending one, and when the queue is full the
+    oldest item is dropped. Items without a key are never merged or dropped,
+    and are handed out first.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.merged = 0
+        self.dropped = 0
+        self._items: OrderedDict = OrderedDict()
+        self._unkeyed: Deque[Any] = deque()
+        self._not_empty = asyncio.Event()
+
+    def qsize(self) -> int:
+        return len(self._items) + len(self._unkeyed)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def put_nowait(self, item: Any, key: Optional[Hashable] = None):
+        if key is None:
+            self._unkeyed.append(item)
+        elif key in self._items:
+            self._items[key] = item
+            self.merged += 1
+        else:
+            if len(self._items) >= self.maxsize:
+                self._items.popitem(last=False)
+                self.dropped += 1
+                logging.debug(f'Queue full, dropped the oldest message ({self.dropped} so far)')
+            self._items[key] = item
+        self._not_empty.set()
+
+    async def get(self) -> Any:
+        while self.empty():
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+    def get_nowait(self) -> Any:
+        if self._unkeyed:
+            return self._unkeyed.popleft()
+        if self._items:
+            return self._items.popitem(last=False)[1]
+        raise asyncio.QueueEmpty()
+
+    def task_done(self):
+        pass
+
+
+@unique
+class OverflowPolicy(Enum):
+    BLOCK = auto()  # Wait for the listener to catch up
+    COALESCE = auto()  # Keep the newest message per device and read window (see CoalescingQueue)
+
+
 class EventBus:
-    parser_listeners: List[Callable[[ParserMessage], None]]
-    command_listeners: List[Callable[[CommandMessage], None]]
-    queue: asyncio.Queue
+    """
+    Delivers messages to listeners. Each parser listener has its own queue
+    and consumer task, so a slow listener only holds up its own messages.
+    Command messages have a separate lane, ahead of any parser messages.
+    """
 
-    def __init__(self):
+    parser_listeners: List[Callable[[ParserMessage], Awaitable[None]]]
+    command_listeners: List[Callable[[CommandMessage], Awaitable[None]]]
+    parser_queues: List[Union[asyncio.Queue, CoalescingQueue]]
+    command_queue: asyncio.Queue
+
+    def __init__(self, max_pending: Optional[int] = None):
+        """
+        max_pending is the default queue limit for parser listeners, None
+        for unbounded queues.
+        """
         self.parser_listeners = []
         self.command_listeners = []
-        self.queue = None
+        self.parser_queues = []
+        self.command_queue = asyncio.Queue()
+        self.max_pending = max_pending
+        self._running = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    def add_parser_listener(
+        self,
+        cb: Callable[[ParserMessage], Awaitable[None]],
+        max_pending: Optional[int] = None,
+        overflow: OverflowPolicy = OverflowPolicy.COALESCE
+    ) -> Union[asyncio.Queue, CoalescingQueue]:
+        """Adds a listener, and returns its queue"""
+        if max_pending is None:
+            max_pending = self.max_pending
+        if max_pending is None:
+            queue = asyncio.Queue()
+        elif overflow == OverflowPolicy.BLOCK:
+            queue = asyncio.Queue(max_pending)
+        else:
+            queue = CoalescingQueue(max_pending)
 
-    def add_parser_listener(self, cb: Callable[[ParserMessage], None]):
         self.parser_listeners.append(cb)
+        self.parser_queues.append(queue)
+        if self._running:
+            self._start(self._consume_parser_messages(cb, queue))
+        return queue
 
-    def add_command_listener(self, cb: Callable[[CommandMessage], None]):
+    def add_command_listener(self, cb: Callable[[CommandMessage], Awaitable[None]]):
         self.command_listeners.append(cb)
 
     async def put(self, msg: Union[ParserMessage, CommandMessage]):
-        if not self.queue:
-            self.queue = asyncio.Queue()
-
-        await self.queue.put(msg)
+        if isinstance(msg, ParserMessage):
+            for queue in self.parser_queues:
+                if isinstance(queue, CoalescingQueue):
+                    queue.put_nowait(msg, coalesce_key(msg))
+                else:
+                    await queue.put(msg)
+        elif isinstance(msg, CommandMessage):
+            self.command_queue.put_nowait(msg)
 
     """Reads messages and notifies listeners"""
     async def run(self):
-        if not self.queue:
-            self.queue = asyncio.Queue()
+        self._running = True
+        for cb, queue in zip(self.parser_listeners, self.parser_queues):
+            self._start(self._consume_parser_messages(cb, queue))
+        try:
+            await self._consume_commands()
+        finally:
+            self._running = False
+            for task in list(self._tasks):
+                task.cancel()
+
+    def _start(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _consume_parser_messages(self, cb, queue):
+        while True:
+            msg = await queue.get()
+            try:
+                await cb(msg)
+            except Exception:
+                logging.exception(f'Parser listener {cb} failed')
+            queue.task_done()
 
+    async def _consume_commands(self):
         while True:
-            msg = await self.queue.get()
-            logging.debug(f'queue size: {self.queue.qsize()}')
-            if isinstance(msg, ParserMessage):
-                await asyncio.gather(*[pl(msg) for pl in self.parser_listeners])
-            elif isinstance(msg, CommandMessage):
-                await asyncio.gather(*[cl(msg) for cl in self.command_listeners])
-            self.queue.task_done()
+            msg = await self.command_queue.get()
+            results = await asyncio.gather(
+                *[cl(msg) for cl in self.command_listeners], return_exceptions=True
+            )
+            for cb, result in zip(self.command_listeners, results):
+                if isinstance(result, Exception):
+                    logging.error(f'Command listener {cb} failed', exc_info=result)
+            self.command_queue.task_done()
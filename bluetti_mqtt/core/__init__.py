@@ -1,4 +1,5 @@
 from .devices.bluetti_device import BluettiDevice
+from .devices.struct import NumericMode
 from .devices.v2_device import V2Device
 from .devices.ac200m import AC200M
 from .devices.ac300 import AC300
@@ -8,6 +9,7 @@ from .devices.ep500 import EP500
 from .devices.ep500p import EP500P
 from .devices.ep600 import EP600
 from .devices.eb3a import EB3A
+from .schedule import PollingWindow
 from .commands import (
     DeviceCommand,
     ReadHoldingRegisters,
@@ -1,4 +1,5 @@
 import struct
+from typing import Dict, Tuple
 from .utils import modbus_crc
 
 
@@ -6,19 +7,19 @@ class DeviceCommand:
     def __init__(self, function_code: int, data: bytes):
         self.function_code = function_code
 
-        self.cmd = bytearray(len(data) + 4)
-        self.cmd[0] = 1  # MODBUS address
-        self.cmd[1] = function_code
-        self.cmd[2:-2] = data
-        struct.pack_into('<H', self.cmd, -2, modbus_crc(self.cmd[:-2]))
+        cmd = bytearray(len(data) + 4)
+        cmd[0] = 1  # MODBUS address
+        cmd[1] = function_code
+        cmd[2:-2] = data
+        struct.pack_into('<H', cmd, -2, modbus_crc(cmd[:-2]))
+        self.frame = bytes(cmd)
 
     def response_size(self) -> int:
         """Returns the expected response size in bytes"""
         pass
 
-    def __iter__(self):
-        """Provide an iter implemention so that bytes(cmd) works"""
-        return iter(self.cmd)
+    def __bytes__(self):
+        return self.frame
 
     def is_exception_response(self, response: bytes):
         """Checks the response code to see if it's a MODBUS exception"""
@@ -32,9 +33,8 @@ class DeviceCommand:
         if len(response) < 3:
             return False
 
-        crc = modbus_crc(response[0:-2])
-        crc_bytes = crc.to_bytes(2, byteorder='little')
-        return response[-2:] == crc_bytes
+        crc = modbus_crc(memoryview(response)[:-2])
+        return response[-2] == crc & 0xFF and response[-1] == crc >> 8
 
     def parse_response(self, response: bytes):
         """Returns the raw body of the response"""
@@ -42,17 +42,42 @@ class DeviceCommand:
 
 
 class ReadHoldingRegisters(DeviceCommand):
+    """
+    Reads are built over and over again while polling, so instances are
+    interned: creating a read that was created before returns the same
+    immutable object, with its frame and response size already computed.
+    """
+
+    MAX_INTERNED = 1024
+    _interned: Dict[Tuple[type, int, int], 'ReadHoldingRegisters'] = {}
+
+    def __new__(cls, starting_address: int, quantity: int):
+        key = (cls, starting_address, quantity)
+        command = cls._interned.get(key)
+        if command is None:
+            command = super().__new__(cls)
+            command._build(starting_address, quantity)
+            if len(cls._interned) < cls.MAX_INTERNED:
+                cls._interned[key] = command
+        return command
+
     def __init__(self, starting_address: int, quantity: int):
+        # Everything is set up once, in __new__
+        pass
+
+    def _build(self, starting_address: int, quantity: int):
         self.starting_address = starting_address
         self.quantity = quantity
 
-        super().__init__(3, struct.pack('!HH', starting_address, quantity))
-
-    def response_size(self):
         # 3 byte header
         # each returned field is actually 2 bytes (16-bit word)
         # 2 byte crc
-        return 2 * self.quantity + 5
+        self._response_size = 2 * quantity + 5
+
+        super().__init__(3, struct.pack('!HH', starting_address, quantity))
+
+    def response_size(self):
+        return self._response_size
 
     def parse_response(self, response: bytes):
         return bytes(response[3:-2])
@@ -6,20 +6,24 @@ from .struct import DeviceStruct
 
 class AC60(BluettiDevice):
     def __init__(self, address: str, sn: str):
-        self.struct = DeviceStruct()
+        super().__init__(address, 'AC60', sn)
 
-        self.struct.add_uint_field('total_battery_percent', 102)
-        self.struct.add_swap_string_field('device_type', 110, 6)
-        self.struct.add_sn_field('serial_number', 116)
-        self.struct.add_decimal_field('power_generation', 154, 1)  # Total power generated since last reset (kwh)
-        self.struct.add_swap_string_field('device_type', 1101, 6)
-        self.struct.add_sn_field('serial_number', 1107)
-        self.struct.add_decimal_field('power_generation', 1202, 1)  # Total power generated since last reset (kwh)
-        self.struct.add_swap_string_field('battery_type', 6101, 6)
-        self.struct.add_sn_field('battery_serial_number', 6107)
-        self.struct.add_version_field('bcu_version', 6175)
+    @classmethod
+    def build_struct(cls) -> DeviceStruct:
+        struct = DeviceStruct()
 
-        super().__init__(address, 'AC60', sn)
+        struct.add_uint_field('total_battery_percent', 102)
+        struct.add_swap_string_field('device_type', 110, 6)
+        struct.add_sn_field('serial_number', 116)
+        struct.add_decimal_field('power_generation', 154, 1)  # Total power generated since last reset (kwh)
+        struct.add_swap_string_field('device_type', 1101, 6)
+        struct.add_sn_field('serial_number', 1107)
+        struct.add_decimal_field('power_generation', 1202, 1)  # Total power generated since last reset (kwh)
+        struct.add_swap_string_field('battery_type', 6101, 6)
+        struct.add_sn_field('battery_serial_number', 6107)
+        struct.add_version_field('bcu_version', 6175)
+
+        return struct
 
     @property
     def polling_commands(self) -> List[ReadHoldingRegisters]:
@@ -1,18 +1,42 @@
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 from ..commands import ReadHoldingRegisters, WriteSingleRegister
-from .struct import BoolField, DeviceStruct, EnumField
+from ..schedule import PollingWindow
+from .struct import BoolField, DeviceField, DeviceStruct, EnumField, NumericMode
 
 
 class BluettiDevice:
     struct: DeviceStruct
+    numeric_mode: NumericMode = NumericMode.DECIMAL
+
+    # Register maps (and the writable field lookups derived from them) are
+    # built once per device class and shared by all of its instances
+    _shared_structs: Dict[type, DeviceStruct] = {}
+    _shared_setter_fields: Dict[type, Dict[str, Optional[DeviceField]]] = {}
 
     def __init__(self, address: str, type: str, sn: str):
         self.address = address
         self.type = type
         self.sn = sn
+        self.struct = self.shared_struct()
+        self._setter_fields = BluettiDevice._shared_setter_fields.setdefault(self.__class__, {})
+
+    @classmethod
+    def build_struct(cls) -> DeviceStruct:
+        """Builds the register map for this device class"""
+        raise NotImplementedError
+
+    @classmethod
+    def shared_struct(cls) -> DeviceStruct:
+        """Returns the frozen register map shared by all devices of this class"""
+        struct = BluettiDevice._shared_structs.get(cls)
+        if struct is None:
+            struct = cls.build_struct()
+            struct.freeze()
+            BluettiDevice._shared_structs[cls] = struct
+        return struct
 
     def parse(self, address: int, data: bytes) -> dict:
-        return self.struct.parse(address, data)
+        return self.struct.parse(address, data, self.numeric_mode)
 
     @property
     def pack_num_max(self):
@@ -28,6 +52,14 @@ class BluettiDevice:
         """A given device has an optimal set of commands for polling"""
         raise NotImplementedError
 
+    @property
+    def polling_schedule(self) -> List[PollingWindow]:
+        """
+        The polling commands with their own polling periods. By default every
+        command is polled at the global polling interval.
+        """
+        return [PollingWindow(c) for c in self.polling_commands]
+
     @property
     def pack_polling_commands(self) -> List[ReadHoldingRegisters]:
         """A given device may have a set of commands for polling pack data"""
@@ -49,15 +81,15 @@ class BluettiDevice:
         return []
 
     def has_field(self, field: str):
-        return any(f.name == field for f in self.struct.fields)
+        return self.struct.has_field(field)
 
     def has_field_setter(self, field: str):
-        matches = [f for f in self.struct.fields if f.name == field]
-        return any(any(f.address in r for r in self.writable_ranges) for f in matches)
+        return self._get_setter_field(field) is not None
 
     def build_setter_command(self, field: str, value: Any):
-        matches = [f for f in self.struct.fields if f.name == field]
-        device_field = next(f for f in matches if any(f.address in r for r in self.writable_ranges))
+        device_field = self._get_setter_field(field)
+        if device_field is None:
+            raise ValueError(f'{self.type} has no writable field {field}')
 
         # Convert value to an integer
         if isinstance(device_field, EnumField):
@@ -66,3 +98,13 @@ class BluettiDevice:
             value = 1 if value else 0
 
         return WriteSingleRegister(device_field.address, value)
+
+    def _get_setter_field(self, field: str) -> Optional[DeviceField]:
+        """Returns the first field with the given name in a writable range"""
+        if field not in self._setter_fields:
+            ranges = self.writable_ranges
+            self._setter_fields[field] = next(
+                (f for f in self.struct.get_fields(field) if any(f.address in r for r in ranges)),
+                None
+            )
+        return self._setter_fields[field]
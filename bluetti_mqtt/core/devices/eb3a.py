@@ -1,6 +1,7 @@
 from enum import Enum, unique
 from typing import List
 from ..commands import ReadHoldingRegisters
+from ..schedule import PollingWindow
 from .bluetti_device import BluettiDevice
 from .struct import DeviceStruct
 from .v2_device import ChargingMode
@@ -24,39 +25,43 @@ class EcoShutdown(Enum):
 
 class EB3A(BluettiDevice):
     def __init__(self, address: str, sn: str):
-        self.struct = DeviceStruct()
+        super().__init__(address, 'EB3A', sn)
+
+    @classmethod
+    def build_struct(cls) -> DeviceStruct:
+        struct = DeviceStruct()
 
         # Core
-        self.struct.add_string_field('device_type', 10, 6)
-        self.struct.add_sn_field('serial_number', 17)
-        self.struct.add_version_field('arm_version', 23)
-        self.struct.add_version_field('dsp_version', 25)
-        self.struct.add_uint_field('dc_input_power', 36)
-        self.struct.add_uint_field('ac_input_power', 37)
-        self.struct.add_uint_field('ac_output_power', 38)
-        self.struct.add_uint_field('dc_output_power', 39)
-        self.struct.add_uint_field('total_battery_percent', 43)
-        self.struct.add_bool_field('ac_output_on', 48)
-        self.struct.add_bool_field('dc_output_on', 49)
+        struct.add_string_field('device_type', 10, 6)
+        struct.add_sn_field('serial_number', 17)
+        struct.add_version_field('arm_version', 23)
+        struct.add_version_field('dsp_version', 25)
+        struct.add_uint_field('dc_input_power', 36)
+        struct.add_uint_field('ac_input_power', 37)
+        struct.add_uint_field('ac_output_power', 38)
+        struct.add_uint_field('dc_output_power', 39)
+        struct.add_uint_field('total_battery_percent', 43)
+        struct.add_bool_field('ac_output_on', 48)
+        struct.add_bool_field('dc_output_on', 49)
 
         # Details
-        self.struct.add_decimal_field('ac_input_voltage', 77, 1)
-        self.struct.add_decimal_field('internal_dc_input_voltage', 86, 2)
+        struct.add_decimal_field('ac_input_voltage', 77, 1)
+        struct.add_decimal_field('internal_dc_input_voltage', 86, 2)
 
         # Battery Data
-        self.struct.add_uint_field('pack_num_max', 91)
+        struct.add_uint_field('pack_num_max', 91)
 
         # Controls
-        self.struct.add_bool_field('ac_output_on', 3007)
-        self.struct.add_bool_field('dc_output_on', 3008)
-        self.struct.add_enum_field('led_mode', 3034, LedMode)
-        self.struct.add_bool_field('power_off', 3060)
-        self.struct.add_bool_field('eco_on', 3063)
-        self.struct.add_enum_field('eco_shutdown', 3064, EcoShutdown)
-        self.struct.add_enum_field('charging_mode', 3065, ChargingMode)
-        self.struct.add_bool_field('power_lifting_on', 3066)
+        struct.add_bool_field('ac_output_on', 3007)
+        struct.add_bool_field('dc_output_on', 3008)
+        struct.add_enum_field('led_mode', 3034, LedMode)
+        struct.add_bool_field('power_off', 3060)
+        struct.add_bool_field('eco_on', 3063)
+        struct.add_enum_field('eco_shutdown', 3064, EcoShutdown)
+        struct.add_enum_field('charging_mode', 3065, ChargingMode)
+        struct.add_bool_field('power_lifting_on', 3066)
 
-        super().__init__(address, 'EB3A', sn)
+        return struct
 
     @property
     def polling_commands(self) -> List[ReadHoldingRegisters]:
@@ -67,6 +72,16 @@ class EB3A(BluettiDevice):
             ReadHoldingRegisters(3060, 7)
         ]
 
+    @property
+    def polling_schedule(self) -> List[PollingWindow]:
+        return [
+            PollingWindow(ReadHoldingRegisters(10, 17), once=True),  # Device type, serial number and versions
+            PollingWindow(ReadHoldingRegisters(36, 14)),
+            PollingWindow(ReadHoldingRegisters(70, 21)),
+            PollingWindow(ReadHoldingRegisters(3034, 1), interval=60),
+            PollingWindow(ReadHoldingRegisters(3060, 7), interval=60),
+        ]
+
     @property
     def logging_commands(self) -> List[ReadHoldingRegisters]:
         return [
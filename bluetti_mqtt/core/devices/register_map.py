@@ -0,0 +1,214 @@
+"""
+Declarative register maps.
+
+A register map is a JSON file that describes a device model without any code:
+its fields, enums, the register windows used for polling and logging, and
+which registers are writable. For example:
+
+    {
+        "type": "EP600",
+        "blocks": {"HOME_DATA": 100},
+        "fields": [
+            {"name": "total_battery_percent", "type": "uint", "address": "HOME_DATA+2"},
+            {"name": "device_type", "type": "swap_string", "address": 110, "size": 6}
+        ],
+        "polling_commands": [["HOME_DATA", 62]],
+        "logging_commands": [["HOME_DATA", 62]]
+    }
+
+Addresses are either plain integers or a block name with an optional offset.
+Field types match the DeviceStruct.add_*_field methods (uint8, uint, uint32,
+bool, enum, decimal, decimal32, decimal_array, string, swap_string, version
+and sn). Enum fields reference an entry in the "enums" object, which maps enum
+names to {"MEMBER": value} objects. Other optional keys are "chunk_size",
+"pack_num_max", "pack_polling_commands", "pack_logging_commands",
+"writable_ranges" (a list of [start, stop) pairs) and "renames".
+
+Compiling a map builds its DeviceStruct and the parse plan layouts for every
+window in its command lists.
+
+Maps in the "maps" directory next to this file, and in the directory given by
+the BLUETTI_MQTT_MAPS_DIR environment variable, are picked up automatically as
+supported models.
+"""
+
+from enum import Enum, unique
+import functools
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Type
+from ..commands import ReadHoldingRegisters
+from .bluetti_device import BluettiDevice
+from .struct import DeviceStruct
+
+
+MAPS_DIR = Path(__file__).parent / 'maps'
+
+# Field type -> (DeviceStruct method, extra parameters in call order)
+FIELD_TYPES = {
+    'uint8': ('add_uint8_field', ['range']),
+    'uint': ('add_uint_field', ['range']),
+    'uint32': ('add_uint32_field', ['range']),
+    'bool': ('add_bool_field', []),
+    'enum': ('add_enum_field', ['enum']),
+    'decimal': ('add_decimal_field', ['scale', 'range']),
+    'decimal32': ('add_decimal32_field', ['scale', 'range']),
+    'decimal_array': ('add_decimal_array_field', ['size', 'scale']),
+    'string': ('add_string_field', ['size']),
+    'swap_string': ('add_swap_string_field', ['size']),
+    'version': ('add_version_field', []),
+    'sn': ('add_sn_field', []),
+}
+OPTIONAL_PARAMS = {'range'}
+
+
+class RegisterMap:
+    def __init__(self, definition: Dict[str, Any], source: str = '<register map>'):
+        self.source = source
+
+        try:
+            self.type: str = definition['type']
+            self.chunk_size: int = definition.get('chunk_size', 2)
+            self.pack_num_max: int = definition.get('pack_num_max', 1)
+            self.blocks: Dict[str, int] = definition.get('blocks', {})
+            self.enums = {
+                name: unique(Enum(name, members))
+                for name, members in definition.get('enums', {}).items()
+            }
+            self.fields: List[Dict[str, Any]] = definition['fields']
+            self.renames: Dict[str, str] = definition.get('renames', {})
+            self.polling_commands = self._windows(definition['polling_commands'])
+            self.pack_polling_commands = self._windows(definition.get('pack_polling_commands', []))
+            self.logging_commands = self._windows(definition['logging_commands'])
+            self.pack_logging_commands = self._windows(definition.get('pack_logging_commands', []))
+            self.writable_ranges = [
+                range(self.resolve_address(start), self.resolve_address(stop))
+                for start, stop in definition.get('writable_ranges', [])
+            ]
+        except (KeyError, TypeError, ValueError) as err:
+            raise ValueError(f'{source}: invalid register map: {err!r}') from err
+        self._device_class: Optional[Type['RegisterMapDevice']] = None
+
+    def resolve_address(self, address) -> int:
+        """Resolves an integer address or a "BLOCK" / "BLOCK+offset" reference"""
+        if isinstance(address, int):
+            return address
+        block, _, offset = address.partition('+')
+        if block not in self.blocks:
+            raise ValueError(f'unknown block {block}')
+        return self.blocks[block] + (int(offset) if offset else 0)
+
+    def _windows(self, commands: List[list]) -> List[Tuple[int, int]]:
+        return [(self.resolve_address(start), quantity) for start, quantity in commands]
+
+    def build_struct(self) -> DeviceStruct:
+        struct = DeviceStruct(chunk_size=self.chunk_size)
+        for field in self.fields:
+            try:
+                method, params = FIELD_TYPES[field['type']]
+                args = [field['name'], self.resolve_address(field['address'])]
+                for param in params:
+                    if param == 'enum':
+                        args.append(self.enums[field['enum']])
+                    elif param == 'range' and field.get('range') is not None:
+                        args.append(tuple(field['range']))
+                    elif param not in OPTIONAL_PARAMS:
+                        args.append(field[param])
+                getattr(struct, method)(*args)
+            except (KeyError, TypeError, ValueError) as err:
+                raise ValueError(f'{self.source}: invalid field {field}: {err!r}') from err
+
+        if self.renames:
+            struct.rename_fields(self.renames)
+        return struct
+
+    @property
+    def windows(self) -> List[Tuple[int, int]]:
+        """All the (starting_address, data length) windows this map is read with"""
+        commands = (
+            self.polling_commands + self.pack_polling_commands +
+            self.logging_commands + self.pack_logging_commands
+        )
+        return sorted({(start, quantity * 2) for start, quantity in commands})
+
+    def compile(self) -> DeviceStruct:
+        """Builds the struct and the parse plan layouts for all of the map's windows"""
+        struct = self.build_struct()
+        struct.precompile(self.windows)
+        return struct
+
+    @property
+    def device_class(self) -> Type['RegisterMapDevice']:
+        """A device class for this model, shared by every caller"""
+        if self._device_class is None:
+            class_name = ''.join(c for c in self.type if c.isalnum())
+            self._device_class = type(class_name, (RegisterMapDevice,), {'register_map': self})
+        return self._device_class
+
+
+class RegisterMapDevice(BluettiDevice):
+    """A device defined entirely by a RegisterMap"""
+    register_map: RegisterMap
+
+    def __init__(self, address: str, sn: str):
+        super().__init__(address, self.register_map.type, sn)
+
+    @classmethod
+    def build_struct(cls) -> DeviceStruct:
+        return cls.register_map.compile()
+
+    @property
+    def pack_num_max(self):
+        return self.register_map.pack_num_max
+
+    @property
+    def polling_commands(self) -> List[ReadHoldingRegisters]:
+        return [ReadHoldingRegisters(s, q) for s, q in self.register_map.polling_commands]
+
+    @property
+    def pack_polling_commands(self) -> List[ReadHoldingRegisters]:
+        return [ReadHoldingRegisters(s, q) for s, q in self.register_map.pack_polling_commands]
+
+    @property
+    def logging_commands(self) -> List[ReadHoldingRegisters]:
+        return [ReadHoldingRegisters(s, q) for s, q in self.register_map.logging_commands]
+
+    @property
+    def pack_logging_commands(self) -> List[ReadHoldingRegisters]:
+        return [ReadHoldingRegisters(s, q) for s, q in self.register_map.pack_logging_commands]
+
+    @property
+    def writable_ranges(self) -> List[range]:
+        return self.register_map.writable_ranges
+
+
+@functools.lru_cache(maxsize=None)
+def load_register_map(path: Path) -> RegisterMap:
+    """Loads a register map file. Each file is only loaded once."""
+    with open(path, 'r') as f:
+        return RegisterMap(json.load(f), str(path))
+
+
+def map_directories() -> List[Path]:
+    directories = [MAPS_DIR]
+    extra = os.environ.get('BLUETTI_MQTT_MAPS_DIR')
+    if extra:
+        directories.append(Path(extra))
+    return directories
+
+
+def load_register_maps(directories: Optional[List[Path]] = None) -> Dict[str, RegisterMap]:
+    """Loads all the register maps in the given directories, keyed by device type"""
+    maps = {}
+    for directory in directories if directories is not None else map_directories():
+        for path in sorted(Path(directory).glob('*.json')):
+            try:
+                register_map = load_register_map(path.resolve())
+            except (OSError, ValueError) as err:
+                # A bad user map shouldn't take down every command
+                logging.error(f'Skipping register map {path}: {err}')
+                continue
+            maps[register_map.type] = register_map
+    return maps
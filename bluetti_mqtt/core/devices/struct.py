@@ -1,7 +1,8 @@
+from bisect import bisect_left, bisect_right
 from decimal import Decimal
-from enum import Enum
+from enum import Enum, auto, unique
 import struct
-from typing import Any, List, Optional, Tuple, Type
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type, Union
 
 
 def swap_bytes(data: bytes):
@@ -12,7 +13,19 @@ def swap_bytes(data: bytes):
     return arr
 
 
+@unique
+class NumericMode(Enum):
+    """How scaled numeric fields are represented in parsed values"""
+    DECIMAL = auto()  # Exact decimal.Decimal values
+    FLOAT = auto()  # Plain ints (unscaled fields) and floats, no Decimal allocation
+
+
 class DeviceField:
+    # Format characters (without byte order) for the raw values the field is
+    # decoded from. Fields that leave this empty are parsed from their raw
+    # bytes instead of being unpacked as part of a whole register window.
+    struct_format = ''
+
     def __init__(self, name: str, address: int, size: int, chunk_size: int = 2):
         self.name = name
         self.address = address
@@ -20,18 +33,28 @@ class DeviceField:
         self.chunk_size = chunk_size
 
     def parse(self, data: bytes) -> Any:
+        return self.decode(*struct.unpack('!' + self.struct_format, data))
+
+    def decode(self, *values) -> Any:
+        """Converts the unpacked raw values into the field value"""
         raise NotImplementedError
 
+    def decode_float(self, *values) -> Any:
+        """Like decode, but used in NumericMode.FLOAT"""
+        return self.decode(*values)
+
     def in_range(self, val: Any) -> bool:
         return True
 
 class Uint8Field(DeviceField):
+    struct_format = 'B'
+
     def __init__(self, name: str, address: int, range: Optional[Tuple[int, int]]):
         self.range = range
         super().__init__(name, address, 1, chunk_size=1)
 
-    def parse(self, data: bytes) -> int:
-        return data[0]
+    def decode(self, value: int) -> int:
+        return value
 
     def in_range(self, val: int) -> bool:
         if self.range is None:
@@ -41,12 +64,14 @@ class Uint8Field(DeviceField):
 
 # uint16
 class UintField(DeviceField):
+    struct_format = 'H'
+
     def __init__(self, name: str, address: int, range: Optional[Tuple[int, int]]):
         self.range = range
         super().__init__(name, address, 1)
 
-    def parse(self, data: bytes) -> int:
-        return struct.unpack('!H', data)[0]
+    def decode(self, value: int) -> int:
+        return value
 
     def in_range(self, val: int) -> bool:
         if self.range is None:
@@ -54,13 +79,16 @@ class UintField(DeviceField):
         else:
             return val >= self.range[0] and val <= self.range[1]
 
+# uint32, stored with the low word first
 class Uint32Field(DeviceField):
+    struct_format = '2H'
+
     def __init__(self, name: str, address: int, range: Optional[Tuple[int, int]]):
         self.range = range
         super().__init__(name, address, 2)
 
-    def parse(self, data: bytes) -> int:
-        return data[2] << 24 | data[3] << 16 | data[0] << 8 | data[1]
+    def decode(self, low: int, high: int) -> int:
+        return high << 16 | low
 
     def in_range(self, val: int) -> bool:
         if self.range is None:
@@ -69,32 +97,39 @@ class Uint32Field(DeviceField):
             return val >= self.range[0] and val <= self.range[1]
 
 class BoolField(DeviceField):
+    struct_format = 'H'
+
     def __init__(self, name: str, address: int):
         super().__init__(name, address, 1)
 
-    def parse(self, data: bytes) -> bool:
-        return struct.unpack('!H', data)[0] == 1
+    def decode(self, value: int) -> bool:
+        return value == 1
 
 
 class EnumField(DeviceField):
+    struct_format = 'H'
+
     def __init__(self, name: str, address: int, enum: Type[Enum]):
         self.enum = enum
         super().__init__(name, address, 1)
 
-    def parse(self, data: bytes) -> Any:
-        val = struct.unpack('!H', data)[0]
-        return self.enum(val)
+    def decode(self, value: int) -> Any:
+        return self.enum(value)
 
 
 class DecimalField(DeviceField):
+    struct_format = 'H'
+
     def __init__(self, name: str, address: int, scale: int, range: Optional[Tuple[int, int]]):
         self.scale = scale
         self.range = range
         super().__init__(name, address, 1)
 
-    def parse(self, data: bytes) -> Decimal:
-        val = Decimal(struct.unpack('!H', data)[0])
-        return val / 10 ** self.scale
+    def decode(self, value: int) -> Decimal:
+        return Decimal(value) / 10 ** self.scale
+
+    def decode_float(self, value: int) -> Union[int, float]:
+        return value / 10 ** self.scale if self.scale else value
 
     def in_range(self, val: Decimal) -> bool:
         if self.range is None:
@@ -103,15 +138,17 @@ class DecimalField(DeviceField):
             return val >= self.range[0] and val <= self.range[1]
 
 
+# Same word order as Uint32Field
 class Decimal32Field(DeviceField):
+    struct_format = '2H'
+
     def __init__(self, name: str, address: int, scale: int, range: Optional[Tuple[int, int]]):
         self.scale = scale
         self.range = range
         super().__init__(name, address, 2)
 
-    def parse(self, data: bytes) -> Decimal:
-        val = data[2] << 24 | data[3] << 16 | data[0] << 8 | data[1]
-        return val / 10 ** self.scale
+    def decode(self, low: int, high: int) -> Decimal:
+        return (high << 16 | low) / 10 ** self.scale
 
     def in_range(self, val: Decimal) -> bool:
         if self.range is None:
@@ -122,108 +159,305 @@ class Decimal32Field(DeviceField):
 class DecimalArrayField(DeviceField):
     def __init__(self, name: str, address: int, size: int, scale: int):
         self.scale = scale
+        self.struct_format = f'{size}H'
         super().__init__(name, address, size)
 
-    def parse(self, data: bytes) -> Decimal:
-        values = list(struct.unpack(f'!{self.size}H', data))
+    def decode(self, *values: int) -> Decimal:
         return [Decimal(v) / 10 ** self.scale for v in values]
 
+    def decode_float(self, *values: int) -> List[Union[int, float]]:
+        if not self.scale:
+            return list(values)
+        divisor = 10 ** self.scale
+        return [v / divisor for v in values]
+
 
 class StringField(DeviceField):
     """Fixed-width null-terminated string field"""
-    def parse(self, data: bytes) -> str:
-        return data.rstrip(b'\0').decode('ascii')
+    def __init__(self, name: str, address: int, size: int):
+        super().__init__(name, address, size)
+        self.struct_format = f'{self.chunk_size * size}s'
+
+    def decode(self, value: bytes) -> str:
+        return value.rstrip(b'\0').decode('ascii')
 
 
-class SwapStringField(DeviceField):
+class SwapStringField(StringField):
     """Fixed-width null-terminated string field"""
-    def parse(self, data: bytes) -> str:
-        return swap_bytes(data).rstrip(b'\0').decode('ascii')
+    def decode(self, value: bytes) -> str:
+        return swap_bytes(value).rstrip(b'\0').decode('ascii')
 
 
 class VersionField(DeviceField):
+    struct_format = '2H'
+
     def __init__(self, name: str, address: int):
         super().__init__(name, address, 2)
 
-    def parse(self, data: bytes) -> int:
-        values = struct.unpack('!2H', data)
-        return Decimal(values[0] + (values[1] << 16)) / 100
+    def decode(self, low: int, high: int) -> int:
+        return Decimal(low + (high << 16)) / 100
+
+    def decode_float(self, low: int, high: int) -> float:
+        return (low + (high << 16)) / 100
 
 
 class SerialNumberField(DeviceField):
+    struct_format = '4H'
+
     def __init__(self, name: str, address: int):
         super().__init__(name, address, 4)
 
-    def parse(self, data: bytes) -> int:
-        values = struct.unpack('!4H', data)
+    def decode(self, *values: int) -> int:
         return values[0] + (values[1] << 16) + (values[2] << 32) + (values[3] << 48)
 
 
+# The struct format for a whole window, and for each field in the window
+# either its (first value index, value count) or None if it is parsed on its own
+PlanLayout = Tuple[str, List[Optional[Tuple[int, int]]]]
+
+
+class ParsePlan:
+    """
+    Compiled parser for a single register window.
+
+    All fields that can be expressed as struct format characters are unpacked
+    with a single precompiled struct.Struct call (gaps between fields become
+    pad bytes), and then converted from a table of decoders. Fields that
+    cannot be part of the combined format (overlapping another field, or
+    without a struct_format) are parsed from their own slice of the data.
+    """
+
+    def __init__(
+        self,
+        fields: List[Tuple[DeviceField, int, int]],
+        numeric_mode: NumericMode = NumericMode.DECIMAL,
+        layout: Optional[PlanLayout] = None
+    ):
+        if layout is None:
+            layout = self.build_layout(fields)
+        fmt, value_indexes = layout
+        self.unpack_from = struct.Struct(fmt).unpack_from
+
+        # Decoders are kept in field order. Entries either decode a run of
+        # unpacked values, or (with a count of 0) get passed the whole data.
+        self.table = []
+        for (f, data_start, data_end), value_index in zip(fields, value_indexes):
+            decode = f.decode_float if numeric_mode == NumericMode.FLOAT else f.decode
+            # Fields without a range always pass, so skip the check entirely
+            in_range = f.in_range if getattr(f, 'range', None) is not None else None
+            if value_index is not None:
+                index, count = value_index
+                self.table.append((f.name, decode, in_range, index, index + count, count))
+            elif f.struct_format:
+                # Overlapping field, unpack it separately
+                unpack_from = struct.Struct('!' + f.struct_format).unpack_from
+                self.table.append((
+                    f.name,
+                    lambda data, u=unpack_from, d=decode, o=data_start: d(*u(data, o)),
+                    in_range, 0, 0, 0
+                ))
+            else:
+                self.table.append((
+                    f.name,
+                    lambda data, p=f.parse, s=data_start, e=data_end: p(data[s:e]),
+                    in_range, 0, 0, 0
+                ))
+
+    @staticmethod
+    def build_layout(fields: List[Tuple[DeviceField, int, int]]) -> PlanLayout:
+        """Combines the fields of a window into a single struct format"""
+        fmt = ['!']
+        offset = 0
+        value_count = 0
+        value_indexes: List[Optional[Tuple[int, int]]] = [None] * len(fields)
+
+        # Fields are laid out in address order
+        order = sorted(range(len(fields)), key=lambda i: fields[i][1])
+        for i in order:
+            f, data_start, data_end = fields[i]
+            if not f.struct_format or data_start < offset:
+                continue
+            field_struct = struct.Struct('!' + f.struct_format)
+            if field_struct.size != data_end - data_start:
+                continue
+
+            if data_start > offset:
+                fmt.append(f'{data_start - offset}x')
+            fmt.append(f.struct_format)
+            count = len(field_struct.unpack(bytes(field_struct.size)))
+            value_indexes[i] = (value_count, count)
+            value_count += count
+            offset = data_end
+
+        return ''.join(fmt), value_indexes
+
+    def parse(self, data: bytes) -> dict:
+        values = self.unpack_from(data)
+
+        parsed = {}
+        for name, decode, in_range, start, end, count in self.table:
+            if count == 1:
+                val = decode(values[start])
+            elif count > 1:
+                val = decode(*values[start:end])
+            else:
+                val = decode(data)
+
+            # Skip if the value is "out-of-range" - sometimes the sensors
+            # report weird values
+            if in_range is not None and not in_range(val):
+                continue
+
+            parsed[name] = val
+
+        return parsed
+
+
 class DeviceStruct:
-    fields: List[DeviceField]
+    fields: Sequence[DeviceField]
 
     def __init__(self, chunk_size=2):
         self.chunk_size = chunk_size
         self.fields = []
+        self._plans: Dict[Tuple[int, int, NumericMode], ParsePlan] = {}
+        self._layouts: Dict[Tuple[int, int], PlanLayout] = {}
+
+        # Lookup indexes: field names, and (address, position in self.fields)
+        # pairs kept sorted by address
+        self._fields_by_name: Dict[str, List[DeviceField]] = {}
+        self._address_index: List[Tuple[int, int]] = []
+        self.frozen = False
+
+    def freeze(self):
+        """Marks the struct as complete, after which fields can no longer change"""
+        self.fields = tuple(self.fields)
+        self.frozen = True
+
+    def _check_not_frozen(self):
+        if self.frozen:
+            raise RuntimeError('Cannot modify a frozen DeviceStruct')
+
+    def _add_field(self, field: DeviceField):
+        self._check_not_frozen()
+        entry = (field.address, len(self.fields))
+        self._address_index.insert(bisect_right(self._address_index, entry), entry)
+        self._fields_by_name.setdefault(field.name, []).append(field)
+        self.fields.append(field)
+        self._plans.clear()
+        self._layouts.clear()
+
+    def has_field(self, name: str) -> bool:
+        return name in self._fields_by_name
+
+    def get_fields(self, name: str) -> List[DeviceField]:
+        """Returns all the fields with the given name, in the order they were added"""
+        return self._fields_by_name.get(name, [])
+
+    def fields_in_range(self, start: int, end: int) -> List[DeviceField]:
+        """Returns the fields starting at an address in [start, end), in the order they were added"""
+        lo = bisect_left(self._address_index, (start, -1))
+        hi = bisect_left(self._address_index, (end, -1))
+        return [self.fields[i] for i in sorted(i for _, i in self._address_index[lo:hi])]
+
+    def rename_fields(self, names: Dict[str, str]):
+        """Renames fields, given a mapping of old names to new names"""
+        self._check_not_frozen()
+        for field in self.fields:
+            if (new_name := names.get(field.name)) is not None:
+                field.name = new_name
+
+        self._fields_by_name = {}
+        for field in self.fields:
+            self._fields_by_name.setdefault(field.name, []).append(field)
+        self._plans.clear()
+        self._layouts.clear()
 
     def add_uint8_field(self, name: str, address: int, range: Tuple[int, int] = None):
-        self.fields.append(Uint8Field(name, address, range))
+        self._add_field(Uint8Field(name, address, range))
 
     def add_uint_field(self, name: str, address: int, range: Tuple[int, int] = None):
-        self.fields.append(UintField(name, address, range))
+        self._add_field(UintField(name, address, range))
 
     def add_uint32_field(self, name: str, address: int, range: Tuple[int, int] = None):
-        self.fields.append(Uint32Field(name, address, range))
+        self._add_field(Uint32Field(name, address, range))
 
     def add_bool_field(self, name: str, address: int):
-        self.fields.append(BoolField(name, address))
+        self._add_field(BoolField(name, address))
 
     def add_enum_field(self, name: str, address: int, enum: Type[Enum]):
-        self.fields.append(EnumField(name, address, enum))
+        self._add_field(EnumField(name, address, enum))
 
     def add_decimal_field(self, name: str, address: int, scale: int, range: Tuple[int, int] = None):
-        self.fields.append(DecimalField(name, address, scale, range))
+        self._add_field(DecimalField(name, address, scale, range))
 
     def add_decimal32_field(self, name: str, address: int, scale: int, range: Tuple[int, int] = None):
-        self.fields.append(Decimal32Field(name, address, scale, range))
+        self._add_field(Decimal32Field(name, address, scale, range))
 
     def add_decimal_array_field(self, name: str, address: int, size: int, scale: int):
-        self.fields.append(DecimalArrayField(name, address, size, scale))
+        self._add_field(DecimalArrayField(name, address, size, scale))
 
     def add_string_field(self, name: str, address: int, size: int):
-        self.fields.append(StringField(name, address, size))
+        self._add_field(StringField(name, address, size))
 
     def add_swap_string_field(self, name: str, address: int, size: int):
-        self.fields.append(SwapStringField(name, address, size))
+        self._add_field(SwapStringField(name, address, size))
 
     def add_version_field(self, name: str, address: int):
-        self.fields.append(VersionField(name, address))
+        self._add_field(VersionField(name, address))
 
     def add_sn_field(self, name: str, address: int):
-        self.fields.append(SerialNumberField(name, address))
-
-    def parse(self, starting_address: int, data: bytes) -> dict:
+        self._add_field(SerialNumberField(name, address))
+
+    def parse(
+        self,
+        starting_address: int,
+        data: bytes,
+        numeric_mode: NumericMode = NumericMode.DECIMAL
+    ) -> dict:
+        plan = self._plans.get((starting_address, len(data), numeric_mode))
+        if plan is None:
+            plan = self._compile_plan(starting_address, len(data), numeric_mode)
+        return plan.parse(data)
+
+    def precompile(self, windows: Iterable[Tuple[int, int]]):
+        """Builds the plan layouts for the given (starting_address, data length) windows"""
+        for starting_address, data_len in windows:
+            self._get_layout(starting_address, data_len)
+
+    def _window_fields(self, starting_address: int, data_len: int) -> List[Tuple[DeviceField, int, int]]:
+        """Returns the fields that fit in a window, with their byte offsets"""
         # Offsets and size are counted in byte chunks, so for the range we
         # need to divide the byte size by the chunk size
-        data_size = int(len(data) / self.chunk_size)
+        data_size = int(data_len / self.chunk_size)
 
         # Filter out fields not in range
         r = range(starting_address, starting_address + data_size)
-        fields = [f for f in self.fields
-                  if f.address in r and f.address + f.size - 1 in r]
+        fields = []
+        for f in self.fields_in_range(r.start, r.stop):
+            if f.address + f.size - 1 not in r:
+                continue
 
-        # Parse fields
-        parsed = {}
-        for f in fields:
             data_start = self.chunk_size * (f.address - starting_address)
-            field_data = data[data_start:data_start + f.chunk_size * f.size]
-            val = f.parse(field_data)
-
-            # Skip if the value is "out-of-range" - sometimes the sensors
-            # report weird values
-            if not f.in_range(val):
+            data_end = data_start + f.chunk_size * f.size
+            if data_end > data_len:
                 continue
 
-            parsed[f.name] = val
-
-        return parsed
+            fields.append((f, data_start, data_end))
+
+        return fields
+
+    def _get_layout(self, starting_address: int, data_len: int) -> PlanLayout:
+        layout = self._layouts.get((starting_address, data_len))
+        if layout is None:
+            fields = self._window_fields(starting_address, data_len)
+            layout = ParsePlan.build_layout(fields)
+            self._layouts[(starting_address, data_len)] = layout
+        return layout
+
+    def _compile_plan(self, starting_address: int, data_len: int, numeric_mode: NumericMode) -> ParsePlan:
+        """Builds and caches the parse plan for a given register window"""
+        fields = self._window_fields(starting_address, data_len)
+        layout = self._get_layout(starting_address, data_len)
+        plan = ParsePlan(fields, numeric_mode, layout)
+        self._plans[(starting_address, data_len, numeric_mode)] = plan
+        return plan
@@ -71,38 +71,41 @@ class ChargingMode(Enum):
 class V2Device(BluettiDevice):
     def __init__(self, address: str, sn: str, type: str):
         super().__init__(address, type, sn)
-        self.struct = DeviceStruct(chunk_size=1)
+
+    @classmethod
+    def build_struct(cls) -> DeviceStruct:
+        struct = DeviceStruct(chunk_size=1)
 
         ## Setters
         # See ctrl_status to read the current value of these two (it's a bitfield)
-        self.struct.add_bool_field("ac_switch", ProtocolAddress.AC_SWITCH.value)
-        self.struct.add_bool_field("dc_switch", ProtocolAddress.DC_SWITCH.value)
+        struct.add_bool_field("ac_switch", ProtocolAddress.AC_SWITCH.value)
+        struct.add_bool_field("dc_switch", ProtocolAddress.DC_SWITCH.value)
 
         ## BaseConfig
-        self.struct.add_uint8_field("cfg_specs", ProtocolAddress.BASE_CONFIG.value + 0)
-        self.struct.add_uint8_field("cfg_voltage_type", ProtocolAddress.BASE_CONFIG.value + 1)
-        self.struct.add_uint_field("cfg_guest_mode_enabled", ProtocolAddress.BASE_CONFIG.value + 2)
-        self.struct.add_uint_field("cfg_bt_psw_enabled", ProtocolAddress.BASE_CONFIG.value + 10)
-        self.struct.add_swap_string_field("cfg_bt_password", ProtocolAddress.BASE_CONFIG.value + 12, 9)
-        self.struct.add_uint_field("cfg_modbus_version", ProtocolAddress.BASE_CONFIG.value + 28)
-        self.struct.add_uint_field("cfg_protocol_version", ProtocolAddress.BASE_CONFIG.value + 30)
+        struct.add_uint8_field("cfg_specs", ProtocolAddress.BASE_CONFIG.value + 0)
+        struct.add_uint8_field("cfg_voltage_type", ProtocolAddress.BASE_CONFIG.value + 1)
+        struct.add_uint_field("cfg_guest_mode_enabled", ProtocolAddress.BASE_CONFIG.value + 2)
+        struct.add_uint_field("cfg_bt_psw_enabled", ProtocolAddress.BASE_CONFIG.value + 10)
+        struct.add_swap_string_field("cfg_bt_password", ProtocolAddress.BASE_CONFIG.value + 12, 9)
+        struct.add_uint_field("cfg_modbus_version", ProtocolAddress.BASE_CONFIG.value + 28)
+        struct.add_uint_field("cfg_protocol_version", ProtocolAddress.BASE_CONFIG.value + 30)
 
         ## HomeData
-        self.struct.add_decimal_field("pack_voltage", ProtocolAddress.HOME_DATA.value + 0, 2)
-        self.struct.add_decimal_field("pack_current", ProtocolAddress.HOME_DATA.value + 2, 1)
-        self.struct.add_uint_field("pack_soc", ProtocolAddress.HOME_DATA.value + 4)
-        self.struct.add_uint_field("pack_charging_status", ProtocolAddress.HOME_DATA.value + 6)
-        self.struct.add_uint_field("pack_chg_full_time", ProtocolAddress.HOME_DATA.value + 8)
-        self.struct.add_uint_field("pack_dsg_empty_time", ProtocolAddress.HOME_DATA.value + 10)
-        self.struct.add_uint_field("pack_aging_data_bin", ProtocolAddress.HOME_DATA.value + 12)
-        self.struct.add_uint8_field("pack_cnts", ProtocolAddress.HOME_DATA.value + 15)
-        self.struct.add_uint_field("pack_online_bin", ProtocolAddress.HOME_DATA.value + 16)
-        self.struct.add_uint_field("can_bus_fault_bin", ProtocolAddress.HOME_DATA.value + 18)
-        self.struct.add_swap_string_field("device_model", ProtocolAddress.HOME_DATA.value + 20, 6)
-        self.struct.add_sn_field("device_sn", ProtocolAddress.HOME_DATA.value + 32)
-        self.struct.add_uint8_field("inv_number", ProtocolAddress.HOME_DATA.value + 41)
-        self.struct.add_uint_field("inv_online_bin", ProtocolAddress.HOME_DATA.value + 42)
-        self.struct.add_uint8_field("inv_power_type", ProtocolAddress.HOME_DATA.value + 45)
+        struct.add_decimal_field("pack_voltage", ProtocolAddress.HOME_DATA.value + 0, 2)
+        struct.add_decimal_field("pack_current", ProtocolAddress.HOME_DATA.value + 2, 1)
+        struct.add_uint_field("pack_soc", ProtocolAddress.HOME_DATA.value + 4)
+        struct.add_uint_field("pack_charging_status", ProtocolAddress.HOME_DATA.value + 6)
+        struct.add_uint_field("pack_chg_full_time", ProtocolAddress.HOME_DATA.value + 8)
+        struct.add_uint_field("pack_dsg_empty_time", ProtocolAddress.HOME_DATA.value + 10)
+        struct.add_uint_field("pack_aging_data_bin", ProtocolAddress.HOME_DATA.value + 12)
+        struct.add_uint8_field("pack_cnts", ProtocolAddress.HOME_DATA.value + 15)
+        struct.add_uint_field("pack_online_bin", ProtocolAddress.HOME_DATA.value + 16)
+        struct.add_uint_field("can_bus_fault_bin", ProtocolAddress.HOME_DATA.value + 18)
+        struct.add_swap_string_field("device_model", ProtocolAddress.HOME_DATA.value + 20, 6)
+        struct.add_sn_field("device_sn", ProtocolAddress.HOME_DATA.value + 32)
+        struct.add_uint8_field("inv_number", ProtocolAddress.HOME_DATA.value + 41)
+        struct.add_uint_field("inv_online_bin", ProtocolAddress.HOME_DATA.value + 42)
+        struct.add_uint8_field("inv_power_type", ProtocolAddress.HOME_DATA.value + 45)
 
         # pv_to_battery      = 1 << 0
         # grid_to_battery    = 1 << 1
@@ -118,74 +121,74 @@ class V2Device(BluettiDevice):
         # pv_to_grid         = 1 << 11
         # pv_to_ac_load      = 1 << 12
         # battery_to_ac_load = 1 << 13
-        self.struct.add_uint_field("energy_lines", ProtocolAddress.HOME_DATA.value + 46)
+        struct.add_uint_field("energy_lines", ProtocolAddress.HOME_DATA.value + 46)
 
         # See CtrlStatusMask
-        self.struct.add_uint_field("ctrl_status", ProtocolAddress.HOME_DATA.value + 48)
+        struct.add_uint_field("ctrl_status", ProtocolAddress.HOME_DATA.value + 48)
 
-        self.struct.add_uint8_field("grid_parallel_soc", ProtocolAddress.HOME_DATA.value + 51)
-        self.struct.add_uint32_field("total_dc_power", ProtocolAddress.HOME_DATA.value + 80)
-        self.struct.add_uint32_field("total_ac_power", ProtocolAddress.HOME_DATA.value + 84)
-        self.struct.add_uint32_field("total_pv_power", ProtocolAddress.HOME_DATA.value + 88)
-        self.struct.add_uint32_field("total_grid_power", ProtocolAddress.HOME_DATA.value + 92)
-        self.struct.add_uint32_field("total_inv_power", ProtocolAddress.HOME_DATA.value + 96)
-        self.struct.add_decimal32_field("total_dc_energy", ProtocolAddress.HOME_DATA.value + 100, 1)
-        self.struct.add_decimal32_field("total_ac_energy", ProtocolAddress.HOME_DATA.value + 104, 1)
-        self.struct.add_decimal32_field("total_pv_charging_energy", ProtocolAddress.HOME_DATA.value + 108, 1)
-        self.struct.add_decimal32_field("total_grid_charging_energy", ProtocolAddress.HOME_DATA.value + 112, 1)
-        self.struct.add_decimal32_field("total_feedback_energy", ProtocolAddress.HOME_DATA.value + 116, 1)
-        self.struct.add_enum_field("charging_mode", ProtocolAddress.HOME_DATA.value + 120, ChargingMode)
+        struct.add_uint8_field("grid_parallel_soc", ProtocolAddress.HOME_DATA.value + 51)
+        struct.add_uint32_field("total_dc_power", ProtocolAddress.HOME_DATA.value + 80)
+        struct.add_uint32_field("total_ac_power", ProtocolAddress.HOME_DATA.value + 84)
+        struct.add_uint32_field("total_pv_power", ProtocolAddress.HOME_DATA.value + 88)
+        struct.add_uint32_field("total_grid_power", ProtocolAddress.HOME_DATA.value + 92)
+        struct.add_uint32_field("total_inv_power", ProtocolAddress.HOME_DATA.value + 96)
+        struct.add_decimal32_field("total_dc_energy", ProtocolAddress.HOME_DATA.value + 100, 1)
+        struct.add_decimal32_field("total_ac_energy", ProtocolAddress.HOME_DATA.value + 104, 1)
+        struct.add_decimal32_field("total_pv_charging_energy", ProtocolAddress.HOME_DATA.value + 108, 1)
+        struct.add_decimal32_field("total_grid_charging_energy", ProtocolAddress.HOME_DATA.value + 112, 1)
+        struct.add_decimal32_field("total_feedback_energy", ProtocolAddress.HOME_DATA.value + 116, 1)
+        struct.add_enum_field("charging_mode", ProtocolAddress.HOME_DATA.value + 120, ChargingMode)
 
-        self.struct.add_uint8_field("inv_working_status", ProtocolAddress.HOME_DATA.value + 123)
-        self.struct.add_uint32_field("pv_to_ac_energy", ProtocolAddress.HOME_DATA.value + 124)
-        self.struct.add_uint8_field("self_sufficiency_rate", ProtocolAddress.HOME_DATA.value + 129)
-        self.struct.add_uint32_field("pv_to_ac_power", ProtocolAddress.HOME_DATA.value + 130)
-        self.struct.add_uint32_field("pack_dsg_energy_total", ProtocolAddress.HOME_DATA.value + 134)
-        self.struct.add_uint_field("rate_voltage", ProtocolAddress.HOME_DATA.value + 138)
-        self.struct.add_uint_field("rate_frequency", ProtocolAddress.HOME_DATA.value + 140)
+        struct.add_uint8_field("inv_working_status", ProtocolAddress.HOME_DATA.value + 123)
+        struct.add_uint32_field("pv_to_ac_energy", ProtocolAddress.HOME_DATA.value + 124)
+        struct.add_uint8_field("self_sufficiency_rate", ProtocolAddress.HOME_DATA.value + 129)
+        struct.add_uint32_field("pv_to_ac_power", ProtocolAddress.HOME_DATA.value + 130)
+        struct.add_uint32_field("pack_dsg_energy_total", ProtocolAddress.HOME_DATA.value + 134)
+        struct.add_uint_field("rate_voltage", ProtocolAddress.HOME_DATA.value + 138)
+        struct.add_uint_field("rate_frequency", ProtocolAddress.HOME_DATA.value + 140)
 
         ## Inverter GridInfo
-        self.struct.add_decimal_field("grid_frequency", ProtocolAddress.INV_GRID_INFO.value + 0, 1)
-        self.struct.add_uint32_field("total_grid_power", ProtocolAddress.INV_GRID_INFO.value + 2)
-        self.struct.add_decimal32_field("grid_total_chg_energy", ProtocolAddress.INV_GRID_INFO.value + 6, 1)
-        self.struct.add_decimal32_field("grid_total_feedback_energy", ProtocolAddress.INV_GRID_INFO.value + 10, 1)
-        self.struct.add_uint8_field("grid_num_phases", ProtocolAddress.INV_GRID_INFO.value + 25)
-        self.struct.add_uint_field("grid_phase0_power", ProtocolAddress.INV_GRID_INFO.value + 26)
-        self.struct.add_decimal_field("grid_phase0_voltage", ProtocolAddress.INV_GRID_INFO.value + 28, 1)
-        self.struct.add_decimal_field("grid_phase0_current", ProtocolAddress.INV_GRID_INFO.value + 30, 1)
+        struct.add_decimal_field("grid_frequency", ProtocolAddress.INV_GRID_INFO.value + 0, 1)
+        struct.add_uint32_field("total_grid_power", ProtocolAddress.INV_GRID_INFO.value + 2)
+        struct.add_decimal32_field("grid_total_chg_energy", ProtocolAddress.INV_GRID_INFO.value + 6, 1)
+        struct.add_decimal32_field("grid_total_feedback_energy", ProtocolAddress.INV_GRID_INFO.value + 10, 1)
+        struct.add_uint8_field("grid_num_phases", ProtocolAddress.INV_GRID_INFO.value + 25)
+        struct.add_uint_field("grid_phase0_power", ProtocolAddress.INV_GRID_INFO.value + 26)
+        struct.add_decimal_field("grid_phase0_voltage", ProtocolAddress.INV_GRID_INFO.value + 28, 1)
+        struct.add_decimal_field("grid_phase0_current", ProtocolAddress.INV_GRID_INFO.value + 30, 1)
 
         ## Inverter LoadInfo
-        self.struct.add_uint32_field("total_dc_power", ProtocolAddress.INV_LOAD_INFO.value + 0)
-        self.struct.add_decimal32_field("total_dc_energy", ProtocolAddress.INV_LOAD_INFO.value + 4, 1)
-        self.struct.add_uint_field("dc_5v_power", ProtocolAddress.INV_LOAD_INFO.value + 8)
-        self.struct.add_decimal_field("dc_5v_current", ProtocolAddress.INV_LOAD_INFO.value + 10, 1)
-        self.struct.add_uint_field("dc_12v_power", ProtocolAddress.INV_LOAD_INFO.value + 12)
-        self.struct.add_decimal_field("dc_12v_current", ProtocolAddress.INV_LOAD_INFO.value + 14, 1)
-        self.struct.add_uint_field("dc_24v_power", ProtocolAddress.INV_LOAD_INFO.value + 16)
-        self.struct.add_decimal_field("dc_24v_current", ProtocolAddress.INV_LOAD_INFO.value + 18, 1)
-        self.struct.add_uint32_field("dc_load_total_power_2", ProtocolAddress.INV_LOAD_INFO.value + 40)
-        self.struct.add_decimal32_field("dc_load_total_energy_2", ProtocolAddress.INV_LOAD_INFO.value + 44, 1)
+        struct.add_uint32_field("total_dc_power", ProtocolAddress.INV_LOAD_INFO.value + 0)
+        struct.add_decimal32_field("total_dc_energy", ProtocolAddress.INV_LOAD_INFO.value + 4, 1)
+        struct.add_uint_field("dc_5v_power", ProtocolAddress.INV_LOAD_INFO.value + 8)
+        struct.add_decimal_field("dc_5v_current", ProtocolAddress.INV_LOAD_INFO.value + 10, 1)
+        struct.add_uint_field("dc_12v_power", ProtocolAddress.INV_LOAD_INFO.value + 12)
+        struct.add_decimal_field("dc_12v_current", ProtocolAddress.INV_LOAD_INFO.value + 14, 1)
+        struct.add_uint_field("dc_24v_power", ProtocolAddress.INV_LOAD_INFO.value + 16)
+        struct.add_decimal_field("dc_24v_current", ProtocolAddress.INV_LOAD_INFO.value + 18, 1)
+        struct.add_uint32_field("dc_load_total_power_2", ProtocolAddress.INV_LOAD_INFO.value + 40)
+        struct.add_decimal32_field("dc_load_total_energy_2", ProtocolAddress.INV_LOAD_INFO.value + 44, 1)
 
-        self.struct.add_uint8_field("inv_num_phases", ProtocolAddress.INV_LOAD_INFO.value + 59)
-        self.struct.add_uint_field("inv_phase0_power", ProtocolAddress.INV_LOAD_INFO.value + 60)
-        self.struct.add_decimal_field("inv_phase0_voltage", ProtocolAddress.INV_LOAD_INFO.value + 62, 1)
-        self.struct.add_decimal_field("inv_phase0_current", ProtocolAddress.INV_LOAD_INFO.value + 64, 1)
+        struct.add_uint8_field("inv_num_phases", ProtocolAddress.INV_LOAD_INFO.value + 59)
+        struct.add_uint_field("inv_phase0_power", ProtocolAddress.INV_LOAD_INFO.value + 60)
+        struct.add_decimal_field("inv_phase0_voltage", ProtocolAddress.INV_LOAD_INFO.value + 62, 1)
+        struct.add_decimal_field("inv_phase0_current", ProtocolAddress.INV_LOAD_INFO.value + 64, 1)
 
         ## Pack info
-        self.struct.add_uint_field("pack_volt_type", ProtocolAddress.PACK_MAIN_INFO.value + 0)
-        self.struct.add_uint8_field("pack_cnts", ProtocolAddress.PACK_MAIN_INFO.value + 3)
-        self.struct.add_decimal_field("pack_voltage", ProtocolAddress.PACK_MAIN_INFO.value + 6, 2)
-        self.struct.add_decimal_field("pack_current", ProtocolAddress.PACK_MAIN_INFO.value + 8, 1)
-        self.struct.add_uint8_field("pack_soc", ProtocolAddress.PACK_MAIN_INFO.value + 11)
-        self.struct.add_uint8_field("pack_soh", ProtocolAddress.PACK_MAIN_INFO.value + 13)
+        struct.add_uint_field("pack_volt_type", ProtocolAddress.PACK_MAIN_INFO.value + 0)
+        struct.add_uint8_field("pack_cnts", ProtocolAddress.PACK_MAIN_INFO.value + 3)
+        struct.add_decimal_field("pack_voltage", ProtocolAddress.PACK_MAIN_INFO.value + 6, 2)
+        struct.add_decimal_field("pack_current", ProtocolAddress.PACK_MAIN_INFO.value + 8, 1)
+        struct.add_uint8_field("pack_soc", ProtocolAddress.PACK_MAIN_INFO.value + 11)
+        struct.add_uint8_field("pack_soh", ProtocolAddress.PACK_MAIN_INFO.value + 13)
         # Fahrenheit?
-        self.struct.add_uint_field("pack_avg_temp", ProtocolAddress.PACK_MAIN_INFO.value + 14)
-        self.struct.add_uint8_field("pack_running_status", ProtocolAddress.PACK_MAIN_INFO.value + 17)
+        struct.add_uint_field("pack_avg_temp", ProtocolAddress.PACK_MAIN_INFO.value + 14)
+        struct.add_uint8_field("pack_running_status", ProtocolAddress.PACK_MAIN_INFO.value + 17)
         # 1 charging, 2 discharging
-        self.struct.add_uint8_field("pack_charging_status", ProtocolAddress.PACK_MAIN_INFO.value + 19)
-        self.struct.add_decimal_field("pack_max_chg_voltage", ProtocolAddress.PACK_MAIN_INFO.value + 20, 2)
-        self.struct.add_decimal_field("pack_max_chg_current", ProtocolAddress.PACK_MAIN_INFO.value + 22, 1)
-        self.struct.add_decimal_field("pack_max_dsg_current", ProtocolAddress.PACK_MAIN_INFO.value + 24, 1)
+        struct.add_uint8_field("pack_charging_status", ProtocolAddress.PACK_MAIN_INFO.value + 19)
+        struct.add_decimal_field("pack_max_chg_voltage", ProtocolAddress.PACK_MAIN_INFO.value + 20, 2)
+        struct.add_decimal_field("pack_max_chg_current", ProtocolAddress.PACK_MAIN_INFO.value + 22, 1)
+        struct.add_decimal_field("pack_max_dsg_current", ProtocolAddress.PACK_MAIN_INFO.value + 24, 1)
 
         mqtt_name_map = {
             'ac_switch': 'ac_output_on',
@@ -232,9 +235,8 @@ class V2Device(BluettiDevice):
             # '': 'pack_status',
         }
 
-        for field in self.struct.fields:
-            if (new_name := mqtt_name_map.get(field.name)) is not None:
-                field.name = new_name
+        struct.rename_fields(mqtt_name_map)
+        return struct
 
 
     @property
@@ -268,7 +270,7 @@ class V2Device(BluettiDevice):
     def parse(self, address: int, data: bytes) -> dict:
         """Insert extra virtual fields, like bitfields that need to be unpacked
         """
-        ret = self.struct.parse(address, data)
+        ret = self.struct.parse(address, data, self.numeric_mode)
         if ctrl_status := ret.get("ctrl_status"):
             ret["ac_output_on"] = ctrl_status & CtrlStatusMask.AC_ENABLE.value
             ret["dc_output_on"] = ctrl_status & CtrlStatusMask.DC_ENABLE.value
@@ -0,0 +1,170 @@
+"""
+Read planning.
+
+Builds the MODBUS reads needed to poll a given set of fields, instead of
+relying on the hand-tuned polling windows of each device. Fields are sorted by
+address and merged into a single read when the gap between them is at most
+gap_threshold registers and the read stays under max_registers. Larger gap
+thresholds mean fewer round trips but more unused bytes on air.
+
+Reads are only merged across a gap when the whole read lies inside one of the
+device's known windows (its polling and logging commands), since reading
+unmapped registers can make the device reply with a MODBUS exception.
+
+A device plan never takes more round trips than the hand-written schedule.
+If splitting at the large gaps would need more reads, the fields of each
+scheduled window are read at once instead, trimmed to the fields that are used.
+"""
+
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+from .commands import ReadHoldingRegisters
+from .schedule import PollingWindow
+from .devices.bluetti_device import BluettiDevice
+from .devices.struct import DeviceField
+
+
+# The MODBUS limit for a single ReadHoldingRegisters request
+MAX_READ_REGISTERS = 125
+DEFAULT_GAP_THRESHOLD = 16
+
+
+def merge_windows(windows: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merges overlapping or adjacent [start, end) register windows"""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def plan_reads(
+    fields: Iterable[DeviceField],
+    readable_windows: Iterable[Tuple[int, int]] = (),
+    max_registers: int = MAX_READ_REGISTERS,
+    gap_threshold: int = DEFAULT_GAP_THRESHOLD,
+) -> List[ReadHoldingRegisters]:
+    """Plans the reads for the given fields, which must use 2 byte registers"""
+    segments = merge_windows(readable_windows)
+    segment_starts = [start for start, _ in segments]
+
+    def segment_of(start: int, end: int) -> Optional[int]:
+        i = bisect_right(segment_starts, start) - 1
+        if i >= 0 and end <= segments[i][1]:
+            return i
+        return None
+
+    spans = sorted({(f.address, f.address + f.size) for f in fields})
+    reads: List[Tuple[int, int, Optional[int]]] = []
+    for start, end in spans:
+        segment = segment_of(start, end)
+        if reads:
+            read_start, read_end, read_segment = reads[-1]
+            merged_end = max(read_end, end)
+            if start <= read_end or (
+                segment is not None
+                and segment == read_segment
+                and start - read_end <= gap_threshold
+            ):
+                if merged_end - read_start <= max_registers:
+                    reads[-1] = (read_start, merged_end, read_segment)
+                    continue
+        reads.append((start, end, segment))
+
+    return [ReadHoldingRegisters(start, end - start) for start, end, _ in reads]
+
+
+def plan_polling_schedule(
+    device: BluettiDevice,
+    field_names: Iterable[str],
+    max_registers: int = MAX_READ_REGISTERS,
+    gap_threshold: int = DEFAULT_GAP_THRESHOLD,
+) -> List[PollingWindow]:
+    """
+    Plans the polling windows for the fields of a device that are actually
+    used. Fields in the pack logging windows are left to pack polling, and
+    planned reads keep the polling period of the device window they replace.
+    When a name has several fields (e.g. a status register and its setter),
+    only one is read, preferably one the schedule already polls. Windows
+    read once per connection (device identity) are always kept whole.
+
+    Devices that don't use 2 byte registers for their field addresses keep
+    their hand-written polling schedule.
+    """
+    schedule = device.polling_schedule
+    if device.struct.chunk_size != 2:
+        return schedule
+
+    def windows(commands: List[ReadHoldingRegisters]):
+        return [(c.starting_address, c.starting_address + c.quantity) for c in commands]
+
+    def scheduled_window(f: DeviceField) -> Optional[int]:
+        return next((i for i, w in enumerate(schedule) if w.covers(f.address)), None)
+
+    pack_windows = windows(device.pack_logging_commands)
+    fields = []
+    for name in set(field_names):
+        candidates = [
+            f for f in device.struct.get_fields(name)
+            if not any(start <= f.address and f.address + f.size <= end for start, end in pack_windows)
+        ]
+        if candidates:
+            fields.append(next((f for f in candidates if scheduled_window(f) is not None), candidates[0]))
+    if not fields:
+        return schedule
+
+    # Group the fields by the scheduled window they were read with, if any
+    groups: Dict[Optional[int], List[DeviceField]] = {}
+    for f in fields:
+        window = scheduled_window(f)
+        if window is None or not schedule[window].once:
+            groups.setdefault(window, []).append(f)
+
+    identity = [w for w in schedule if w.once]
+    readable = windows(device.polling_commands) + windows(device.logging_commands)
+    planned = identity + _plan_groups(schedule, groups, readable, max_registers, gap_threshold)
+    if len(planned) > len(schedule):
+        # Read each scheduled window's fields at once, like the window did
+        planned = identity + _plan_groups(
+            schedule, groups, readable, max_registers, gap_threshold, split_windows=False
+        )
+    if len(planned) > len(schedule):
+        return schedule
+    return sorted(planned, key=lambda w: w.command.starting_address)
+
+
+def _plan_groups(
+    schedule: List[PollingWindow],
+    groups: Dict[Optional[int], List[DeviceField]],
+    readable: List[Tuple[int, int]],
+    max_registers: int,
+    gap_threshold: int,
+    split_windows: bool = True,
+) -> List[PollingWindow]:
+    planned = []
+    for group, group_fields in groups.items():
+        if group is None:
+            planned.extend(PollingWindow(c) for c in plan_reads(group_fields, readable, max_registers, gap_threshold))
+            continue
+
+        window = schedule[group]
+        if split_windows:
+            commands = plan_reads(group_fields, readable, max_registers, gap_threshold)
+        else:
+            start = min(f.address for f in group_fields)
+            end = max(f.address + f.size for f in group_fields)
+            commands = [ReadHoldingRegisters(start, end - start)]
+        planned.extend(PollingWindow(c, window.interval, window.once) for c in commands)
+    return planned
+
+
+def plan_polling_commands(
+    device: BluettiDevice,
+    field_names: Iterable[str],
+    max_registers: int = MAX_READ_REGISTERS,
+    gap_threshold: int = DEFAULT_GAP_THRESHOLD,
+) -> List[ReadHoldingRegisters]:
+    """Like plan_polling_schedule, without the polling periods"""
+    return [w.command for w in plan_polling_schedule(device, field_names, max_registers, gap_threshold)]
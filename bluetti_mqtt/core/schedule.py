@@ -0,0 +1,139 @@
+"""
+Polling schedules.
+
+Each read window of a device is polled on its own period: live readings as
+often as the global polling interval allows, settings every minute or so, and
+identity registers once per connection. A PollingSchedule hands out the window
+with the earliest deadline next.
+
+Windows on the global polling interval can also be polled adaptively: the
+interval drops to a floor as soon as a read returns changed values, and grows
+towards a ceiling while the values stay the same.
+"""
+
+from dataclasses import dataclass
+import heapq
+import logging
+from typing import Dict, List, Optional, Tuple
+from .commands import ReadHoldingRegisters
+
+
+@dataclass(frozen=True)
+class PollingWindow:
+    command: ReadHoldingRegisters
+    interval: Optional[float] = None  # Seconds between reads, None for the global polling interval
+    once: bool = False  # Only read once per connection
+
+    def covers(self, address: int) -> bool:
+        start = self.command.starting_address
+        return start <= address < start + self.command.quantity
+
+
+class PollingSchedule:
+    """Earliest-deadline-first schedule of a device's polling windows"""
+
+    # How much the interval of a window grows after each unchanged read
+    BACKOFF_FACTOR = 1.5
+    # Seconds an unchanged read backs off to at least, so a floor of 0 can still grow
+    MIN_BACKOFF_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        windows: List[PollingWindow],
+        default_interval: float,
+        now: float,
+        adaptive_range: Optional[Tuple[float, float]] = None
+    ):
+        self.windows = windows
+        self.default_interval = default_interval
+        self.adaptive_range = adaptive_range
+        self._intervals = [default_interval if w.interval is None else w.interval for w in windows]
+        if adaptive_range:
+            floor, ceiling = adaptive_range
+            self._intervals = [
+                min(max(interval, floor), ceiling) if self._is_adaptive(w) else interval
+                for w, interval in zip(windows, self._intervals)
+            ]
+        self._indexes = {id(w): i for i, w in enumerate(windows)}
+        self._last_reads: Dict[int, Tuple[float, int]] = {}
+
+        # Entries are (deadline, window index, generation). Rescheduling a
+        # window bumps its generation, which invalidates its old entry.
+        self._generations: Dict[int, int] = {i: 0 for i in range(len(windows))}
+        self._queue: List[Tuple[float, int, int]] = [(now, i, 0) for i in range(len(windows))]
+        heapq.heapify(self._queue)
+
+    def next_deadline(self) -> Optional[float]:
+        """Returns when the next window is due, or None if nothing is left to poll"""
+        self._drop_stale()
+        return self._queue[0][0] if self._queue else None
+
+    def pop(self, now: float) -> Optional[PollingWindow]:
+        """Returns the next window if it is due, and schedules its next read"""
+        self._drop_stale()
+        if not self._queue or self._queue[0][0] > now:
+            return None
+
+        deadline, i, generation = heapq.heappop(self._queue)
+        window = self.windows[i]
+        self._last_reads[i] = (now, generation)
+        if not window.once:
+            interval = self._intervals[i]
+            next_deadline = deadline + interval
+            if next_deadline <= now:
+                # Don't try to catch up on missed reads, just skip them
+                next_deadline = now + interval
+            heapq.heappush(self._queue, (next_deadline, i, generation))
+        else:
+            del self._generations[i]
+        return window
+
+    def report(self, window: PollingWindow, changed: bool):
+        """
+        Reports whether the values read with a window changed since its
+        previous read, and adapts its interval if adaptive polling is on.
+        """
+        if not self.adaptive_range or not self._is_adaptive(window):
+            return
+
+        i = self._indexes[id(window)]
+        floor, ceiling = self.adaptive_range
+        if changed:
+            interval = floor
+        else:
+            interval = min(max(self._intervals[i] * self.BACKOFF_FACTOR, self.MIN_BACKOFF_INTERVAL), ceiling)
+        if interval == self._intervals[i]:
+            return
+
+        self._intervals[i] = interval
+        logging.debug(f'Polling interval of {window.command} is now {interval:.1f}s')
+
+        # Move the next read, unless the window was rescheduled in the meantime
+        last_read, generation = self._last_reads.get(i, (None, None))
+        if generation is not None and self._generations.get(i) == generation:
+            generation += 1
+            self._generations[i] = generation
+            self._last_reads[i] = (last_read, generation)
+            heapq.heappush(self._queue, (last_read + interval, i, generation))
+
+    def effective_intervals(self) -> List[Tuple[PollingWindow, float]]:
+        """Returns the current interval of each window"""
+        return list(zip(self.windows, self._intervals))
+
+    def expedite(self, address: int, now: float):
+        """Makes the windows covering the given register address due now"""
+        for i, window in enumerate(self.windows):
+            if window.covers(address):
+                generation = self._generations.get(i, 0) + 1
+                self._generations[i] = generation
+                heapq.heappush(self._queue, (now, i, generation))
+
+    def _is_adaptive(self, window: PollingWindow) -> bool:
+        return window.interval is None and not window.once
+
+    def _drop_stale(self):
+        while self._queue:
+            _, i, generation = self._queue[0]
+            if self._generations.get(i) == generation:
+                return
+            heapq.heappop(self._queue)
@@ -2,18 +2,42 @@ import asyncio
 from bleak import BleakError
 import logging
 import time
-from typing import Dict, List, cast
-from bluetti_mqtt.bluetooth import BadConnectionError, MultiDeviceManager, ModbusError, ParseError, build_device
+from typing import Dict, Iterable, List, Optional, Tuple, cast
+from bluetti_mqtt.bluetooth import (
+    BadConnectionError, BleakTransport, MultiDeviceManager, ModbusError, PackSwitcher, ParseError, Priority,
+    build_device
+)
 from bluetti_mqtt.bus import CommandMessage, EventBus, ParserMessage
-from bluetti_mqtt.core import BluettiDevice, ReadHoldingRegisters
+from bluetti_mqtt.core import BluettiDevice, NumericMode, PollingWindow, ReadHoldingRegisters, WriteSingleRegister
+from bluetti_mqtt.core.planner import DEFAULT_GAP_THRESHOLD, plan_polling_schedule
+from bluetti_mqtt.core.schedule import PollingSchedule
 
 
 class DeviceHandler:
-    def __init__(self, addresses: List[str], interval: int, bus: EventBus):
-        self.manager = MultiDeviceManager(addresses)
+    def __init__(
+        self,
+        addresses: List[str],
+        interval: int,
+        bus: EventBus,
+        numeric_mode: NumericMode = NumericMode.DECIMAL,
+        planned_fields: Optional[Iterable[str]] = None,
+        gap_threshold: int = DEFAULT_GAP_THRESHOLD,
+        adaptive_range: Optional[Tuple[float, float]] = None,
+        pipeline_depth: int = 1,
+        transport: Optional[BleakTransport] = None
+    ):
+        self.manager = MultiDeviceManager(addresses, pipeline_depth, transport)
         self.devices: Dict[str, BluettiDevice] = {}
+        self.polling_windows: Dict[str, List[PollingWindow]] = {}
+        self.schedules: Dict[str, PollingSchedule] = {}
+        self.schedule_changed: Dict[str, asyncio.Event] = {}
+        self.last_parsed: Dict[Tuple[str, int], dict] = {}
         self.interval = interval
         self.bus = bus
+        self.numeric_mode = numeric_mode
+        self.planned_fields = planned_fields
+        self.gap_threshold = gap_threshold
+        self.adaptive_range = adaptive_range
 
     async def run(self):
         loop = asyncio.get_running_loop()
@@ -33,26 +57,68 @@ class DeviceHandler:
     async def handle_command(self, msg: CommandMessage):
         if self.manager.is_ready(msg.device.address):
             logging.debug(f'Performing command {msg.device}: {msg.command}')
-            await self.manager.perform_nowait(msg.device.address, msg.command)
+            await self.manager.perform_nowait(msg.device.address, msg.command, Priority.USER_WRITE)
+
+            # Read back the written register so its new state gets published
+            schedule = self.schedules.get(msg.device.address)
+            if schedule and isinstance(msg.command, WriteSingleRegister):
+                schedule.expedite(msg.command.address, time.monotonic())
+                self.schedule_changed[msg.device.address].set()
 
     async def _poll(self, address: str):
+        self.schedule_changed[address] = asyncio.Event()
         while True:
             if not self.manager.is_ready(address):
                 logging.debug(f'Waiting for connection to {address} to start polling...')
+                # Start over after reconnecting, so read-once windows are read again
+                self.schedules.pop(address, None)
                 await asyncio.sleep(1)
                 continue
 
             device = self._get_device(address)
+            schedule = self.schedules.get(address)
+            if schedule is None:
+                schedule = PollingSchedule(
+                    self.polling_windows[address],
+                    self.interval,
+                    time.monotonic(),
+                    self.adaptive_range
+                )
+                self.schedules[address] = schedule
+
+            # Send all the polling commands that are due, so they can be pipelined
+            now = time.monotonic()
+            windows: List[PollingWindow] = []
+            window = schedule.pop(now)
+            # With a 0 interval windows are due again right away, so each one is only sent once
+            while window is not None and not any(w is window for w in windows):
+                windows.append(window)
+                window = schedule.pop(now)
+            if not windows:
+                deadline = schedule.next_deadline()
+                await self._wait_for_schedule(address, 1 if deadline is None else deadline - now)
+                continue
 
-            # Send all polling commands
-            start_time = time.monotonic()
-            for command in device.polling_commands:
-                await self._poll_with_command(device, command)
-            elapsed = time.monotonic() - start_time
-
-            # Limit polling rate if interval provided
-            if self.interval > 0 and self.interval > elapsed:
-                await asyncio.sleep(self.interval - elapsed)
+            futures = [await self.manager.perform(address, w.command) for w in windows]
+            for window, response_future in zip(windows, futures):
+                parsed = await self._handle_response(device, window.command, response_future)
+
+                # Let the schedule know if anything changed since the last read
+                if parsed is not None:
+                    key = (address, window.command.starting_address)
+                    previous = self.last_parsed.get(key)
+                    self.last_parsed[key] = parsed
+                    if previous is not None:
+                        schedule.report(window, parsed != previous)
+
+    async def _wait_for_schedule(self, address: str, timeout: float):
+        """Sleeps until the timeout, or until the schedule of the device changes"""
+        changed = self.schedule_changed[address]
+        changed.clear()
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
 
     async def _pack_poll(self, address: str):
         while True:
@@ -66,30 +132,46 @@ class DeviceHandler:
             if len(device.pack_logging_commands) == 0:
                 break
 
+            switcher = PackSwitcher(device, lambda cmd: self.manager.perform(address, cmd, Priority.BULK_POLL))
             start_time = time.monotonic()
             for pack in range(1, device.pack_num_max + 1):
                 # Send pack set command if the device supports more than 1 pack
                 if device.pack_num_max > 1:
                     command = device.build_setter_command('pack_num', pack)
-                    await self.manager.perform_nowait(address, command)
-                    await asyncio.sleep(10)  # We need to wait after switching packs for the data to be available
+                    await self.manager.perform_nowait(address, command, Priority.BULK_POLL)
+                    # The pack data is only available once the device has switched
+                    await switcher.wait_for_pack(pack)
 
                 # Poll
                 for command in device.pack_logging_commands:
-                    await self._poll_with_command(device, command)
+                    await self._poll_with_command(device, command, Priority.BULK_POLL)
             elapsed = time.monotonic() - start_time
 
             # Limit polling rate if interval provided
             if self.interval > 0 and self.interval > elapsed:
                 await asyncio.sleep(self.interval - elapsed)
 
-    async def _poll_with_command(self, device: BluettiDevice, command: ReadHoldingRegisters):
-        response_future = await self.manager.perform(device.address, command)
+    async def _poll_with_command(
+        self,
+        device: BluettiDevice,
+        command: ReadHoldingRegisters,
+        priority: Priority = Priority.LIVE_POLL
+    ) -> Optional[dict]:
+        response_future = await self.manager.perform(device.address, command, priority)
+        return await self._handle_response(device, command, response_future)
+
+    async def _handle_response(
+        self,
+        device: BluettiDevice,
+        command: ReadHoldingRegisters,
+        response_future: asyncio.Future
+    ) -> Optional[dict]:
         try:
             response = cast(bytes, await response_future)
             body = command.parse_response(response)
             parsed = device.parse(command.starting_address, body)
-            await self.bus.put(ParserMessage(device, parsed))
+            await self.bus.put(ParserMessage(device, parsed, (command.starting_address, command.quantity)))
+            return parsed
         except ParseError:
             logging.debug('Got a parse exception...')
         except ModbusError as err:
@@ -100,5 +182,15 @@ class DeviceHandler:
     def _get_device(self, address: str):
         if address not in self.devices:
             name = self.manager.get_name(address)
-            self.devices[address] = build_device(address, name)
+            device = build_device(address, name)
+            device.numeric_mode = self.numeric_mode
+            self.devices[address] = device
+
+            # Poll only the fields that are used, if they are known
+            if self.planned_fields is None:
+                self.polling_windows[address] = device.polling_schedule
+            else:
+                windows = plan_polling_schedule(device, self.planned_fields, gap_threshold=self.gap_threshold)
+                logging.info(f'Planned polling commands for {device.type}: {[w.command for w in windows]}')
+                self.polling_windows[address] = windows
         return self.devices[address]
@@ -10,7 +10,7 @@ import time
 from typing import cast
 from bluetti_mqtt.bluetooth import (
     check_addresses, scan_devices, BluetoothClient, ModbusError,
-    ParseError, BadConnectionError
+    PackSwitcher, ParseError, BadConnectionError
 )
 from bluetti_mqtt.core import (
     BluettiDevice, ReadHoldingRegisters, DeviceCommand
@@ -61,6 +61,7 @@ async def log(address: str, encrypted: bool, path: str, interval: int = 1):
     client = BluetoothClient(device.address, encrypted)
     asyncio.get_running_loop().create_task(client.run())
 
+    switcher = PackSwitcher(device, client.perform)
     with open(path, 'a') as log_file:
         # Wait for device connection
         while not client.is_ready:
@@ -80,7 +81,8 @@ async def log(address: str, encrypted: bool, path: str, interval: int = 1):
                     if device.pack_num_max > 1:
                         command = device.build_setter_command('pack_num', pack)
                         await log_command(client, device, command, log_file)
-                        await asyncio.sleep(10)  # We need to wait after switching packs for the data to be available
+                        # The pack data is only available once the device has switched
+                        await switcher.wait_for_pack(pack)
 
                     for command in device.pack_logging_commands:
                         await log_command(client, device, command, log_file)
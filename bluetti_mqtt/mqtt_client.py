@@ -1,14 +1,16 @@
 import asyncio
 from dataclasses import dataclass
+from decimal import Decimal
 from enum import auto, Enum, unique
 import json
 import logging
 import re
-from typing import List, Optional
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from asyncio_mqtt import Client, MqttError
 from paho.mqtt.client import MQTTMessage
 from bluetti_mqtt.bus import CommandMessage, EventBus, ParserMessage
-from bluetti_mqtt.core import BluettiDevice, DeviceCommand
+from bluetti_mqtt.core import BluettiDevice, DeviceCommand, NumericMode
 
 
 @unique
@@ -19,6 +21,10 @@ class MqttFieldType(Enum):
     BUTTON = auto()
 
 
+# Topic, payload and retain flag
+Publish = Tuple[str, bytes, bool]
+
+
 @dataclass(frozen=True)
 class MqttFieldConfig:
     type: MqttFieldType
@@ -442,6 +448,13 @@ DC_INPUT_FIELDS = {
     ),
 }
 
+# Parsed fields published as the DC input fields
+DC_INPUT_TOPICS = {
+    'internal_dc_input_voltage': 'dc_input_voltage1',
+    'internal_dc_input_power': 'dc_input_power1',
+    'internal_dc_input_current': 'dc_input_current1',
+}
+
 
 def battery_pack_fields(pack: int):
     return {
@@ -485,9 +498,95 @@ def battery_pack_fields(pack: int):
     }
 
 
+def format_numeric(value, numeric_mode: NumericMode = NumericMode.DECIMAL) -> str:
+    """
+    Formats a numeric field value as a payload string.
+
+    Floats from NumericMode.FLOAT are the correctly rounded quotient of a
+    fixed-point register value, so their shortest repr is exactly that
+    fixed-point value. Whole numbers drop the ".0" to match the Decimal output.
+    Values parsed in NumericMode.DECIMAL are published as they always were.
+    """
+    if numeric_mode == NumericMode.FLOAT and isinstance(value, float):
+        text = repr(value)
+        return text[:-2] if text.endswith('.0') else text
+    return str(value)
+
+
+def encode_numeric(value) -> bytes:
+    return str(value).encode()
+
+
+def encode_float_numeric(value) -> bytes:
+    return format_numeric(value, NumericMode.FLOAT).encode()
+
+
+def encode_bool(value) -> bytes:
+    return b'ON' if value else b'OFF'
+
+
+def encode_enum(value) -> bytes:
+    return value.name.encode()
+
+
+ENCODERS: Dict[MqttFieldType, Callable[[Any], bytes]] = {
+    MqttFieldType.NUMERIC: encode_numeric,
+    MqttFieldType.BOOL: encode_bool,
+    MqttFieldType.BUTTON: encode_bool,
+    MqttFieldType.ENUM: encode_enum,
+}
+
+
+@dataclass(frozen=True)
+class FieldPublisher:
+    """How a parsed field of a device is published"""
+    id: str  # Published field name, deadbands are looked up by it
+    topic: str
+    encode: Callable[[Any], bytes]
+
+
+@dataclass(frozen=True)
+class Deadband:
+    """How much a numeric value has to change before it is published again"""
+    absolute: float = 0
+    relative: float = 0  # Fraction of the last published value
+
+    @staticmethod
+    def parse(text: str) -> Tuple[Optional[str], 'Deadband']:
+        """Parses [FIELD=]VALUE[%] into the field name (None for all) and its deadband"""
+        field, _, value = text.rpartition('=')
+        if value.endswith('%'):
+            deadband = Deadband(relative=float(value[:-1]) / 100)
+        else:
+            deadband = Deadband(absolute=float(value))
+        return (field or None), deadband
+
+    def exceeded(self, old: Any, new: Any) -> bool:
+        numeric = (int, float, Decimal)
+        if isinstance(old, bool) or not isinstance(old, numeric) or not isinstance(new, numeric):
+            return old != new
+        diff = float(abs(new - old))
+        return diff > 0 and diff >= max(self.absolute, self.relative * float(abs(old)))
+
+
+def published_fields(home_assistant_mode: str) -> Set[str]:
+    """
+    Returns the names of the parsed fields that end up being published. Unless
+    home_assistant_mode is "advanced", advanced fields are left out.
+    """
+    fields = {
+        name for name, field in NORMAL_DEVICE_FIELDS.items()
+        if not field.advanced or home_assistant_mode == 'advanced'
+    }
+    fields.update(battery_pack_fields(1).keys())
+    fields.update(['pack_num', 'cell_voltages'])
+    fields.update(['internal_dc_input_voltage', 'internal_dc_input_power', 'internal_dc_input_current'])
+    return fields
+
+
 class MQTTClient:
     devices: List[BluettiDevice]
-    message_queue: asyncio.Queue
+    client: Optional[Client]
 
     def __init__(
         self,
@@ -497,14 +596,39 @@ class MQTTClient:
         port: int = 1883,
         username: Optional[str] = None,
         password: Optional[str] = None,
+        max_pending: Optional[int] = None,
+        qos: int = 0,
+        max_inflight: int = 20,
+        heartbeat: Optional[float] = None,
+        deadbands: Optional[Dict[Optional[str], Deadband]] = None,
     ):
+        """
+        With a heartbeat, state values are only published when they change
+        (beyond their deadband, by field name or None for the default), and
+        unchanged ones are published again every heartbeat seconds.
+        """
         self.bus = bus
+        self.max_pending = max_pending
+        self.qos = qos
+        self.max_inflight = max_inflight
+        self.heartbeat = heartbeat
+        self.deadbands = deadbands or {}
+        self.default_deadband = self.deadbands.get(None, Deadband())
+        self.last_published: Dict[str, Tuple[Any, float]] = {}
+        self.publish_plans: Dict[str, Dict[str, FieldPublisher]] = {}
         self.hostname = hostname
         self.port = port
         self.username = username
         self.password = password
         self.home_assistant_mode = home_assistant_mode
         self.devices = []
+        self.client = None
+        self.connected = asyncio.Event()
+        self.publish_slots = asyncio.Semaphore(max_inflight)
+
+        # Messages wait in the bus while the broker is unreachable, only the
+        # latest values with max_pending
+        self.bus.add_parser_listener(self.handle_message, max_pending)
 
     async def run(self):
         while True:
@@ -517,22 +641,28 @@ class MQTTClient:
                     password=self.password
                 ) as client:
                     logging.info('Connected to MQTT broker')
-
-                    # Connect to event bus
-                    self.message_queue = asyncio.Queue()
-                    self.bus.add_parser_listener(self.handle_message)
-
-                    # Handle pub/sub
-                    await asyncio.gather(
-                        self._handle_commands(client),
-                        self._handle_messages(client)
-                    )
+                    # Publish every value again after (re)connecting
+                    self.last_published.clear()
+                    self.client = client
+                    self.connected.set()
+                    try:
+                        await self._handle_commands(client)
+                    finally:
+                        self.connected.clear()
+                        self.client = None
             except MqttError:
                 logging.exception('MQTT error:')
                 await asyncio.sleep(5)
 
     async def handle_message(self, msg: ParserMessage):
-        await self.message_queue.put(msg)
+        await self.connected.wait()
+        client = self.client
+        try:
+            if msg.device not in self.devices:
+                await self._init_device(msg.device, client)
+            await self._handle_message(client, msg)
+        except MqttError as err:
+            logging.debug(f'Could not publish message from {msg.device}: {err}')
 
     async def _handle_commands(self, client: Client):
         async with client.filtered_messages('bluetti/command/#') as messages:
@@ -540,21 +670,15 @@ class MQTTClient:
             async for mqtt_message in messages:
                 await self._handle_command(mqtt_message)
 
-    async def _handle_messages(self, client: Client):
-        while True:
-            msg: ParserMessage = await self.message_queue.get()
-            if msg.device not in self.devices:
-                await self._init_device(msg.device, client)
-            await self._handle_message(client, msg)
-            self.message_queue.task_done()
-
     async def _init_device(self, device: BluettiDevice, client: Client):
         # Register device
         self.devices.append(device)
+        self._publish_plan(device)
 
         # Skip announcing device to Home Assistant if disabled
         if self.home_assistant_mode == 'none':
             return
+        configs: List[Publish] = []
 
         def payload(id: str, device: BluettiDevice, field: MqttFieldConfig) -> str:
             ha_id = id if not field.id_override else field.id_override
@@ -598,11 +722,11 @@ class MQTTClient:
                 type = 'button'
 
             # Publish config
-            await client.publish(
+            configs.append((
                 f'homeassistant/{type}/{device.sn}_{name}/config',
-                payload=payload(name, device, field).encode(),
-                retain=True
-            )
+                payload(name, device, field).encode(),
+                True
+            ))
 
         # Publish battery pack configs
         for pack in range(1, device.pack_num_max + 1):
@@ -613,21 +737,22 @@ class MQTTClient:
                     continue
 
                 # Publish config
-                await client.publish(
+                configs.append((
                     f'homeassistant/sensor/{device.sn}_{field.id_override}/config',
-                    payload=payload(f'pack_details{pack}', device, field).encode(),
-                    retain=True
-                )
+                    payload(f'pack_details{pack}', device, field).encode(),
+                    True
+                ))
 
         # Publish DC input config
         if device.has_field('internal_dc_input_voltage'):
             for name, field in DC_INPUT_FIELDS.items():
-                await client.publish(
+                configs.append((
                     f'homeassistant/sensor/{device.sn}_{name}/config',
-                    payload=payload(name, device, field).encode(),
-                    retain=True
-                )
+                    payload(name, device, field).encode(),
+                    True
+                ))
 
+        await self._publish_batch(client, configs)
         logging.info(f'Sent discovery message of {device.type}-{device.sn} to Home Assistant')
 
     async def _handle_command(self, mqtt_message: MQTTMessage):
@@ -670,51 +795,114 @@ class MQTTClient:
 
     async def _handle_message(self, client: Client, msg: ParserMessage):
         logging.debug(f'Got a message from {msg.device}: {msg.parsed}')
-        topic_prefix = f'bluetti/state/{msg.device.type}-{msg.device.sn}/'
-
-        # Publish normal fields
+        states: Dict[str, Tuple[Any, float]] = {}
+        publishes = self._build_publishes(msg, states)
+
+        def record(topic: str):
+            if topic in states:
+                self.last_published[topic] = states[topic]
+
+        await self._publish_batch(client, publishes, record)
+
+    def _publish_plan(self, device: BluettiDevice) -> Dict[str, FieldPublisher]:
+        """Returns how each parsed field of the device is published, by field name"""
+        plan = self.publish_plans.get(device.address)
+        if plan is not None:
+            return plan
+
+        topic_prefix = f'bluetti/state/{device.type}-{device.sn}/'
+        encoders = ENCODERS
+        if device.numeric_mode == NumericMode.FLOAT:
+            encoders = {**ENCODERS, MqttFieldType.NUMERIC: encode_float_numeric}
+        plan = {}
+        for name, field in NORMAL_DEVICE_FIELDS.items():
+            if device.has_field(name):
+                plan[name] = FieldPublisher(name, topic_prefix + name, encoders[field.type])
+        for name, id in DC_INPUT_TOPICS.items():
+            if device.has_field(name):
+                plan[name] = FieldPublisher(id, topic_prefix + id, encoders[MqttFieldType.NUMERIC])
+        self.publish_plans[device.address] = plan
+        return plan
+
+    def _build_publishes(
+        self,
+        msg: ParserMessage,
+        states: Optional[Dict[str, Tuple[Any, float]]] = None
+    ) -> List[Publish]:
+        """
+        Builds the state publishes for a message, skipping unchanged values.
+        The values to record once published are added to states, by topic.
+        """
+        plan = self._publish_plan(msg.device)
+        now = time.monotonic()
+        publishes: List[Publish] = []
+
+        # Publish normal fields and DC input data
         for name, value in msg.parsed.items():
-            # Skip unconfigured fields
-            if name not in NORMAL_DEVICE_FIELDS:
-                continue
-
-            # Build payload string
-            field = NORMAL_DEVICE_FIELDS[name]
-            if field.type == MqttFieldType.NUMERIC:
-                payload = str(value)
-            elif field.type == MqttFieldType.BOOL or field.type == MqttFieldType.BUTTON:
-                payload = 'ON' if value else 'OFF'
-            elif field.type == MqttFieldType.ENUM:
-                payload = value.name
-            else:
-                assert False, f'Unhandled field type: {field.type.name}'
-
-            await client.publish(topic_prefix + name, payload=payload.encode())
+            publisher = plan.get(name)
+            if publisher is not None and self._should_publish(publisher.topic, publisher.id, value, now):
+                publishes.append((publisher.topic, publisher.encode(value), False))
+                if states is not None:
+                    states[publisher.topic] = (value, now)
 
         # Publish battery pack data
         pack_details = self._build_pack_details(msg.parsed)
         if 'pack_num' in msg.parsed and len(pack_details) > 0:
-            await client.publish(
-                topic_prefix + f'pack_details{msg.parsed["pack_num"]}',
-                payload=json.dumps(pack_details, separators=(',', ':')).encode()
-            )
-
-        # Publish DC input data
-        if 'internal_dc_input_voltage' in msg.parsed:
-            await client.publish(
-                topic_prefix + 'dc_input_voltage1',
-                payload=str(msg.parsed['internal_dc_input_voltage']).encode()
-            )
-        if 'internal_dc_input_power' in msg.parsed:
-            await client.publish(
-                topic_prefix + 'dc_input_power1',
-                payload=str(msg.parsed['internal_dc_input_power']).encode()
-            )
-        if 'internal_dc_input_current' in msg.parsed:
-            await client.publish(
-                topic_prefix + 'dc_input_current1',
-                payload=str(msg.parsed['internal_dc_input_current']).encode()
-            )
+            topic = f'bluetti/state/{msg.device.type}-{msg.device.sn}/pack_details{msg.parsed["pack_num"]}'
+            if self._should_publish(topic, 'pack_details', pack_details, now):
+                publishes.append((topic, json.dumps(pack_details, separators=(',', ':')).encode(), False))
+                if states is not None:
+                    states[topic] = (pack_details, now)
+
+        return publishes
+
+    def _should_publish(self, topic: str, name: str, value: Any, now: float) -> bool:
+        """Checks a value against the last published one"""
+        if self.heartbeat is None:
+            return True
+
+        last = self.last_published.get(topic)
+        if last is not None and now - last[1] < self.heartbeat:
+            deadband = self.deadbands.get(name, self.default_deadband)
+            if not deadband.exceeded(last[0], value):
+                return False
+        return True
+
+    async def _publish_batch(
+        self,
+        client: Client,
+        publishes: List[Publish],
+        on_published: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Submits all the publishes at once instead of waiting for each one in
+        turn. With QoS 1, at most max_inflight publishes wait for their ack.
+        on_published is called with the topic of each successful publish. If
+        any publish fails, the first error is raised once all of them have
+        settled.
+        """
+        if self.qos == 0:
+            results = await asyncio.gather(*(
+                client.publish(topic, payload=payload, retain=retain)
+                for topic, payload, retain in publishes
+            ), return_exceptions=True)
+        else:
+            async def publish(topic: str, payload: bytes, retain: bool):
+                async with self.publish_slots:
+                    await client.publish(topic, payload=payload, qos=self.qos, retain=retain)
+
+            results = await asyncio.gather(*(publish(*p) for p in publishes), return_exceptions=True)
+
+        errors = []
+        for (topic, _, _), result in zip(publishes, results):
+            if isinstance(result, BaseException):
+                errors.append(result)
+            elif on_published:
+                on_published(topic)
+        if errors:
+            if len(errors) > 1:
+                logging.debug(f'{len(errors)} of {len(publishes)} publishes failed')
+            raise errors[0]
 
     def _build_pack_details(self, parsed: dict):
         details = {}
@@ -8,8 +8,10 @@ import warnings
 import sys
 from bluetti_mqtt.bluetooth import scan_devices
 from bluetti_mqtt.bus import EventBus
+from bluetti_mqtt.core import NumericMode
+from bluetti_mqtt.core.planner import DEFAULT_GAP_THRESHOLD
 from bluetti_mqtt.device_handler import DeviceHandler
-from bluetti_mqtt.mqtt_client import MQTTClient
+from bluetti_mqtt.mqtt_client import Deadband, MQTTClient, published_fields
 
 
 class CommandLineHandler:
@@ -47,11 +49,59 @@ class CommandLineHandler:
             default=5,
             type=int,
             help='The polling interval - set to 0 to poll as fast as possible')
+        parser.add_argument(
+            '--adaptive-interval',
+            metavar=('MIN', 'MAX'),
+            nargs=2,
+            type=float,
+            help='Poll live values between MIN and MAX seconds apart, faster while they are changing')
+        parser.add_argument(
+            '--pipeline',
+            default=1,
+            type=int,
+            metavar='N',
+            help='How many commands to keep in flight per device - defaults to %(default)s (one at a time)')
         parser.add_argument(
             '--ha-config',
             default='normal',
             choices=['normal', 'none', 'advanced'],
             help='What fields to configure in Home Assistant - defaults to most fields ("normal")')
+        parser.add_argument(
+            '--numeric-mode',
+            default='decimal',
+            choices=['decimal', 'float'],
+            help='How scaled values are parsed - "float" avoids Decimal allocations on busy bridges - defaults to %(default)s')
+        parser.add_argument(
+            '--plan-reads',
+            action='store_true',
+            help='Only poll the registers of published fields, plus the identity registers read once per connection - without "--ha-config advanced" the state topics of advanced fields stop being updated')
+        parser.add_argument(
+            '--read-gap',
+            default=DEFAULT_GAP_THRESHOLD,
+            type=int,
+            help='With --plan-reads, the largest gap in registers that is read to save a request - defaults to %(default)s')
+        parser.add_argument(
+            '--qos',
+            default=0,
+            type=int,
+            choices=[0, 1],
+            help='The MQTT QoS level for published state - defaults to %(default)s')
+        parser.add_argument(
+            '--publish-on-change',
+            metavar='SECONDS',
+            type=float,
+            help='Only publish values that changed, and every value at least every SECONDS')
+        parser.add_argument(
+            '--deadband',
+            metavar='[FIELD=]VALUE[%]',
+            action='append',
+            type=Deadband.parse,
+            help='With --publish-on-change, how much a value has to change to be published, for all fields or one')
+        parser.add_argument(
+            '--max-pending',
+            type=int,
+            metavar='N',
+            help='Keep at most N readings waiting to be published, only the newest per device and read window')
         parser.add_argument(
             '-v',
             action='store_true',
@@ -68,7 +118,13 @@ class CommandLineHandler:
         if sys.platform == 'win32':
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-        args = parser.parse_args()
+        args = parser.parse_args(self.argv[1:])
+        if args.pipeline < 1:
+            parser.error('--pipeline needs N >= 1')
+        if args.adaptive_interval:
+            floor, ceiling = args.adaptive_interval
+            if not 0 < floor <= ceiling:
+                parser.error('--adaptive-interval needs 0 < MIN <= MAX')
         setup_logging(logging.DEBUG if args.v else logging.INFO)
 
         if args.scan:
@@ -99,7 +155,7 @@ class CommandLineHandler:
 
     async def run(self, args: argparse.Namespace):
         loop = asyncio.get_running_loop()
-        bus = EventBus()
+        bus = EventBus(args.max_pending)
 
         # Set up strong reference for tasks
         self.background_tasks = set()
@@ -117,6 +173,10 @@ class CommandLineHandler:
             port=args.port,
             username=args.username,
             password=args.password,
+            max_pending=args.max_pending,
+            qos=args.qos,
+            heartbeat=args.publish_on_change,
+            deadbands=dict(args.deadband or []),
         )
         mqtt_task = loop.create_task(mqtt_client.run())
         self.background_tasks.add(mqtt_task)
@@ -124,7 +184,19 @@ class CommandLineHandler:
 
         # Start bluetooth handler (manages connections)
         addresses: List[str] = list(set(args.addresses))
-        handler = DeviceHandler(addresses, args.interval, bus)
+        numeric_mode = NumericMode[args.numeric_mode.upper()]
+        planned_fields = published_fields(args.ha_config) if args.plan_reads else None
+        adaptive_range = tuple(args.adaptive_interval) if args.adaptive_interval else None
+        handler = DeviceHandler(
+            addresses,
+            args.interval,
+            bus,
+            numeric_mode,
+            planned_fields,
+            args.read_gap,
+            adaptive_range,
+            args.pipeline
+        )
         bluetooth_task = loop.create_task(handler.run())
         self.background_tasks.add(bluetooth_task)
         bluetooth_task.add_done_callback(self.background_tasks.discard)
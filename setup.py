@@ -15,6 +15,7 @@ setup(
     long_description_content_type="text/markdown",
     url="https://github.com/JordiGrasvi/bluetti-elite200v2-mqtt",
     packages=find_packages(),
+    package_data={"bluetti_mqtt.core.devices": ["maps/*.json"]},
     classifiers=[
         "Development Status :: 4 - Beta",
         "Intended Audience :: Developers",
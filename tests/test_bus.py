@@ -0,0 +1,157 @@
+"""
+Tests per al bus d'esdeveniments i la cua amb fusió de missatges
+"""
+
+import asyncio
+from pathlib import Path
+import sys
+
+import pytest
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.bus import (
+    CoalescingQueue, CommandMessage, EventBus, OverflowPolicy, ParserMessage, coalesce_key
+)
+from bluetti_mqtt.core import AC300, WriteSingleRegister
+
+DEVICE = AC300('00:11:22:33:44:55', '1234')
+
+
+class TestCoalescingQueue:
+    """Tests per a CoalescingQueue"""
+
+    def test_keeps_newest_per_key(self):
+        """Test que només es guarda el missatge més recent de cada clau, a la seva posició"""
+        queue = CoalescingQueue(10)
+        queue.put_nowait('a1', 'a')
+        queue.put_nowait('b1', 'b')
+        queue.put_nowait('a2', 'a')
+
+        assert queue.qsize() == 2
+        assert queue.merged == 1
+        assert [queue.get_nowait(), queue.get_nowait()] == ['a2', 'b1']
+
+    def test_drops_oldest_when_full(self):
+        """Test que amb la cua plena es descarta el missatge més antic"""
+        queue = CoalescingQueue(2)
+        for key in 'abc':
+            queue.put_nowait(key, key)
+
+        assert queue.dropped == 1
+        assert [queue.get_nowait(), queue.get_nowait()] == ['b', 'c']
+        with pytest.raises(asyncio.QueueEmpty):
+            queue.get_nowait()
+
+    def test_unkeyed_items_go_first(self):
+        """Test que els missatges sense clau no es descarten i surten primer"""
+        queue = CoalescingQueue(1)
+        queue.put_nowait('a', 'a')
+        queue.put_nowait('command1')
+        queue.put_nowait('command2')
+        queue.put_nowait('b', 'b')
+
+        assert [queue.get_nowait() for _ in range(3)] == ['command1', 'command2', 'b']
+
+    @pytest.mark.asyncio
+    async def test_get_waits(self):
+        """Test que get espera fins que hi ha un missatge"""
+        queue = CoalescingQueue(1)
+        getter = asyncio.get_running_loop().create_task(queue.get())
+        await asyncio.sleep(0)
+        queue.put_nowait('a', 'a')
+        assert await asyncio.wait_for(getter, 1) == 'a'
+
+
+class TestEventBus:
+    """Tests per a EventBus amb i sense límit"""
+
+    def test_coalesce_key(self):
+        """Test que la clau distingeix dispositiu, lectura i paquet de bateries"""
+        msg = ParserMessage(DEVICE, {'pack_num': 1, 'pack_voltage': 50}, (91, 37))
+        other_pack = ParserMessage(DEVICE, {'pack_num': 2, 'pack_voltage': 51}, (91, 37))
+        newer = ParserMessage(DEVICE, {'pack_num': 1, 'pack_voltage': 52}, (91, 37))
+
+        assert coalesce_key(msg) == coalesce_key(newer)
+        assert coalesce_key(msg) != coalesce_key(other_pack)
+
+    @pytest.mark.asyncio
+    async def test_bounded_bus_publishes_latest(self):
+        """Test que després d'un bloqueig els oients reben l'estat actual i les ordres"""
+        bus = EventBus(max_pending=10)
+        received = []
+        commands = []
+
+        async def on_parsed(msg: ParserMessage):
+            received.append(msg.parsed['total_battery_percent'])
+
+        async def on_command(msg: CommandMessage):
+            commands.append(msg.command)
+
+        queue = bus.add_parser_listener(on_parsed)
+        bus.add_command_listener(on_command)
+
+        for percent in range(50):
+            await bus.put(ParserMessage(DEVICE, {'total_battery_percent': percent}, (36, 14)))
+        command = WriteSingleRegister(3007, 1)
+        await bus.put(CommandMessage(DEVICE, command))
+
+        task = asyncio.get_running_loop().create_task(bus.run())
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+        assert commands == [command]
+        assert received == [49]
+        assert queue.merged == 49
+
+    @pytest.mark.asyncio
+    async def test_slow_listener_does_not_block_others(self):
+        """Test que un oient lent no endarrereix els altres oients ni les ordres"""
+        bus = EventBus()
+        release = asyncio.Event()
+        fast = []
+        commands = []
+
+        async def slow_listener(msg: ParserMessage):
+            await release.wait()
+
+        async def fast_listener(msg: ParserMessage):
+            fast.append(msg)
+
+        async def on_command(msg: CommandMessage):
+            commands.append(msg)
+
+        bus.add_parser_listener(slow_listener, 100, OverflowPolicy.BLOCK)
+        task = asyncio.get_running_loop().create_task(bus.run())
+        bus.add_parser_listener(fast_listener)
+        bus.add_command_listener(on_command)
+
+        for i in range(10):
+            await bus.put(ParserMessage(DEVICE, {'total_battery_percent': i}, (36, 14)))
+        await bus.put(CommandMessage(DEVICE, WriteSingleRegister(3007, 1)))
+        await asyncio.sleep(0.01)
+
+        assert len(fast) == 10
+        assert len(commands) == 1
+        release.set()
+        task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_listener_errors_are_contained(self):
+        """Test que un oient que falla no atura el seu consum de missatges"""
+        bus = EventBus()
+        received = []
+
+        async def flaky_listener(msg: ParserMessage):
+            received.append(msg)
+            raise RuntimeError('error')
+
+        bus.add_parser_listener(flaky_listener)
+        task = asyncio.get_running_loop().create_task(bus.run())
+        for i in range(3):
+            await bus.put(ParserMessage(DEVICE, {'total_battery_percent': i}, (36, 14)))
+        await asyncio.sleep(0.01)
+
+        assert len(received) == 3
+        task.cancel()
@@ -0,0 +1,191 @@
+"""
+Tests per a l'enviament d'ordres del client Bluetooth
+"""
+
+import asyncio
+from pathlib import Path
+import struct
+import sys
+
+import pytest
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.bluetooth.client import BluetoothClient, ClientState
+from bluetti_mqtt.bluetooth.exc import BadConnectionError
+from bluetti_mqtt.core import ReadHoldingRegisters
+from bluetti_mqtt.core.utils import modbus_crc
+
+
+def build_response(command: ReadHoldingRegisters) -> bytes:
+    """Resposta amb el valor de cada registre igual a la seva adreça"""
+    body = struct.pack(f'!{command.quantity}H', *range(command.starting_address, command.starting_address + command.quantity))
+    response = bytes([1, 3, len(body)]) + body
+    return response + modbus_crc(response).to_bytes(2, 'little')
+
+
+class FakeConnection:
+    """Simula el dispositiu: respon a cada ordre en notificacions de mida fixa"""
+
+    def __init__(
+        self,
+        client: BluetoothClient,
+        chunk_size: int = 20,
+        supports_pipelining: bool = True,
+        corrupted_responses: int = 0
+    ):
+        self.client = client
+        self.chunk_size = chunk_size
+        self.supports_pipelining = supports_pipelining
+        self.corrupted_responses = corrupted_responses
+        self.unanswered = 0
+        self.written = []
+
+    async def write(self, buffer: bytes):
+        command = ReadHoldingRegisters(*struct.unpack('!HH', buffer[2:6]))
+        self.written.append(command)
+        self.unanswered += 1
+        if self.unanswered > 1 and not self.supports_pipelining:
+            # Alguns models ignoren les ordres que arriben mentre n'estan processant una altra
+            self.unanswered -= 1
+            return
+        response = build_response(command)
+        if self.corrupted_responses > 0:
+            self.corrupted_responses -= 1
+            response = response[:-1] + bytes([response[-1] ^ 0xFF])
+        asyncio.get_running_loop().call_soon(self._respond, response)
+
+    def _respond(self, response: bytes):
+        self.unanswered -= 1
+        for i in range(0, len(response), self.chunk_size):
+            self.client._on_packet(bytearray(response[i:i + self.chunk_size]))
+
+
+async def perform_all(client: BluetoothClient, commands):
+    futures = [await client.perform(c) for c in commands]
+    while not client.command_queue.empty():
+        await client._perform_command()
+    return [await f for f in futures]
+
+
+class TestBluetoothClient:
+    """Tests per al mode normal i el mode amb ordres en paral·lel"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('pipeline_depth', [1, 2, 4])
+    async def test_responses_match_commands(self, pipeline_depth):
+        """Test que cada resposta s'assigna a la seva ordre"""
+        client = BluetoothClient('00:11:22:33:44:55', False, pipeline_depth)
+        client.connection = FakeConnection(client, chunk_size=7)
+        client.state = ClientState.READY
+
+        commands = [ReadHoldingRegisters(10 * i, 3 + i) for i in range(5)]
+        responses = await perform_all(client, commands)
+
+        assert [bytes(r) for r in responses] == [build_response(c) for c in commands]
+        assert client.state == ClientState.READY
+        assert client.pipeline_depth == pipeline_depth
+
+    @pytest.mark.asyncio
+    async def test_falls_back_without_pipelining_support(self, monkeypatch):
+        """Test que es torna a una ordre cada cop si el dispositiu no ho suporta"""
+        monkeypatch.setattr(BluetoothClient, 'RESPONSE_TIMEOUT', 0.05)
+        client = BluetoothClient('00:11:22:33:44:55', False, 2)
+        client.connection = FakeConnection(client, supports_pipelining=False)
+        client.state = ClientState.READY
+
+        commands = [ReadHoldingRegisters(10 * i, 2 + i) for i in range(3)]
+        responses = await perform_all(client, commands)
+
+        assert [bytes(r) for r in responses] == [build_response(c) for c in commands]
+        assert client.pipeline_depth == 1
+
+    @pytest.mark.asyncio
+    async def test_fall_back_keeps_waiting_command(self, monkeypatch):
+        """Test que l'ordre que esperava lloc també es fa quan es torna a una ordre cada cop"""
+        monkeypatch.setattr(BluetoothClient, 'RESPONSE_TIMEOUT', 0.05)
+        client = BluetoothClient('00:11:22:33:44:55', False, 3)
+        client.connection = FakeConnection(client, corrupted_responses=1)
+        client.state = ClientState.READY
+
+        # La tercera ordre espera perquè la primera té una resposta de la mateixa mida
+        commands = [ReadHoldingRegisters(10, 2), ReadHoldingRegisters(20, 3), ReadHoldingRegisters(30, 2)]
+        responses = await asyncio.wait_for(perform_all(client, commands), timeout=5)
+
+        assert [bytes(r) for r in responses] == [build_response(c) for c in commands]
+        assert client.pipeline_depth == 1
+        assert client.command_queue._unfinished == 0
+
+    @pytest.mark.asyncio
+    async def test_disconnect_fails_waiting_command(self):
+        """Test que una desconnexió també falla l'ordre que esperava lloc"""
+        client = BluetoothClient('00:11:22:33:44:55', False, 3)
+        client.connection = FakeConnection(client)
+        client.state = ClientState.READY
+
+        # El dispositiu no respon i la connexió falla mentre espera la primera resposta
+        async def failing_write(buffer: bytes):
+            if len(client.in_flight) == 2:
+                err = BadConnectionError('Got AT+ notification')
+                asyncio.get_running_loop().call_soon(client.in_flight[0].response_future.set_exception, err)
+
+        client.connection.write = failing_write
+        commands = [ReadHoldingRegisters(10, 2), ReadHoldingRegisters(20, 3), ReadHoldingRegisters(30, 2)]
+        futures = [await client.perform(c) for c in commands]
+        await client._perform_command()
+
+        assert client.state == ClientState.DISCONNECTING
+        assert client.command_queue._unfinished == 0
+        for future in futures:
+            with pytest.raises(BadConnectionError):
+                await asyncio.wait_for(future, timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_reconnect_restores_pipeline_depth(self):
+        """Test que la profunditat configurada es recupera en tornar a connectar"""
+        client = BluetoothClient('00:11:22:33:44:55', False, 3)
+        client.pipeline_depth = 1
+
+        async def connect():
+            pass
+
+        client.client.connect = connect
+        await client._connect()
+        assert client.pipeline_depth == 3
+
+    @pytest.mark.asyncio
+    async def test_same_size_responses_are_not_pipelined(self):
+        """Test que no hi ha dues ordres en curs amb respostes de la mateixa mida"""
+        client = BluetoothClient('00:11:22:33:44:55', False, 4)
+        client.connection = FakeConnection(client)
+        client.state = ClientState.READY
+
+        in_flight = []
+        write = client.connection.write
+
+        async def tracking_write(buffer: bytes):
+            in_flight.append(len(client.in_flight))
+            await write(buffer)
+
+        client.connection.write = tracking_write
+        await perform_all(client, [ReadHoldingRegisters(10 * i, 2) for i in range(3)])
+        assert max(in_flight) == 1
+
+    @pytest.mark.asyncio
+    async def test_corrupted_response_retry(self, monkeypatch):
+        """Test que una resposta corrupta es reintenta sense esperar el temps màxim"""
+        client = BluetoothClient('00:11:22:33:44:55', False)
+        client.connection = FakeConnection(client)
+        client.state = ClientState.READY
+        monkeypatch.setattr(client.rtt, 'min_timeout', 0.01)
+
+        # Primer unes quantes respostes correctes per estimar el temps de resposta
+        await perform_all(client, [ReadHoldingRegisters(10, 4) for _ in range(5)])
+        assert client.rtt.timeout(ReadHoldingRegisters(10, 4).response_size()) < 1
+
+        client.connection.corrupted_responses = 1
+        start = asyncio.get_running_loop().time()
+        responses = await perform_all(client, [ReadHoldingRegisters(10, 4)])
+        assert bytes(responses[0]) == build_response(ReadHoldingRegisters(10, 4))
+        assert asyncio.get_running_loop().time() - start < 1
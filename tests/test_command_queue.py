@@ -0,0 +1,56 @@
+"""
+Tests per a la cua d'ordres amb prioritats
+"""
+
+import asyncio
+from pathlib import Path
+import sys
+
+import pytest
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.bluetooth import Priority
+from bluetti_mqtt.bluetooth.command_queue import CommandQueue
+
+
+class TestCommandQueue:
+    """Tests per a CommandQueue"""
+
+    def test_priority_order(self):
+        """Test que les escriptures passen davant del polling"""
+        queue = CommandQueue()
+        queue.put_nowait('bulk', Priority.BULK_POLL)
+        queue.put_nowait('live1', Priority.LIVE_POLL)
+        queue.put_nowait('live2', Priority.LIVE_POLL)
+        queue.put_nowait('write', Priority.USER_WRITE)
+
+        assert [queue.get_nowait() for _ in range(4)] == ['write', 'live1', 'live2', 'bulk']
+        assert queue.empty()
+        with pytest.raises(asyncio.QueueEmpty):
+            queue.get_nowait()
+
+    def test_starvation_guard(self):
+        """Test que les classes de menys prioritat no queden bloquejades"""
+        queue = CommandQueue()
+        queue.put_nowait('bulk', Priority.BULK_POLL)
+        for i in range(20):
+            queue.put_nowait(f'live{i}', Priority.LIVE_POLL)
+
+        served = [queue.get_nowait() for _ in range(21)]
+        assert served.index('bulk') == CommandQueue.MAX_SKIPS
+
+    @pytest.mark.asyncio
+    async def test_get_waits_for_items(self):
+        """Test que get espera fins que hi ha ordres"""
+        queue = CommandQueue()
+        getter = asyncio.get_running_loop().create_task(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+
+        await queue.put('write', Priority.USER_WRITE)
+        assert await asyncio.wait_for(getter, 1) == 'write'
+
+        queue.task_done()
+        await asyncio.wait_for(queue.join(), 1)
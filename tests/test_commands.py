@@ -0,0 +1,59 @@
+"""
+Tests per a les ordres MODBUS i el càlcul del CRC
+"""
+
+import os
+from pathlib import Path
+import sys
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import crcmod.predefined
+from bluetti_mqtt.core import ReadHoldingRegisters, WriteSingleRegister
+from bluetti_mqtt.core.utils import modbus_crc, table_modbus_crc
+
+
+class TestModbusCrc:
+    """Tests per a les implementacions del CRC MODBUS"""
+
+    def test_table_matches_crcmod(self):
+        """Test que la taula calcula el mateix CRC que crcmod, per a mides parells i senars"""
+        reference = crcmod.predefined.mkCrcFun('modbus')
+        for size in (0, 1, 2, 7, 8, 255):
+            data = os.urandom(size)
+            assert table_modbus_crc(data) == reference(data)
+
+    def test_table_is_incremental(self):
+        """Test que el CRC es pot calcular per trossos"""
+        data = os.urandom(101)
+        crc = table_modbus_crc(memoryview(data)[:33])
+        assert table_modbus_crc(memoryview(data)[33:], crc) == modbus_crc(data)
+
+
+class TestCommands:
+    """Tests per a les trames de les ordres"""
+
+    def test_frame(self):
+        """Test que la trama inclou l'adreça, el codi de funció, les dades i el CRC"""
+        command = ReadHoldingRegisters(10, 40)
+        assert bytes(command) == bytes.fromhex('0103000a002865d6')
+        assert bytes(command) is command.frame
+        assert command.response_size() == 85
+
+    def test_reads_are_interned(self):
+        """Test que les lectures iguals són el mateix objecte"""
+        assert ReadHoldingRegisters(70, 21) is ReadHoldingRegisters(70, 21)
+        assert ReadHoldingRegisters(70, 21) is not ReadHoldingRegisters(70, 22)
+
+    def test_writes_are_not_interned(self):
+        """Test que les escriptures no es reutilitzen"""
+        assert WriteSingleRegister(3007, 1) is not WriteSingleRegister(3007, 1)
+
+    def test_is_valid_response(self):
+        """Test que es detecten respostes amb el CRC incorrecte"""
+        command = WriteSingleRegister(3007, 1)
+        response = bytes(command)
+        assert command.is_valid_response(response)
+        assert command.is_valid_response(memoryview(response))
+        assert not command.is_valid_response(response[:-1] + bytes([response[-1] ^ 1]))
@@ -0,0 +1,170 @@
+"""
+Tests per a l'encriptació i el lliurament ordenat dels paquets de les connexions
+"""
+
+import asyncio
+import os
+from pathlib import Path
+import sys
+
+import pytest
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.ciphers import algorithms
+from bluetti_mqtt.bluetooth.encryption import (
+    EncryptedConnection, PassthroughConnection, aes_decrypt, aes_encrypt,
+    der_to_raw_ecdsa, raw_ecdsa_to_der, signature_signing_key
+)
+from bluetti_mqtt.bluetooth.simulator import EncryptedPeer
+
+
+async def no_write(buffer: bytes):
+    pass
+
+
+class TestAes:
+    """Tests per a aes_encrypt i aes_decrypt"""
+
+    @pytest.mark.parametrize('size', [0, 1, 15, 16, 17, 100])
+    def test_round_trip(self, size):
+        """Test que el que s'encripta es desencripta igual, amb IV aleatori o fix"""
+        key = os.urandom(32)
+        data = os.urandom(size)
+        for iv in (None, os.urandom(16)):
+            encrypted = aes_encrypt(data, key, iv)
+            header = 6 if iv is None else 2
+            assert len(encrypted) == header + (size + 15) // 16 * 16
+            assert aes_decrypt(encrypted, key, iv) == data
+
+    def test_prepared_key(self):
+        """Test que una clau preparada dóna el mateix resultat que els bytes de la clau"""
+        key = os.urandom(16)
+        iv = os.urandom(16)
+        data = os.urandom(40)
+        assert aes_encrypt(data, algorithms.AES(key), iv) == aes_encrypt(data, key, iv)
+        assert aes_decrypt(aes_encrypt(data, key, iv), algorithms.AES(key), iv) == data
+
+
+class TestSignatures:
+    """Tests per a la conversió de signatures i les claus estàtiques"""
+
+    def test_signing_key_is_loaded_once(self):
+        """Test que la clau de signatura es carrega un sol cop"""
+        assert signature_signing_key() is signature_signing_key()
+
+    def test_signature_round_trip(self):
+        """Test que una signatura convertida a format cru i tornada a DER encara és vàlida"""
+        key = signature_signing_key()
+        data = os.urandom(80)
+        raw = der_to_raw_ecdsa(key.sign(data, ec.ECDSA(hashes.SHA256())))
+
+        assert len(raw) == 64
+        key.public_key().verify(raw_ecdsa_to_der(raw), data, ec.ECDSA(hashes.SHA256()))
+        assert der_to_raw_ecdsa(raw_ecdsa_to_der(raw)) == raw
+
+    def test_small_components_are_padded(self):
+        """Test que r i s curts s'omplen fins a 32 bytes"""
+        raw = bytes(31) + b'\x01' + bytes(30) + b'\x01\x02'
+        assert der_to_raw_ecdsa(raw_ecdsa_to_der(raw)) == raw
+
+
+class TestConnection:
+    """Tests per a Connection.receive"""
+
+    @pytest.mark.asyncio
+    async def test_passthrough_delivers_synchronously(self):
+        """Test que sense encriptació els paquets es lliuren de seguida, sense crear tasques"""
+        received = []
+        connection = PassthroughConnection(received.append, no_write)
+        tasks = len(asyncio.all_tasks())
+
+        for i in range(5):
+            connection.receive(bytearray([i]))
+
+        assert received == [bytearray([i]) for i in range(5)]
+        assert len(asyncio.all_tasks()) == tasks
+
+    @pytest.mark.asyncio
+    async def test_async_handler_keeps_order(self):
+        """Test que els paquets es processen en ordre d'arribada encara que el processament s'aturi"""
+        received = []
+
+        async def on_plaintext_packet(buffer: bytearray):
+            # El primer paquet tarda més que els altres
+            await asyncio.sleep(0.01 if buffer[0] == 0 else 0)
+            received.append(buffer[0])
+
+        connection = PassthroughConnection(on_plaintext_packet, no_write)
+        for i in range(5):
+            connection.receive(bytearray([i]))
+        await asyncio.sleep(0.05)
+
+        assert received == list(range(5))
+        connection.close()
+
+    @pytest.mark.asyncio
+    async def test_errors_do_not_stop_the_consumer(self):
+        """Test que un paquet erroni no atura el processament dels següents"""
+        received = []
+        connection = EncryptedConnection(received.append, no_write)
+
+        # Sense clau, qualsevol paquet encriptat és un error
+        connection.receive(bytearray(b'\x00\x10' + bytes(16)))
+        await asyncio.sleep(0)
+        connection.unsecure_aes_key = bytes(16)
+        connection.unsecure_aes_iv = bytes(16)
+        connection.receive(bytearray(b'\x00\x02' + bytes(16)))
+        await asyncio.sleep(0.01)
+
+        assert len(received) == 1
+        connection.close()
+
+
+class TestHandshake:
+    """Tests per a l'encaixada contra un dispositiu simulat"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('offload_crypto', [False, True])
+    async def test_handshake(self, offload_crypto):
+        """Test que la connexió i el dispositiu acorden la mateixa clau i es poden parlar"""
+        received = []
+        device_received = []
+        connection = None
+        peer = EncryptedPeer(lambda data: connection.receive(bytearray(data)), device_received.append)
+
+        async def write(data: bytes):
+            peer.on_packet(data)
+
+        connection = EncryptedConnection(
+            received.append, write, offload_crypto=offload_crypto, peer_verify_key=peer.verify_key
+        )
+        peer.start()
+        await asyncio.wait_for(connection.wait_until_ready(), 5)
+        assert connection.secure_aes_key == peer.secure_aes_key
+
+        await connection.write(b'\x01\x03')
+        peer.write(b'\x01\x03\x00')
+        await asyncio.sleep(0.01)
+        assert device_received == [b'\x01\x03']
+        assert received == [b'\x01\x03\x00']
+        connection.close()
+
+    @pytest.mark.asyncio
+    async def test_rejects_unknown_signing_key(self):
+        """Test que un dispositiu signat amb una altra clau no completa l'encaixada"""
+        connection = None
+        peer = EncryptedPeer(lambda data: connection.receive(bytearray(data)))
+
+        async def write(data: bytes):
+            peer.on_packet(data)
+
+        # Sense peer_verify_key es fa servir la clau coneguda dels dispositius reals
+        connection = EncryptedConnection(lambda data: None, write)
+        peer.start()
+        await asyncio.sleep(0.05)
+        assert not connection.ready_event.is_set()
+        connection.close()
@@ -0,0 +1,87 @@
+"""
+Tests per al reassemblatge de respostes MODBUS
+"""
+
+from pathlib import Path
+import struct
+import sys
+
+import pytest
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.bluetooth import ModbusError, ParseError
+from bluetti_mqtt.bluetooth.frame_assembler import FrameAssembler
+from bluetti_mqtt.core import ReadHoldingRegisters, WriteSingleRegister
+from bluetti_mqtt.core.utils import modbus_crc
+
+
+def with_crc(frame: bytes) -> bytes:
+    return frame + modbus_crc(frame).to_bytes(2, 'little')
+
+
+class TestFrameAssembler:
+    """Tests per a FrameAssembler"""
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 100])
+    def test_assemble_in_chunks(self, chunk_size):
+        """Test que la resposta es reconstrueix sigui quina sigui la mida dels fragments"""
+        command = ReadHoldingRegisters(10, 4)
+        response = with_crc(b'\x01\x03\x08' + struct.pack('!4H', 1, 2, 3, 4))
+
+        assembler = FrameAssembler()
+        assembler.start(command)
+        for i in range(0, len(response), chunk_size):
+            chunk = memoryview(response)[i:i + chunk_size]
+            assert assembler.feed(chunk) == len(chunk)
+
+        assert assembler.complete
+        frame = assembler.result()
+        assert isinstance(frame, memoryview)
+        assert bytes(frame) == response
+        assert command.parse_response(frame) == struct.pack('!4H', 1, 2, 3, 4)
+
+    def test_leaves_next_frame_data(self):
+        """Test que les dades de la resposta següent no es consumeixen"""
+        first = with_crc(b'\x01\x03\x02\x00\x2a')
+        second = with_crc(b'\x01\x06\x0b\xbf\x00\x01')
+        data = memoryview(first + second)
+
+        assembler = FrameAssembler()
+        assembler.start(ReadHoldingRegisters(10, 1))
+        used = assembler.feed(data)
+        assert used == len(first)
+        assert bytes(assembler.result()) == first
+
+        assembler.start(WriteSingleRegister(3007, 1))
+        assert assembler.feed(data[used:]) == len(second)
+        assert bytes(assembler.result()) == second
+
+    def test_exception_frame(self):
+        """Test que les excepcions MODBUS es detecten amb 5 bytes"""
+        assembler = FrameAssembler()
+        assembler.start(ReadHoldingRegisters(10, 40))
+        assert assembler.feed(memoryview(with_crc(b'\x01\x83\x02') + b'extra')) == 5
+
+        assert assembler.complete
+        with pytest.raises(ModbusError):
+            assembler.result()
+
+    def test_unexpected_length(self):
+        """Test que una longitud impossible es detecta a la capçalera"""
+        assembler = FrameAssembler()
+        assembler.start(ReadHoldingRegisters(10, 4))
+        with pytest.raises(ParseError):
+            assembler.feed(memoryview(b'\x01\x03\x06'))
+
+    def test_failed_checksum(self):
+        """Test que un CRC incorrecte dona error"""
+        response = bytearray(with_crc(b'\x01\x03\x02\x00\x2a'))
+        response[-1] ^= 0xFF
+
+        assembler = FrameAssembler()
+        assembler.start(ReadHoldingRegisters(10, 1))
+        assembler.feed(memoryview(bytes(response)))
+        with pytest.raises(ParseError):
+            assembler.result()
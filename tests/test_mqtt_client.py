@@ -0,0 +1,209 @@
+"""
+Tests per a la publicació MQTT
+"""
+
+import asyncio
+from decimal import Decimal
+from pathlib import Path
+import struct
+import sys
+
+import pytest
+from asyncio_mqtt import MqttError
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.bus import EventBus, ParserMessage
+from bluetti_mqtt.core import AC300, NumericMode
+from bluetti_mqtt.core.devices.struct import DeviceStruct
+from bluetti_mqtt import mqtt_client as mqtt_client_module
+from bluetti_mqtt.mqtt_client import Deadband, MQTTClient, format_numeric
+
+DEVICE = AC300('00:11:22:33:44:55', '1234')
+
+
+class FakeClient:
+    """Simula el client MQTT: cada publicació tarda una mica"""
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.published = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def publish(self, topic, payload=None, qos=0, retain=False):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        self.published.append((topic, payload, qos, retain))
+
+
+class TestMQTTClient:
+    """Tests per a MQTTClient"""
+
+    @pytest.mark.asyncio
+    async def test_build_publishes(self):
+        """Test que es construeixen tots els temes i valors d'un missatge"""
+        mqtt_client = MQTTClient(EventBus(), 'localhost', 'normal')
+        msg = ParserMessage(DEVICE, {
+            'total_battery_percent': 87,
+            'ac_output_on': True,
+            'internal_dc_input_voltage': Decimal('52.3'),
+            'unknown_field': 1,
+        })
+
+        publishes = mqtt_client._build_publishes(msg)
+        assert publishes == [
+            ('bluetti/state/AC300-1234/total_battery_percent', b'87', False),
+            ('bluetti/state/AC300-1234/ac_output_on', b'ON', False),
+            ('bluetti/state/AC300-1234/dc_input_voltage1', b'52.3', False),
+        ]
+
+    def test_publish_plan_is_built_once(self):
+        """Test que el pla de publicació d'un dispositiu es construeix un sol cop"""
+        mqtt_client = MQTTClient(EventBus(), 'localhost', 'normal')
+        plan = mqtt_client._publish_plan(DEVICE)
+
+        assert mqtt_client._publish_plan(DEVICE) is plan
+        assert plan['total_battery_percent'].topic == 'bluetti/state/AC300-1234/total_battery_percent'
+        assert plan['internal_dc_input_voltage'].id == 'dc_input_voltage1'
+        assert plan['ac_output_on'].encode(False) == b'OFF'
+        assert 'unknown_field' not in plan
+
+    def test_decimal_mode_payloads_are_unchanged(self):
+        """Test que en mode DECIMAL els valors es publiquen amb str(), com sempre"""
+        s = DeviceStruct()
+        s.add_decimal32_field('total_energy', 10, 1)
+        value = s.parse(10, struct.pack('!2H', 120, 0))['total_energy']
+
+        # Els camps decimal32 donen un float també en mode DECIMAL
+        assert isinstance(value, float)
+        assert mqtt_client_module.encode_numeric(value) == b'12.0'
+        assert format_numeric(value) == '12.0'
+        assert format_numeric(value, NumericMode.FLOAT) == '12'
+
+    def test_publish_plan_numeric_mode(self):
+        """Test que el pla de publicació fa servir el codificador del mode numèric del dispositiu"""
+        mqtt_client = MQTTClient(EventBus(), 'localhost', 'normal')
+        device = AC300('00:11:22:33:44:66', '5678')
+        device.numeric_mode = NumericMode.FLOAT
+
+        assert mqtt_client._publish_plan(DEVICE)['total_battery_percent'].encode(12.0) == b'12.0'
+        assert mqtt_client._publish_plan(device)['total_battery_percent'].encode(12.0) == b'12'
+        assert mqtt_client._publish_plan(device)['internal_dc_input_voltage'].encode(52.3) == b'52.3'
+
+    @pytest.mark.asyncio
+    async def test_qos0_batch_is_not_serialized(self):
+        """Test que amb QoS 0 les publicacions d'un lot s'envien alhora"""
+        mqtt_client = MQTTClient(EventBus(), 'localhost', 'normal')
+        client = FakeClient()
+        publishes = [(f'topic/{i}', b'1', False) for i in range(30)]
+
+        await mqtt_client._publish_batch(client, publishes)
+        assert len(client.published) == 30
+        assert client.max_in_flight == 30
+
+    @pytest.mark.asyncio
+    async def test_qos1_bounds_in_flight(self):
+        """Test que amb QoS 1 es limiten les publicacions pendents de confirmació"""
+        mqtt_client = MQTTClient(EventBus(), 'localhost', 'normal', qos=1, max_inflight=4)
+        client = FakeClient()
+        publishes = [(f'topic/{i}', b'1', False) for i in range(30)]
+
+        await mqtt_client._publish_batch(client, publishes)
+        assert len(client.published) == 30
+        assert client.max_in_flight == 4
+        assert all(qos == 1 for _, _, qos, _ in client.published)
+
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('qos', [0, 1])
+    async def test_failed_publish_settles_batch(self, qos):
+        """Test que si falla una publicació les altres acaben i es llança el primer error"""
+        mqtt_client = MQTTClient(EventBus(), 'localhost', 'normal', qos=qos)
+        client = FakeClient()
+        publish = client.publish
+
+        async def failing_publish(topic, payload=None, qos=0, retain=False):
+            if topic == 'topic/3':
+                raise MqttError('desconnectat')
+            await publish(topic, payload, qos, retain)
+
+        client.publish = failing_publish
+        publishes = [(f'topic/{i}', b'1', False) for i in range(10)]
+
+        with pytest.raises(MqttError):
+            await mqtt_client._publish_batch(client, publishes)
+        assert len(client.published) == 9
+        assert client.in_flight == 0
+
+
+class TestPublishOnChange:
+    """Tests per a la publicació només dels canvis"""
+
+    def test_deadband_parse(self):
+        """Test que es llegeixen les bandes mortes absolutes i relatives"""
+        assert Deadband.parse('5') == (None, Deadband(absolute=5))
+        assert Deadband.parse('ac_output_power=10%') == ('ac_output_power', Deadband(relative=0.1))
+
+    def test_deadband_exceeded(self):
+        """Test que només els canvis més grans que la banda morta compten"""
+        assert Deadband().exceeded(1, 2)
+        assert not Deadband().exceeded(1, 1)
+        assert not Deadband(absolute=5).exceeded(100, 104)
+        assert Deadband(absolute=5).exceeded(100, 95)
+        assert not Deadband(relative=0.1).exceeded(Decimal('50.0'), Decimal('54.0'))
+        assert Deadband(relative=0.1).exceeded(Decimal('50.0'), Decimal('56.0'))
+        assert Deadband(absolute=5).exceeded(True, False)
+
+    @pytest.mark.asyncio
+    async def test_only_changes_and_heartbeat(self, monkeypatch):
+        """Test que només es publiquen els canvis, i tot un cop passat el batec"""
+        now = [0.0]
+        monkeypatch.setattr(mqtt_client_module.time, 'monotonic', lambda: now[0])
+        mqtt_client = MQTTClient(
+            EventBus(), 'localhost', 'normal',
+            heartbeat=60, deadbands={'ac_output_power': Deadband(absolute=10)}
+        )
+
+        client = FakeClient(delay=0)
+
+        async def topics(parsed):
+            client.published.clear()
+            await mqtt_client._handle_message(client, ParserMessage(DEVICE, parsed))
+            return [t.rsplit('/', 1)[1] for t, _, _, _ in client.published]
+
+        assert await topics({'total_battery_percent': 87, 'ac_output_power': 100}) == [
+            'total_battery_percent', 'ac_output_power'
+        ]
+        now[0] = 5
+        assert await topics({'total_battery_percent': 87, 'ac_output_power': 105}) == []
+        now[0] = 10
+        assert await topics({'total_battery_percent': 88, 'ac_output_power': 109}) == ['total_battery_percent']
+        now[0] = 61
+        assert await topics({'total_battery_percent': 88, 'ac_output_power': 109}) == ['ac_output_power']
+
+    @pytest.mark.asyncio
+    async def test_failed_publish_is_not_recorded(self):
+        """Test que un valor que no s'ha pogut publicar es torna a publicar"""
+        mqtt_client = MQTTClient(EventBus(), 'localhost', 'normal', heartbeat=60)
+        client = FakeClient(delay=0)
+        publish = client.publish
+
+        async def failing_publish(topic, payload=None, qos=0, retain=False):
+            if topic.endswith('/ac_output_power'):
+                raise MqttError('desconnectat')
+            await publish(topic, payload, qos, retain)
+
+        client.publish = failing_publish
+        msg = ParserMessage(DEVICE, {'total_battery_percent': 87, 'ac_output_power': 100})
+        with pytest.raises(MqttError):
+            await mqtt_client._handle_message(client, msg)
+        assert list(mqtt_client.last_published) == ['bluetti/state/AC300-1234/total_battery_percent']
+
+        client.publish = publish
+        client.published.clear()
+        await mqtt_client._handle_message(client, msg)
+        assert [t for t, _, _, _ in client.published] == ['bluetti/state/AC300-1234/ac_output_power']
@@ -0,0 +1,76 @@
+"""
+Tests per al canvi de paquet de bateries
+"""
+
+import asyncio
+from pathlib import Path
+import struct
+import sys
+
+import pytest
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.bluetooth import PackSwitcher
+from bluetti_mqtt.core import AC300, EB3A
+from bluetti_mqtt.core.utils import modbus_crc
+
+
+class FakeDevice:
+    """Simula un dispositiu que canvia de paquet després de diverses lectures"""
+
+    def __init__(self, reads_before_switch: int, pack: int):
+        self.reads_before_switch = reads_before_switch
+        self.pack = pack
+        self.commands = []
+
+    async def perform(self, command):
+        self.commands.append(command)
+        current = self.pack if len(self.commands) > self.reads_before_switch else 0
+        response = bytearray(b'\x01\x03\x02' + struct.pack('!H', current))
+        response += modbus_crc(bytes(response)).to_bytes(2, 'little')
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(bytes(response))
+        return future
+
+
+@pytest.fixture(autouse=True)
+def fast_switcher(monkeypatch):
+    monkeypatch.setattr(PackSwitcher, 'RETRY_INTERVAL', 0)
+    monkeypatch.setattr(PackSwitcher, '_switch_times', {})
+
+
+class TestPackSwitcher:
+    """Tests per a PackSwitcher"""
+
+    def test_reads_back_reported_pack_number(self):
+        """Test que es llegeix el número de paquet no modificable"""
+        switcher = PackSwitcher(AC300('00:11:22:33:44:55', '1234'), None)
+        assert switcher.readback_command.starting_address == 96
+        assert switcher.readback_command.quantity == 1
+
+    def test_no_readback_without_pack_number(self):
+        """Test dispositius sense número de paquet"""
+        switcher = PackSwitcher(EB3A('00:11:22:33:44:55', '1234'), None)
+        assert switcher.readback_command is None
+
+    @pytest.mark.asyncio
+    async def test_wait_for_pack(self):
+        """Test que s'espera fins que el dispositiu confirma el canvi"""
+        fake = FakeDevice(reads_before_switch=3, pack=2)
+        switcher = PackSwitcher(AC300('00:11:22:33:44:55', '1234'), fake.perform)
+
+        assert await switcher.wait_for_pack(2)
+        assert len(fake.commands) == 4
+        assert switcher.expected_switch_time is not None
+
+    @pytest.mark.asyncio
+    async def test_wait_for_pack_timeout(self, monkeypatch):
+        """Test que es deixa d'esperar si el canvi no es confirma"""
+        monkeypatch.setattr(PackSwitcher, 'TIMEOUT', 0)
+        fake = FakeDevice(reads_before_switch=100, pack=2)
+        switcher = PackSwitcher(AC300('00:11:22:33:44:55', '1234'), fake.perform)
+
+        assert not await switcher.wait_for_pack(2)
+        assert switcher.expected_switch_time is None
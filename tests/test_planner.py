@@ -0,0 +1,105 @@
+"""
+Tests per al planificador de lectures
+"""
+
+from pathlib import Path
+import sys
+
+import pytest
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.core import AC200M, AC300, AC500, AC60, EB3A, EP500, EP500P, EP600, V2Device
+from bluetti_mqtt.core.devices.struct import DeviceStruct
+from bluetti_mqtt.core.planner import plan_polling_commands, plan_polling_schedule, plan_reads
+from bluetti_mqtt.mqtt_client import published_fields
+
+
+def windows(commands):
+    return [(c.starting_address, c.quantity) for c in commands]
+
+
+class TestPlanner:
+    """Tests per a plan_reads i plan_polling_commands"""
+
+    def test_merges_small_gaps(self):
+        """Test que els forats petits dins d'una finestra coneguda s'uneixen"""
+        s = DeviceStruct()
+        s.add_uint_field('a', 10)
+        s.add_uint32_field('b', 13)
+        s.add_uint_field('c', 40)
+
+        assert windows(plan_reads(s.fields, [(0, 50)], gap_threshold=2)) == [(10, 5), (40, 1)]
+        assert windows(plan_reads(s.fields, [(0, 50)], gap_threshold=30)) == [(10, 31)]
+
+    def test_does_not_merge_outside_known_windows(self):
+        """Test que no es llegeixen registres fora de les finestres conegudes"""
+        s = DeviceStruct()
+        s.add_uint_field('a', 10)
+        s.add_uint_field('b', 20)
+
+        assert windows(plan_reads(s.fields, [(0, 15), (20, 30)], gap_threshold=50)) == [(10, 1), (20, 1)]
+
+    def test_max_registers(self):
+        """Test que cap lectura supera el màxim de registres"""
+        s = DeviceStruct()
+        for address in range(0, 300, 10):
+            s.add_uint_field(f'f{address}', address)
+
+        reads = plan_reads(s.fields, [(0, 300)], max_registers=125, gap_threshold=20)
+        assert all(r.quantity <= 125 for r in reads)
+        assert len(reads) == 3
+
+    def test_device_polling_commands(self):
+        """Test planificació pels camps publicats d'un AC300"""
+        device = AC300('00:11:22:33:44:55', '1234')
+        fields = published_fields('normal')
+        commands = plan_polling_commands(device, fields)
+
+        covered = set()
+        for c in commands:
+            covered.update(range(c.starting_address, c.starting_address + c.quantity))
+        for name in fields:
+            for f in device.struct.get_fields(name):
+                if f.address < 91 or f.address >= 3000:
+                    assert set(range(f.address, f.address + f.size)) <= covered
+
+        # Els camps avançats només es llegeixen en mode avançat
+        assert 'ac_output_mode' not in fields
+        assert sum(c.quantity for c in commands) < sum(c.quantity for c in device.polling_commands)
+
+    def test_v2_keeps_polling_commands(self):
+        """Test que els dispositius V2 mantenen les seves ordres"""
+        device = V2Device('00:11:22:33:44:55', '1234', 'EL200V2')
+        commands = plan_polling_commands(device, published_fields('advanced'))
+        assert windows(commands) == windows(device.polling_commands)
+
+    @pytest.mark.parametrize('device_class', [AC200M, AC300, AC500, AC60, EB3A, EP500, EP500P, EP600])
+    @pytest.mark.parametrize('ha_config', ['normal', 'advanced'])
+    def test_never_more_reads_than_schedule(self, device_class, ha_config):
+        """Test que la planificació no fa més lectures que les finestres fixes"""
+        device = device_class('00:11:22:33:44:55', '1234')
+        windows = plan_polling_schedule(device, published_fields(ha_config))
+        assert len(windows) <= len(device.polling_schedule)
+
+    def test_duplicate_fields_use_scheduled_register(self):
+        """Test que dels camps repetits només es llegeix el que ja es llegia"""
+        device = EB3A('00:11:22:33:44:55', '1234')
+        commands = plan_polling_commands(device, ['ac_output_on', 'dc_output_on'])
+        assert windows(commands) == [(10, 17), (48, 2)]
+
+        # Un sol forat gran no parteix la finestra de l'AC60 en dues lectures
+        device = AC60('00:11:22:33:44:55', '1234')
+        commands = plan_polling_commands(device, published_fields('normal'))
+        assert len(commands) == 1
+
+    @pytest.mark.parametrize('device_class', [AC200M, AC300, AC500, EB3A, EP500, EP500P])
+    def test_keeps_identity_window(self, device_class):
+        """Test que la finestra d'identitat, que es llegeix un cop, sempre es manté"""
+        device = device_class('00:11:22:33:44:55', '1234')
+        once = [w for w in device.polling_schedule if w.once]
+        assert once
+
+        windows = plan_polling_schedule(device, published_fields('normal'))
+        assert [w for w in windows if w.once] == once
@@ -0,0 +1,76 @@
+"""
+Tests per als mapes de registres declaratius
+"""
+
+from decimal import Decimal
+import json
+from pathlib import Path
+import struct
+import sys
+
+import pytest
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.core import EP600
+from bluetti_mqtt.core.devices.register_map import RegisterMap, load_register_maps
+
+
+MAP_DEFINITION = {
+    'type': 'TEST100',
+    'blocks': {'HOME_DATA': 100},
+    'enums': {'ChargingMode': {'STANDARD': 0, 'SILENT': 1, 'TURBO': 2}},
+    'fields': [
+        {'name': 'total_battery_percent', 'type': 'uint', 'address': 'HOME_DATA+2'},
+        {'name': 'pack_voltage', 'type': 'decimal', 'address': 'HOME_DATA+3', 'scale': 1, 'range': [0, 100]},
+        {'name': 'charging_mode', 'type': 'enum', 'address': 3000, 'enum': 'ChargingMode'},
+    ],
+    'polling_commands': [['HOME_DATA', 4], [3000, 1]],
+    'logging_commands': [['HOME_DATA', 10]],
+    'writable_ranges': [[3000, 3001]],
+}
+
+
+class TestRegisterMap:
+    """Tests per a RegisterMap"""
+
+    def test_device_from_map(self):
+        """Test creació d'un dispositiu a partir d'un mapa"""
+        register_map = RegisterMap(MAP_DEFINITION)
+        device = register_map.device_class('00:11:22:33:44:55', '1234')
+
+        assert device.type == 'TEST100'
+        assert [(c.starting_address, c.quantity) for c in device.polling_commands] == [(100, 4), (3000, 1)]
+        assert device.has_field_setter('charging_mode')
+        assert not device.has_field_setter('pack_voltage')
+        assert device.build_setter_command('charging_mode', 'TURBO').value == 2
+
+        data = struct.pack('!4H', 0, 0, 87, 523)
+        assert device.parse(100, data) == {'total_battery_percent': 87, 'pack_voltage': Decimal('52.3')}
+
+    def test_invalid_map(self):
+        """Test error amb un mapa invàlid"""
+        definition = dict(MAP_DEFINITION, polling_commands=[['UNKNOWN_BLOCK', 4]])
+        with pytest.raises(ValueError):
+            RegisterMap(definition)
+
+    def test_compile_precompiles_windows(self):
+        """Test que compilar un mapa prepara els plans de totes les seves finestres"""
+        register_map = RegisterMap(MAP_DEFINITION)
+        compiled = register_map.compile()
+        assert sorted(compiled._layouts) == register_map.windows
+
+    def test_invalid_map_file_is_skipped(self, tmp_path):
+        """Test que un fitxer de mapa malmès no impedeix carregar els altres"""
+        (tmp_path / 'bad.json').write_text('{"type": ')
+        with open(tmp_path / 'good.json', 'w') as f:
+            json.dump(MAP_DEFINITION, f)
+
+        maps = load_register_maps([tmp_path])
+        assert list(maps) == ['TEST100']
+
+    def test_builtin_maps(self):
+        """Test que els mapes inclosos es carreguen"""
+        maps = load_register_maps()
+        assert maps['EP600'].device_class is EP600
@@ -0,0 +1,46 @@
+"""
+Tests per a l'estimació del temps de resposta
+"""
+
+from pathlib import Path
+import sys
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.bluetooth.rtt import RttEstimator, backoff_delay
+
+
+class TestRttEstimator:
+    """Tests per a RttEstimator i backoff_delay"""
+
+    def test_initial_timeout(self):
+        """Test que sense mostres es fa servir el temps inicial"""
+        rtt = RttEstimator(5)
+        assert rtt.timeout(85) == 5
+
+    def test_timeout_follows_samples(self):
+        """Test que el temps d'espera s'ajusta a les respostes observades"""
+        rtt = RttEstimator(5, min_timeout=0.1)
+        for _ in range(50):
+            rtt.sample(85, 0.3)
+
+        assert 0.3 <= rtt.timeout(85) < 0.5
+        # Les respostes de mida molt diferent tenen la seva pròpia estimació
+        assert rtt.timeout(250) == 5
+
+    def test_timeout_bounds(self):
+        """Test que el temps d'espera queda entre el mínim i el màxim"""
+        rtt = RttEstimator(5, min_timeout=1)
+        rtt.sample(85, 0.01)
+        assert rtt.timeout(85) == 1
+
+        rtt.sample(250, 4)
+        assert rtt.timeout(250) == 5
+
+    def test_backoff_delay(self):
+        """Test que l'espera entre reintents creix amb jitter i té un màxim"""
+        for attempt in range(1, 10):
+            expected = min(5, 0.25 * 2 ** (attempt - 1))
+            delay = backoff_delay(attempt)
+            assert expected / 2 <= delay <= expected
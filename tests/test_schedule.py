@@ -0,0 +1,120 @@
+"""
+Tests per a la planificació del polling per finestres
+"""
+
+from pathlib import Path
+import sys
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.core import AC300, PollingWindow, ReadHoldingRegisters
+from bluetti_mqtt.core.planner import plan_polling_schedule
+from bluetti_mqtt.core.schedule import PollingSchedule
+
+
+def window_address(window):
+    return window.command.starting_address if window else None
+
+
+class TestPollingSchedule:
+    """Tests per a PollingSchedule"""
+
+    def setup_method(self):
+        self.windows = [
+            PollingWindow(ReadHoldingRegisters(10, 17), once=True),
+            PollingWindow(ReadHoldingRegisters(36, 14)),
+            PollingWindow(ReadHoldingRegisters(3001, 61), interval=60),
+        ]
+
+    def test_independent_intervals(self):
+        """Test que cada finestra es llegeix amb el seu propi període"""
+        schedule = PollingSchedule(self.windows, 5, now=0)
+
+        first_round = [window_address(schedule.pop(0)) for _ in range(3)]
+        assert first_round == [10, 36, 3001]
+        assert schedule.pop(0) is None
+        assert schedule.next_deadline() == 5
+
+        # Les finestres de lectura única no es tornen a llegir
+        reads = []
+        for now in range(5, 65, 5):
+            window = schedule.pop(now)
+            while window is not None:
+                reads.append(window_address(window))
+                window = schedule.pop(now)
+        assert reads.count(36) == 12
+        assert reads.count(3001) == 1
+        assert 10 not in reads
+
+    def test_expedite_after_write(self):
+        """Test que una escriptura fa rellegir la finestra corresponent"""
+        schedule = PollingSchedule(self.windows, 5, now=0)
+        while schedule.pop(0) is not None:
+            pass
+
+        schedule.expedite(3007, now=1)
+        assert schedule.next_deadline() == 1
+        assert window_address(schedule.pop(1)) == 3001
+        assert schedule.pop(1) is None
+        assert schedule.next_deadline() == 5
+
+    def test_missed_reads_are_skipped(self):
+        """Test que les lectures endarrerides no s'acumulen"""
+        schedule = PollingSchedule(self.windows[1:2], 5, now=0)
+        assert schedule.pop(0) is not None
+        assert schedule.pop(30) is not None
+        assert schedule.pop(30) is None
+
+    def test_planned_windows_keep_intervals(self):
+        """Test que les lectures planificades mantenen el període de la finestra original"""
+        device = AC300('00:11:22:33:44:55', '1234')
+        windows = plan_polling_schedule(device, ['device_type', 'dc_input_power', 'grid_charge_on'])
+
+        assert [(window_address(w), w.interval, w.once) for w in windows] == [
+            (10, None, True),
+            (36, None, False),
+            (3011, 60, False),
+        ]
+
+    def test_adaptive_interval(self):
+        """Test que l'interval s'escurça amb canvis i s'allarga amb valors estables"""
+        schedule = PollingSchedule(self.windows, 5, now=0, adaptive_range=(1, 30))
+        live = self.windows[1]
+
+        def intervals():
+            return {w.command.starting_address: i for w, i in schedule.effective_intervals()}
+
+        for now in range(3):
+            schedule.pop(now)
+        schedule.report(live, changed=False)
+        assert intervals()[36] == 7.5
+
+        for _ in range(10):
+            schedule.report(live, changed=False)
+        assert intervals()[36] == 30
+
+        schedule.report(live, changed=True)
+        assert intervals()[36] == 1
+        assert schedule.next_deadline() == 1 + 1
+
+        # Les finestres amb interval propi no s'adapten
+        schedule.report(self.windows[2], changed=True)
+        assert intervals()[3001] == 60
+
+    def test_adaptive_interval_zero_floor(self):
+        """Test que l'interval s'allarga encara que el mínim sigui 0"""
+        schedule = PollingSchedule(self.windows, 5, now=0, adaptive_range=(0, 30))
+        live = self.windows[1]
+
+        def intervals():
+            return {w.command.starting_address: i for w, i in schedule.effective_intervals()}
+
+        schedule.pop(0)
+        schedule.report(live, changed=True)
+        assert intervals()[36] == 0
+
+        schedule.report(live, changed=False)
+        assert intervals()[36] == PollingSchedule.MIN_BACKOFF_INTERVAL
+        schedule.report(live, changed=False)
+        assert intervals()[36] > PollingSchedule.MIN_BACKOFF_INTERVAL
@@ -0,0 +1,44 @@
+"""
+Tests per a la validació de les opcions del servidor
+"""
+
+from pathlib import Path
+import sys
+
+import pytest
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.server_cli import CommandLineHandler
+
+
+def execute(monkeypatch, *args):
+    """Executa el servidor sense arrencar-lo, i retorna les opcions que hauria fet servir"""
+    started = []
+    monkeypatch.setattr(CommandLineHandler, 'start', lambda self, args: started.append(args))
+    CommandLineHandler(['server_cli', '--broker', 'localhost', *args, '00:11:22:33:44:55']).execute()
+    return started[0]
+
+
+class TestServerCli:
+    """Tests per a les opcions de la línia d'ordres"""
+
+    def test_pipeline(self, monkeypatch):
+        """Test que s'accepten profunditats d'1 o més"""
+        assert execute(monkeypatch).pipeline == 1
+        assert execute(monkeypatch, '--pipeline', '4').pipeline == 4
+
+    @pytest.mark.parametrize('depth', ['0', '-2'])
+    def test_invalid_pipeline(self, monkeypatch, depth):
+        """Test que es rebutgen les profunditats menors que 1"""
+        with pytest.raises(SystemExit) as exc:
+            execute(monkeypatch, '--pipeline', depth)
+        assert exc.value.code == 2
+
+    @pytest.mark.parametrize('interval', [['0', '5'], ['10', '5'], ['-1', '5']])
+    def test_invalid_adaptive_interval(self, monkeypatch, interval):
+        """Test que es rebutgen els intervals adaptatius invàlids"""
+        with pytest.raises(SystemExit) as exc:
+            execute(monkeypatch, '--adaptive-interval', *interval)
+        assert exc.value.code == 2
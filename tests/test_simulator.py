@@ -0,0 +1,91 @@
+"""
+Tests per al transport Bluetooth simulat
+"""
+
+import asyncio
+from pathlib import Path
+import sys
+
+import pytest
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.bluetooth import ModbusError, build_device
+from bluetti_mqtt.bluetooth.client import BluetoothClient
+from bluetti_mqtt.bluetooth.manager import MultiDeviceManager
+from bluetti_mqtt.bluetooth.simulator import SimulatedDevice, SimulatedTransport
+from bluetti_mqtt.core import ReadHoldingRegisters, WriteSingleRegister
+
+ADDRESS = '00:11:22:33:44:55'
+
+
+async def connect(device: SimulatedDevice, **kwargs) -> BluetoothClient:
+    client = BluetoothClient(device.address, device.encrypted, transport=SimulatedTransport([device]), **kwargs)
+    client.run_task = asyncio.get_running_loop().create_task(client.run())
+    while not client.is_ready:
+        await asyncio.sleep(0.01)
+    return client
+
+
+class TestSimulatedDevice:
+    """Tests per a SimulatedDevice i SimulatedTransport"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('name,encrypted', [('AC3001234', False), ('Elite 200 V21234', True)])
+    async def test_polling_commands_parse(self, name, encrypted):
+        """Test que totes les lectures del dispositiu es poden llegir i interpretar"""
+        device = SimulatedDevice(ADDRESS, name, encrypted=encrypted, mtu=23)
+        client = await connect(device)
+        bluetti_device = build_device(ADDRESS, client.name)
+
+        for command in bluetti_device.polling_commands:
+            response = await (await client.perform(command))
+            parsed = bluetti_device.parse(command.starting_address, command.parse_response(response))
+            assert len(parsed) > 0
+        client.run_task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_writes_show_in_readback(self):
+        """Test que una escriptura es reflecteix als registres de lectura del mateix camp"""
+        device = SimulatedDevice(ADDRESS, 'AC3001234')
+        client = await connect(device)
+        bluetti_device = build_device(ADDRESS, client.name)
+        field = next(f for f in bluetti_device.struct.get_fields('ac_output_on') if f.address < 3000)
+
+        await (await client.perform(WriteSingleRegister(3007, 1)))
+        command = ReadHoldingRegisters(field.address, 1)
+        response = await (await client.perform(command))
+        parsed = bluetti_device.parse(field.address, command.parse_response(response))
+        assert parsed['ac_output_on'] is True
+        client.run_task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_unknown_register(self):
+        """Test que llegir fora dels registres coneguts dona una excepció MODBUS"""
+        client = await connect(SimulatedDevice(ADDRESS, 'AC3001234'))
+        with pytest.raises(ModbusError):
+            await (await client.perform(ReadHoldingRegisters(9000, 2)))
+        client.run_task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_lost_notifications_are_retried(self, monkeypatch):
+        """Test que les respostes perdudes es tornen a demanar"""
+        monkeypatch.setattr(BluetoothClient, 'RESPONSE_TIMEOUT', 0.05)
+        client = await connect(SimulatedDevice(ADDRESS, 'AC3001234', loss=0.2, seed=1))
+        command = ReadHoldingRegisters(10, 5)
+        for _ in range(10):
+            response = await (await client.perform(command))
+            assert len(response) == command.response_size()
+        client.run_task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_manager_discovers_simulated_devices(self):
+        """Test que el gestor troba i connecta els dispositius simulats"""
+        devices = [SimulatedDevice(f'00:11:22:33:44:{i:02X}', f'EB3A{i}', latency=0.001) for i in range(20)]
+        manager = MultiDeviceManager([d.address for d in devices], transport=SimulatedTransport(devices))
+        task = asyncio.get_running_loop().create_task(manager.run())
+        while not all(manager.is_ready(d.address) for d in devices):
+            await asyncio.sleep(0.01)
+        assert manager.get_name(devices[3].address) == 'EB3A3'
+        task.cancel()
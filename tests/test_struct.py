@@ -0,0 +1,153 @@
+"""
+Tests per al parseig de registres (DeviceStruct)
+"""
+
+from decimal import Decimal
+from pathlib import Path
+import struct
+import sys
+
+import pytest
+
+# Afegeix el directori arrel al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.core import AC300
+from bluetti_mqtt.core.devices.struct import DeviceStruct, NumericMode
+from bluetti_mqtt.mqtt_client import format_numeric
+
+
+def build_registers(starting_address: int, quantity: int, values: dict) -> bytes:
+    """Construeix el cos d'una resposta ReadHoldingRegisters"""
+    registers = [values.get(starting_address + i, 0) for i in range(quantity)]
+    return struct.pack(f'!{quantity}H', *registers)
+
+
+class TestDeviceStruct:
+    """Tests per a DeviceStruct.parse"""
+
+    def test_parse_window(self):
+        """Test parseig d'una finestra de registres"""
+        s = DeviceStruct()
+        s.add_uint_field('power', 10)
+        s.add_decimal_field('voltage', 11, 1)
+        s.add_bool_field('enabled', 12)
+
+        data = build_registers(10, 3, {10: 150, 11: 2305, 12: 1})
+        assert s.parse(10, data) == {
+            'power': 150,
+            'voltage': Decimal('230.5'),
+            'enabled': True,
+        }
+
+    def test_parse_skips_fields_outside_window(self):
+        """Test que els camps fora de la finestra s'ignoren"""
+        s = DeviceStruct()
+        s.add_uint_field('before', 9)
+        s.add_uint_field('inside', 10)
+        s.add_version_field('partial', 11)
+
+        data = build_registers(10, 2, {10: 42})
+        assert s.parse(10, data) == {'inside': 42}
+
+    def test_parse_skips_out_of_range_values(self):
+        """Test que els valors fora de rang s'ignoren"""
+        s = DeviceStruct()
+        s.add_decimal_field('current', 10, 1, (0, 15))
+
+        assert s.parse(10, build_registers(10, 1, {10: 120})) == {'current': Decimal(12)}
+        assert s.parse(10, build_registers(10, 1, {10: 160})) == {}
+
+    def test_plan_is_rebuilt_after_adding_fields(self):
+        """Test que afegir camps invalida els plans compilats"""
+        s = DeviceStruct()
+        s.add_uint_field('first', 10)
+        data = build_registers(10, 2, {10: 1, 11: 2})
+        assert s.parse(10, data) == {'first': 1}
+
+        s.add_uint_field('second', 11)
+        assert s.parse(10, data) == {'first': 1, 'second': 2}
+
+    def test_parse_word_swapped_fields(self):
+        """Test parseig de camps de 32 bits amb la paraula baixa primer"""
+        s = DeviceStruct()
+        s.add_uint32_field('energy', 10)
+        s.add_decimal32_field('total', 12, 1)
+
+        data = build_registers(10, 4, {10: 0x5678, 11: 0x1234, 12: 0x0002, 13: 0x0001})
+        parsed = s.parse(10, data)
+        assert parsed['energy'] == 0x12345678
+        assert parsed['total'] == 0x10002 / 10
+
+    def test_parse_overlapping_fields(self):
+        """Test que els camps que se solapen es parsegen igualment"""
+        s = DeviceStruct(chunk_size=1)
+        s.add_uint_field('word', 10)
+        s.add_uint8_field('low_byte', 11)
+        s.add_string_field('name', 12, 2)
+
+        data = bytes([0x01, 0x02]) + b'AB\0\0'
+        assert s.parse(10, data) == {'word': 0x0102, 'low_byte': 0x02, 'name': 'AB'}
+
+    def test_parse_float_mode(self):
+        """Test parseig sense Decimal amb NumericMode.FLOAT"""
+        s = DeviceStruct()
+        s.add_uint_field('power', 10)
+        s.add_decimal_field('voltage', 11, 1)
+        s.add_decimal_array_field('cells', 12, 2, 2)
+        s.add_version_field('version', 14)
+
+        data = build_registers(10, 6, {10: 150, 11: 2300, 12: 325, 13: 331, 14: 10012})
+        decimal_parsed = s.parse(10, data)
+        float_parsed = s.parse(10, data, NumericMode.FLOAT)
+
+        assert float_parsed == {'power': 150, 'voltage': 230.0, 'cells': [3.25, 3.31], 'version': 100.12}
+        assert not any(isinstance(v, Decimal) for v in float_parsed.values())
+        for name in ('voltage', 'version'):
+            assert format_numeric(float_parsed[name], NumericMode.FLOAT) == format_numeric(decimal_parsed[name])
+
+    def test_field_lookup_indexes(self):
+        """Test cerca de camps per nom i per adreça"""
+        s = DeviceStruct()
+        s.add_uint_field('pack_num', 3006)
+        s.add_uint_field('power', 36)
+        s.add_uint_field('pack_num', 96)
+
+        assert s.has_field('power')
+        assert not s.has_field('missing')
+        assert [f.address for f in s.get_fields('pack_num')] == [3006, 96]
+        assert [f.name for f in s.fields_in_range(36, 97)] == ['power', 'pack_num']
+
+        s.rename_fields({'power': 'dc_input_power'})
+        assert s.has_field('dc_input_power')
+        assert not s.has_field('power')
+
+    def test_parse_device_polling_window(self):
+        """Test parseig d'una finestra real d'un AC300"""
+        device = AC300('00:11:22:33:44:55', '1234')
+        data = build_registers(10, 40, {36: 100, 37: 200, 43: 87, 48: 1})
+        parsed = device.parse(10, data)
+
+        assert parsed['dc_input_power'] == 100
+        assert parsed['ac_input_power'] == 200
+        assert parsed['total_battery_percent'] == 87
+        assert parsed['ac_output_on'] is True
+        assert parsed['dc_output_on'] is False
+
+    def test_setter_lookup(self):
+        """Test cerca del camp modificable quan hi ha noms repetits"""
+        device = AC300('00:11:22:33:44:55', '1234')
+
+        assert device.has_field_setter('pack_num')
+        assert not device.has_field_setter('dc_input_power')
+        assert device.build_setter_command('pack_num', 2).address == 3006
+
+    def test_register_map_shared_between_devices(self):
+        """Test que els dispositius del mateix model comparteixen el mapa de registres"""
+        first = AC300('00:11:22:33:44:55', '1234')
+        second = AC300('66:77:88:99:AA:BB', '5678')
+
+        assert first.struct is second.struct
+        assert first.struct.frozen
+        with pytest.raises(RuntimeError):
+            first.struct.add_uint_field('extra', 1)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Compara les implementacions del CRC MODBUS disponibles (l'extensió C de
+crcmod, la versió en Python de crcmod i la taula de bluetti_mqtt) i mostra
+quina fa servir l'aplicació.
+
+Ús: python benchmark_crc.py [MIDA_TRAMA] [REPETICIONS]
+"""
+
+import importlib
+import os
+import sys
+import timeit
+from pathlib import Path
+
+# Afegeix el directori pare al path per importar els mòduls
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bluetti_mqtt.core.utils import CRC_IMPLEMENTATION, table_modbus_crc
+
+
+def crc_implementations():
+    """Retorna les implementacions disponibles, per nom"""
+    implementations = {'table': table_modbus_crc}
+
+    crcmod_module = importlib.import_module('crcmod.crcmod')
+    if crcmod_module._usingExtension:
+        implementations['crcmod'] = crcmod_module.mkCrcFun(0x18005, initCrc=0xFFFF, rev=True, xorOut=0)
+
+    # La implementació en Python pur de crcmod, la que faria servir sense l'extensió
+    crcfunpy = importlib.import_module('crcmod._crcfunpy')
+    table = crcmod_module._mkTable_r(0x18005, 16)
+    implementations['crcmod-python'] = lambda data, crc=0xFFFF: crcfunpy._crc16r(data, crc, table)
+
+    return implementations
+
+
+def benchmark(frame_size=255, repeat=2000):
+    """Retorna el temps per trama de cada implementació, en microsegons"""
+    frame = os.urandom(frame_size)
+    implementations = crc_implementations()
+
+    expected = table_modbus_crc(frame)
+    results = {}
+    for name, crc in implementations.items():
+        if crc(frame) != expected:
+            raise AssertionError(f'{name} calcula un CRC diferent')
+        elapsed = min(timeit.repeat(lambda: crc(frame), number=repeat, repeat=5))
+        results[name] = elapsed / repeat * 1e6
+    return results
+
+
+def main():
+    frame_size = int(sys.argv[1]) if len(sys.argv) > 1 else 255
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    print(f"⏱️  CRC MODBUS amb trames de {frame_size} bytes")
+    results = benchmark(frame_size, repeat)
+    for name, micros in sorted(results.items(), key=lambda r: r[1]):
+        marker = ' ← en ús' if name == CRC_IMPLEMENTATION else ''
+        print(f"   {name:14} {micros:10.2f} µs/trama{marker}")
+
+    fastest = min(results, key=results.get)
+    if fastest != CRC_IMPLEMENTATION:
+        print(f"⚠️  La implementació més ràpida és {fastest}, però s'està fent servir {CRC_IMPLEMENTATION}")
+        sys.exit(1)
+    print("✅ S'està fent servir la implementació més ràpida")
+
+
+if __name__ == "__main__":
+    main()